@@ -4,21 +4,242 @@
 Free Proxy Finder and Tester Tool
 """
 
+import io
+import os
+import sys
+import json
+import logging
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import random
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
+import socket
+import itertools
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+# Optional curl_cffi import: libcurl 客户端（C 实现，支持 HTTP/2），可用时用于线程池探测
+try:
+    from curl_cffi import requests as cf_requests
+    from curl_cffi.requests.exceptions import Timeout as CurlTimeout, ConnectionError as CurlConnectionError
+    CURL_CFFI_AVAILABLE = True
+except ImportError:
+    CURL_CFFI_AVAILABLE = False
+    cf_requests = None  # 明确设置为 None
+    CurlTimeout = CurlConnectionError = None
+
+# 两种客户端的超时/连接异常统一处理
+PROBE_TIMEOUT_ERRORS = (requests.exceptions.Timeout,) + ((CurlTimeout,) if CURL_CFFI_AVAILABLE else ())
+PROBE_CONNECTION_ERRORS = (requests.exceptions.ConnectionError,) + ((CurlConnectionError,) if CURL_CFFI_AVAILABLE else ())
+
+# Optional aiohttp import for single-threaded async proxy probing
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+    aiohttp = None  # 明确设置为 None
+
+# Optional uvloop (libuv) event loop, fewer syscalls per probe than the default loop
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+    uvloop = None
+
+# 单个代理的测试输出走 logging，可通过 RITADEL_LOG 调整级别或静默（例如 RITADEL_LOG=WARNING）
+# 模块自带输出到 stdout 的处理器且不向上传播，导入本模块的调用方无需配置 logging 也能看到进度；
+# 需要交给自己的 logging 配置处理时，移除该处理器并设置 log.propagate = True
+log = logging.getLogger("ritadel.proxy_finder")
+if not log.handlers:
+    _log_handler = logging.StreamHandler(sys.stdout)
+    _log_handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_log_handler)
+    log.setLevel(os.getenv("RITADEL_LOG", "INFO"))
+    log.propagate = False
+
+# 输出用的分隔线
+_SEP60 = "=" * 60
+_SEP50 = "=" * 50
+_DASH50 = "-" * 50
+_DASH30 = "-" * 30
+
+# 代理测试结果的持久化缓存（按代理地址索引）
+PROXY_CACHE_FILE = os.path.expanduser("~/.ritadel/proxy_cache.json")
+WORKING_PROXY_TTL = 10 * 60  # 可用代理缓存 10 分钟
+FAILED_PROXY_TTL = 2 * 60    # 失败代理缓存 2 分钟
+
+def _proxy_host(proxy_url):
+    """从代理地址中取出主机部分，作为不解析响应时的出口 IP"""
+    return urlsplit(proxy_url).hostname or 'Unknown'
+
+class ProxyResult:
+    """单个可用代理的测试结果（__slots__ 对象，可通过 ProxyFinder 的对象池复用）"""
+    __slots__ = ('proxy', 'status', 'ip', 'response_time', 'test_offset')
+    
+    def set(self, proxy, ip, response_time, test_offset):
+        self.proxy = proxy
+        self.status = 'working'
+        self.ip = ip
+        self.response_time = response_time
+        self.test_offset = test_offset
+        return self
 
 class ProxyFinder:
-    def __init__(self):
+    def __init__(self, cache_file=PROXY_CACHE_FILE, working_ttl=WORKING_PROXY_TTL, failed_ttl=FAILED_PROXY_TTL):
         self.working_proxies = []
         self.tested_count = 0
-        self.lock = threading.Lock()
+        # itertools.count 的 next() 在 GIL 下是原子的，计数无需加锁
+        self._probe_counter = itertools.count(1)
+        
+        # 结果对象池：测试前按代理数量预分配，处理完后通过 release_results 归还
+        self._pool = deque()
+        
+        # 本轮测试的起始时刻（单调时钟），结果只记录相对偏移，保存时再换算成绝对时间
+        self._batch_start = time.monotonic()
         
+        # 复用同一个会话的连接池，避免每次探测都重新握手
+        self.session = self._create_session()
+        
+        # 只解析一次探测目标的地址，而不是每次探测都查询 DNS
+        self.probe_url, self.probe_headers = self._resolve_probe_target()
+        
+        # 加载之前运行的测试结果
+        self.cache_file = cache_file
+        self.working_ttl = working_ttl
+        self.failed_ttl = failed_ttl
+        self._cache = self._load_cache()
+        
+    def _create_session(self):
+        """创建探测用的会话：优先使用 curl_cffi，否则回退到带连接池的 requests"""
+        if CURL_CFFI_AVAILABLE:
+            return cf_requests.Session()
+        
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
+    def _resolve_probe_target(self, host='httpbin.org'):
+        """解析探测目标地址，返回 (url, headers)，解析失败时回退到域名"""
+        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+        try:
+            ip = socket.gethostbyname(host)
+        except (socket.gaierror, OSError):
+            return f'http://{host}/ip', headers
+        
+        # 使用 IP 直连，通过 Host 头保留虚拟主机信息
+        headers['Host'] = host
+        return f'http://{ip}/ip', headers
+        
+    def _reserve_results(self, count):
+        """确保对象池中至少有 count 个空闲的结果对象"""
+        missing = count - len(self._pool)
+        if missing > 0:
+            self._pool.extend(ProxyResult() for _ in range(missing))
+    
+    def _acquire_result(self, proxy, ip, response_time, test_offset):
+        """从对象池取出一个结果对象并填充（池空时新建）"""
+        try:
+            result = self._pool.popleft()
+        except IndexError:
+            result = ProxyResult()
+        return result.set(proxy, ip, response_time, test_offset)
+    
+    def release_results(self, results):
+        """结果处理完毕后归还到对象池，供下一轮测试复用"""
+        self._pool.extend(results)
+    
+    def sort_by_response_time(self, proxies):
+        """按响应时间升序排序（NumPy argsort）"""
+        response_times = np.fromiter((p.response_time for p in proxies), dtype=np.float64, count=len(proxies))
+        order = np.argsort(response_times, kind='stable')
+        return [proxies[i] for i in order]
+    
+    def _load_cache(self):
+        """从磁盘加载代理测试结果缓存"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 读取代理缓存失败，忽略缓存: {str(e)}")
+            return {}
+    
+    def _save_cache(self):
+        """将代理测试结果缓存写入磁盘"""
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self._cache, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"⚠️ 保存代理缓存失败: {str(e)}")
+    
+    def _split_cached(self, proxy_list):
+        """根据缓存将代理分为 (缓存中仍可用的结果, 需要重新测试的代理)"""
+        now = time.time()
+        cached_working = []
+        to_test = []
+        
+        for proxy in proxy_list:
+            entry = self._cache.get(proxy)
+            if entry:
+                ttl = self.working_ttl if entry['status'] == 'working' else self.failed_ttl
+                if now - entry['tested_at'] < ttl:
+                    if entry['status'] == 'working':
+                        # 缓存结果早于本轮开始，偏移为负
+                        cached_working.append(self._acquire_result(
+                            proxy,
+                            entry['ip'],
+                            entry['response_time'],
+                            (time.monotonic() - self._batch_start) - (now - entry['tested_at'])
+                        ))
+                    # 最近失败过的代理直接跳过
+                    continue
+            to_test.append(proxy)
+        
+        return cached_working, to_test
+    
+    def _update_cache(self, tested_proxies, working_results):
+        """将本次测试结果合并进缓存并保存"""
+        now = time.time()
+        working_by_proxy = {result.proxy: result for result in working_results}
+        
+        for proxy in tested_proxies:
+            result = working_by_proxy.get(proxy)
+            if result:
+                self._cache[proxy] = {
+                    'status': 'working',
+                    'ip': result.ip,
+                    'response_time': result.response_time,
+                    'tested_at': now
+                }
+            else:
+                self._cache[proxy] = {'status': 'failed', 'tested_at': now}
+        
+        self._save_cache()
+    
+    def _print_summary(self, total, working_proxies, cached_count, test_duration):
+        """输出测试汇总信息"""
+        print(_SEP60)
+        print(f"🏁 测试完成！耗时: {test_duration:.1f}秒")
+        print(f"📊 测试总数: {total}")
+        if cached_count:
+            print(f"♻️ 缓存命中: {cached_count}")
+        print(f"✅ 可用代理: {len(working_proxies)}")
+        print(f"📈 成功率: {len(working_proxies)/total*100:.1f}%" if total else "📈 成功率: N/A")
+    
     def get_free_proxy_list(self):
-        """获取免费代理列表"""
+        """获取免费代理列表（已去重的不可变元组）"""
         print("🔍 获取免费代理列表...")
         
         # 这里包含一些常见的免费代理，实际使用时可能需要更新
@@ -45,96 +266,226 @@ class ProxyFinder:
             "http://103.155.166.87:8181",
         ]
         
-        print(f"📋 获取到 {len(proxy_list)} 个代理地址")
-        return proxy_list
+        # 去重（保持原有顺序），避免对重复地址浪费超时等待
+        unique_proxies = tuple(dict.fromkeys(proxy_list))
+        if len(unique_proxies) < len(proxy_list):
+            print(f"🧹 移除 {len(proxy_list) - len(unique_proxies)} 个重复代理")
+        
+        print(f"📋 获取到 {len(unique_proxies)} 个代理地址")
+        return unique_proxies
+    
+    def _next_probe(self):
+        """递增并返回已测试代理数（用于日志序号）"""
+        self.tested_count = next(self._probe_counter)
+        return self.tested_count
+    
+    def _tcp_alive(self, proxy_url, timeout=2):
+        """TCP 层预检：代理端口能否在 timeout 秒内建立连接"""
+        parts = urlsplit(proxy_url)
+        if not parts.hostname or not parts.port:
+            # 无法解析出主机和端口时不做预检，交给完整请求判断
+            return True
+        try:
+            with socket.create_connection((parts.hostname, parts.port), timeout=timeout):
+                return True
+        except OSError:
+            return False
     
-    def test_proxy(self, proxy_url, timeout=10):
-        """测试单个代理是否可用"""
+    def test_proxy(self, proxy_url, timeout=10, preflight_timeout=2, verbose=False):
+        """测试单个代理是否可用
+        
+        先用 preflight_timeout 秒做 TCP 预检，端口不通的代理直接淘汰，
+        不再为其等待完整的 HTTP 超时。preflight_timeout 为 None 时跳过预检。
+        verbose 为 True 时解析响应 JSON 取出口 IP，否则 200 即视为可用，
+        IP 直接取代理地址的主机部分。
+        """
+        if preflight_timeout and not self._tcp_alive(proxy_url, preflight_timeout):
+            log.info("🔌 [%s] 预检失败（端口不通）: %s", self._next_probe(), proxy_url)
+            return None
+        
         try:
             proxies = {
                 'http': proxy_url,
                 'https': proxy_url
             }
             
-            # 测试HTTP请求
-            response = requests.get(
-                'http://httpbin.org/ip',
+            # 测试HTTP请求（两种客户端的 elapsed 类型不同，统一自行计时）
+            start = time.perf_counter()
+            response = self.session.get(
+                self.probe_url,
                 proxies=proxies,
                 timeout=timeout,
-                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+                headers=self.probe_headers
             )
+            response_time = time.perf_counter() - start
             
             if response.status_code == 200:
-                result = response.json()
-                original_ip = result.get('origin', 'Unknown')
+                if verbose:
+                    original_ip = response.json().get('origin', 'Unknown')
+                else:
+                    original_ip = _proxy_host(proxy_url)
                 
-                # 获取响应时间
-                response_time = response.elapsed.total_seconds()
+                log.info("✅ [%s] 代理可用: %s\n   IP: %s\n   响应时间: %.2f秒",
+                         self._next_probe(), proxy_url, original_ip, response_time)
                 
-                with self.lock:
-                    self.tested_count += 1
-                    print(f"✅ [{self.tested_count}] 代理可用: {proxy_url}")
-                    print(f"   IP: {original_ip}")
-                    print(f"   响应时间: {response_time:.2f}秒")
-                
-                return {
-                    'proxy': proxy_url,
-                    'status': 'working',
-                    'ip': original_ip,
-                    'response_time': response_time,
-                    'test_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
+                return self._acquire_result(proxy_url, original_ip, response_time, time.monotonic() - self._batch_start)
             else:
-                with self.lock:
-                    self.tested_count += 1
-                    print(f"❌ [{self.tested_count}] 代理响应错误: {proxy_url} (状态码: {response.status_code})")
+                log.info("❌ [%s] 代理响应错误: %s (状态码: %s)", self._next_probe(), proxy_url, response.status_code)
                 
-        except requests.exceptions.Timeout:
-            with self.lock:
-                self.tested_count += 1
-                print(f"⏰ [{self.tested_count}] 代理超时: {proxy_url}")
-        except requests.exceptions.ConnectionError:
-            with self.lock:
-                self.tested_count += 1
-                print(f"🔌 [{self.tested_count}] 连接失败: {proxy_url}")
+        except PROBE_TIMEOUT_ERRORS:
+            log.info("⏰ [%s] 代理超时: %s", self._next_probe(), proxy_url)
+        except PROBE_CONNECTION_ERRORS:
+            log.info("🔌 [%s] 连接失败: %s", self._next_probe(), proxy_url)
         except Exception as e:
-            with self.lock:
-                self.tested_count += 1
-                print(f"❓ [{self.tested_count}] 未知错误: {proxy_url} - {str(e)}")
+            log.info("❓ [%s] 未知错误: %s - %s", self._next_probe(), proxy_url, e)
         
         return None
     
-    def find_working_proxies(self, max_workers=20, timeout=10):
-        """并发测试所有代理"""
+    def find_working_proxies(self, max_workers=20, timeout=10, preflight_timeout=2, verbose=False, enough=None,
+                             executor='thread'):
+        """并发测试所有代理
+        
+        enough 为 None 时等待所有代理测试完成；否则凑够 enough 个可用代理
+        （含缓存命中）后立即返回，取消尚未开始的测试，不再等待最慢的代理。
+        
+        executor 为 'thread'（默认）时在线程池中测试；为 'process' 时使用进程池
+        （工作进程数不超过 CPU 核数），适合大批量审计时响应解析占用 CPU 的场景。
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"executor must be 'thread' or 'process', got {executor!r}")
+        
         proxy_list = self.get_free_proxy_list()
+        self._batch_start = time.monotonic()
+        self._reserve_results(len(proxy_list))
+        
+        # 优先使用缓存中未过期的结果
+        cached_working, to_test = self._split_cached(proxy_list)
+        # 在跳过测试之前统计缓存命中（可用和最近失败的缓存结果），未测试的代理不算命中
+        cached_count = len(proxy_list) - len(to_test)
         working_proxies = []
         
-        print(f"\n🧪 开始测试代理 (并发数: {max_workers}, 超时: {timeout}秒)")
-        print("=" * 60)
+        if enough is not None and len(cached_working) >= enough:
+            to_test = ()
+        
+        if executor == 'process':
+            max_workers = min(max_workers, os.cpu_count() or 1)
+        
+        print(f"\n🧪 开始测试代理 (并发数: {max_workers}, 超时: {timeout}秒, 待测试: {len(to_test)})")
+        print(_SEP60)
         
         start_time = time.time()
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_proxy = {
-                executor.submit(self.test_proxy, proxy, timeout): proxy 
-                for proxy in proxy_list
-            }
+        if to_test:
+            if executor == 'process':
+                pool = ProcessPoolExecutor(max_workers=max_workers)
+                probe = _test_proxy_worker
+            else:
+                pool = ThreadPoolExecutor(max_workers=max_workers)
+                probe = self.test_proxy
+            tested = []
+            try:
+                # 提交所有任务
+                future_to_proxy = {
+                    pool.submit(probe, proxy, timeout, preflight_timeout, verbose): proxy 
+                    for proxy in to_test
+                }
+                
+                # 收集结果
+                for future in as_completed(future_to_proxy):
+                    tested.append(future_to_proxy[future])
+                    result = future.result()
+                    if result:
+                        if executor == 'process':
+                            # 工作进程的时钟起点不同，按本进程收到结果的时刻记录
+                            result.test_offset = time.monotonic() - self._batch_start
+                        working_proxies.append(result)
+                        if enough is not None and len(cached_working) + len(working_proxies) >= enough:
+                            print(f"⚡ 已找到 {enough} 个可用代理，停止剩余测试")
+                            break
+            finally:
+                # 提前退出时取消排队中的任务，不等待正在进行的请求
+                pool.shutdown(wait=False, cancel_futures=True)
             
-            # 收集结果
-            for future in as_completed(future_to_proxy):
-                result = future.result()
-                if result:
-                    working_proxies.append(result)
+            # 只缓存实际完成测试的代理
+            self._update_cache(tested, working_proxies)
         
         end_time = time.time()
         test_duration = end_time - start_time
         
-        print("=" * 60)
-        print(f"🏁 测试完成！耗时: {test_duration:.1f}秒")
-        print(f"📊 测试总数: {len(proxy_list)}")
-        print(f"✅ 可用代理: {len(working_proxies)}")
-        print(f"📈 成功率: {len(working_proxies)/len(proxy_list)*100:.1f}%")
+        working_proxies = cached_working + working_proxies
+        self._print_summary(len(proxy_list), working_proxies, cached_count, test_duration)
+        
+        return working_proxies
+    
+    async def _test_proxy_async(self, session, proxy_url, timeout=10, verbose=False):
+        """异步测试单个代理是否可用（单线程事件循环，无需加锁）"""
+        try:
+            start = time.perf_counter()
+            async with session.get(
+                self.probe_url,
+                proxy=proxy_url,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                headers=self.probe_headers
+            ) as response:
+                if response.status == 200:
+                    if verbose:
+                        original_ip = (await response.json(content_type=None)).get('origin', 'Unknown')
+                    else:
+                        original_ip = _proxy_host(proxy_url)
+                    
+                    # aiohttp 没有 response.elapsed，自行计时
+                    response_time = time.perf_counter() - start
+                    
+                    log.info("✅ [%s] 代理可用: %s\n   IP: %s\n   响应时间: %.2f秒",
+                             self._next_probe(), proxy_url, original_ip, response_time)
+                    
+                    return self._acquire_result(proxy_url, original_ip, response_time, time.monotonic() - self._batch_start)
+                else:
+                    log.info("❌ [%s] 代理响应错误: %s (状态码: %s)", self._next_probe(), proxy_url, response.status)
+                    
+        except asyncio.TimeoutError:
+            log.info("⏰ [%s] 代理超时: %s", self._next_probe(), proxy_url)
+        except aiohttp.ClientConnectionError:
+            log.info("🔌 [%s] 连接失败: %s", self._next_probe(), proxy_url)
+        except Exception as e:
+            log.info("❓ [%s] 未知错误: %s - %s", self._next_probe(), proxy_url, e)
+        
+        return None
+    
+    async def find_working_proxies_async(self, max_connections=200, timeout=10, verbose=False):
+        """使用 aiohttp 在单线程中并发测试所有代理
+        
+        与 find_working_proxies 不同，这里不为每个代理占用一个线程，
+        而是通过非阻塞 socket I/O 多路复用，可同时测试数百个代理。
+        """
+        proxy_list = self.get_free_proxy_list()
+        self._batch_start = time.monotonic()
+        self._reserve_results(len(proxy_list))
+        
+        # 优先使用缓存中未过期的结果
+        cached_working, to_test = self._split_cached(proxy_list)
+        working_proxies = []
+        
+        print(f"\n🧪 开始异步测试代理 (最大连接数: {max_connections}, 超时: {timeout}秒, 待测试: {len(to_test)})")
+        print(_SEP60)
+        
+        start_time = time.time()
+        
+        if to_test:
+            connector = aiohttp.TCPConnector(limit=max_connections, ssl=False)
+            async with aiohttp.ClientSession(connector=connector) as session:
+                results = await asyncio.gather(
+                    *[self._test_proxy_async(session, proxy, timeout, verbose) for proxy in to_test],
+                    return_exceptions=True
+                )
+            
+            working_proxies = [result for result in results if isinstance(result, ProxyResult)]
+            self._update_cache(to_test, working_proxies)
+        
+        test_duration = time.time() - start_time
+        
+        working_proxies = cached_working + working_proxies
+        self._print_summary(len(proxy_list), working_proxies, len(proxy_list) - len(to_test), test_duration)
         
         return working_proxies
     
@@ -144,13 +495,23 @@ class ProxyFinder:
             print("❌ 没有可用代理需要保存")
             return
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"# 可用代理列表 - 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"# 总计: {len(proxies)} 个代理\n\n")
-            
-            for proxy in sorted(proxies, key=lambda x: x['response_time']):
-                f.write(f"# IP: {proxy['ip']} | 响应时间: {proxy['response_time']:.2f}秒\n")
-                f.write(f"{proxy['proxy']}\n\n")
+        # 只取一次当前时间，按各结果的相对偏移换算测试时间
+        now = datetime.now()
+        elapsed = time.monotonic() - self._batch_start
+        
+        # 先在内存中拼好整个文件内容，再一次性写入
+        buf = io.StringIO()
+        buf.write(f"# 可用代理列表 - 生成时间: {now.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        buf.write(f"# 总计: {len(proxies)} 个代理\n\n")
+        buf.writelines(
+            f"# IP: {proxy.ip} | 响应时间: {proxy.response_time:.2f}秒 | "
+            f"测试时间: {(now - timedelta(seconds=elapsed - proxy.test_offset)).strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"{proxy.proxy}\n\n"
+            for proxy in self.sort_by_response_time(proxies)
+        )
+        
+        with open(filename, 'w', encoding='utf-8', buffering=1 << 16) as f:
+            f.write(buf.getvalue())
         
         print(f"💾 已保存 {len(proxies)} 个可用代理到: {filename}")
     
@@ -163,7 +524,7 @@ class ProxyFinder:
             }
             
             # 尝试访问Yahoo Finance
-            response = requests.get(
+            response = self.session.get(
                 'https://finance.yahoo.com/',
                 proxies=proxies,
                 timeout=15,
@@ -183,31 +544,51 @@ class ProxyFinder:
             print(f"❌ 测试Yahoo Finance访问失败: {proxy_url} - {str(e)}")
             return False
 
+# 每个工作进程复用一个 ProxyFinder（不读写磁盘缓存，缓存由主进程统一维护）
+_worker_finder = None
+
+def _test_proxy_worker(proxy_url, timeout=10, preflight_timeout=2, verbose=False):
+    """进程池工作函数：必须是模块级函数才能被 pickle 发送到子进程"""
+    global _worker_finder
+    if _worker_finder is None:
+        _worker_finder = ProxyFinder(cache_file=None)
+    return _worker_finder.test_proxy(proxy_url, timeout, preflight_timeout, verbose)
+
+def run_async(coro):
+    """运行协程，可用时使用 uvloop 事件循环"""
+    if UVLOOP_AVAILABLE:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
+
+def _fmt_row(index, proxy):
+    """格式化单个代理的展示行"""
+    return f"{index}. {proxy.proxy}\n   IP: {proxy.ip}\n   响应时间: {proxy.response_time:.2f}秒\n\n"
+
 def main():
     """主函数"""
     print("🚀 免费代理查找器")
-    print("=" * 50)
+    print(_SEP50)
     print("注意: 免费代理通常不稳定，仅用于测试目的")
     print("生产环境建议使用付费代理服务")
     print()
     
     finder = ProxyFinder()
     
-    # 查找可用代理
-    working_proxies = finder.find_working_proxies(max_workers=15, timeout=8)
+    # 查找可用代理（优先使用 aiohttp 异步测试，否则回退到线程池）
+    if AIOHTTP_AVAILABLE:
+        working_proxies = run_async(finder.find_working_proxies_async(timeout=8))
+    else:
+        working_proxies = finder.find_working_proxies(max_workers=15, timeout=8)
     
     if working_proxies:
         print("\n🎉 找到可用代理:")
-        print("-" * 50)
+        print(_DASH50)
         
         # 按响应时间排序
-        working_proxies.sort(key=lambda x: x['response_time'])
+        working_proxies = finder.sort_by_response_time(working_proxies)
         
-        for i, proxy in enumerate(working_proxies[:5], 1):  # 显示前5个最快的
-            print(f"{i}. {proxy['proxy']}")
-            print(f"   IP: {proxy['ip']}")
-            print(f"   响应时间: {proxy['response_time']:.2f}秒")
-            print()
+        # 显示前5个最快的，整块输出一次写入
+        sys.stdout.write("".join(_fmt_row(i, proxy) for i, proxy in enumerate(working_proxies[:5], 1)))
         
         # 保存到文件
         finder.save_working_proxies(working_proxies)
@@ -215,12 +596,15 @@ def main():
         # 测试最快的代理是否能访问Yahoo Finance
         if working_proxies:
             print("🧪 测试最快代理访问Yahoo Finance...")
-            fastest_proxy = working_proxies[0]['proxy']
+            fastest_proxy = working_proxies[0].proxy
             finder.test_yfinance_with_proxy(fastest_proxy)
         
         print("\n💡 使用方法:")
-        print("export YFINANCE_PROXY_HTTP=\"" + working_proxies[0]['proxy'] + "\"")
-        print("export YFINANCE_PROXY_HTTPS=\"" + working_proxies[0]['proxy'] + "\"")
+        print("export YFINANCE_PROXY_HTTP=\"" + working_proxies[0].proxy + "\"")
+        print("export YFINANCE_PROXY_HTTPS=\"" + working_proxies[0].proxy + "\"")
+        
+        # 结果已全部输出和保存，归还到对象池
+        finder.release_results(working_proxies)
         
     else:
         print("\n😞 没有找到可用的免费代理")
@@ -233,7 +617,7 @@ def main():
 def quick_test():
     """快速测试几个代理"""
     print("⚡ 快速代理测试")
-    print("-" * 30)
+    print(_DASH30)
     
     quick_list = [
         "http://103.152.112.145:80",
@@ -253,15 +637,13 @@ def quick_test():
     
     if working:
         best = working[0]
-        print(f"\n🎯 推荐使用: {best['proxy']}")
+        print(f"\n🎯 推荐使用: {best.proxy}")
         print("设置命令:")
-        print(f"export YFINANCE_PROXY_HTTP=\"{best['proxy']}\"")
+        print(f"export YFINANCE_PROXY_HTTP=\"{best.proxy}\"")
     else:
         print("\n❌ 快速测试没有找到可用代理")
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "quick":
         quick_test()
     else:
@@ -4,13 +4,32 @@ Bill Ackman activist investor analyst agent - Based on Bill Ackman's activist in
 """
 from graph.state import AgentState, show_agent_reasoning
 from tools.api import get_financial_metrics, get_market_cap, search_line_items
+from data.cache import (
+    HISTORICAL_FINANCIALS_CACHE_TTL,
+    MARKET_CAP_CACHE_TTL,
+    RECENT_FINANCIALS_CACHE_TTL,
+    cached_fetch,
+    get_file_cache,
+)
+from data.models import FinancialMetrics, LineItem
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, RootModel
 import json
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing_extensions import Literal
-from utils.progress import progress
+from utils.progress import progress, ProgressProxy
 from utils.llm import call_llm
+from llm.models import get_model_id
+from utils.jit import njit
+from utils.serialization import content_hash, dumps
+
+
+# 进度更新经后台队列转发，工作线程不会阻塞在渲染锁上 - Progress updates go through a background queue so workers never block on rendering
+_progress = ProgressProxy(progress)
 
 
 class BillAckmanSignal(BaseModel):
@@ -26,11 +45,21 @@ class BillAckmanSignal(BaseModel):
         confidence: 信号的置信度，范围0-100 / Signal confidence, range 0-100
         reasoning: 产生该信号的详细理由说明 / Detailed reasoning for the signal
     """
+    # 信号生成后不可修改，忽略LLM返回的多余字段 - Signals are immutable once built; extra LLM fields are ignored
+    model_config = ConfigDict(frozen=True, extra="ignore", validate_assignment=False)
+
     signal: Literal["买入", "卖出", "中性"]
     confidence: float
     reasoning: str
 
 
+class BillAckmanBatch(RootModel[dict[str, BillAckmanSignal]]):
+    """
+    多个股票的阿克曼信号：股票代码 -> 信号
+    Ackman signals for several tickers: ticker -> signal
+    """
+
+
 def bill_ackman_agent(state: AgentState):
     """
     使用比尔·阿克曼的投资原则和LLM推理分析股票
@@ -54,88 +83,42 @@ def bill_ackman_agent(state: AgentState):
     data = state["data"]
     end_date = data["end_date"]
     tickers = data["tickers"]
+    # 元数据中设置 no_cache 时跳过LLM输出缓存 - Skip the LLM output cache when the metadata sets no_cache
+    use_cache = not state["metadata"].get("no_cache", False)
     
     # 收集分析数据 - Collect analysis data
     analysis_data = {}
     ackman_analysis = {}
     
+    # 各股票之间没有依赖，数据请求是I/O密集型，并发分析
+    # Tickers are independent and data fetching is I/O-bound, so analyze them concurrently
+    with ThreadPoolExecutor(max_workers=max(1, min(16, len(tickers)))) as executor:
+        futures = [executor.submit(_analyze_ticker, ticker, end_date) for ticker in tickers]
+        # 按提交顺序收集，保持输出中的股票顺序 - Collect in submission order to keep ticker order stable
+        results = [future.result() for future in futures]
+    
+    # 所有股票的估值一次性向量化计算 - Value every ticker in one vectorized pass
+    _progress.update_status("bill_ackman_agent", None, "Calculating intrinsic value & margin of safety")
+    fcf_latest = np.array([result[3] for result in results], dtype=np.float64)
+    market_caps = np.array([np.nan if result[4] is None else result[4] for result in results], dtype=np.float64)
+    valuations = analyze_valuation_batch(fcf_latest, market_caps)
+    
+    for (ticker, quality_analysis, balance_sheet_analysis, _, _), valuation_analysis in zip(results, valuations):
+        analysis_data[ticker] = _combine_analysis(quality_analysis, balance_sheet_analysis, valuation_analysis)
+    
+    # 所有股票的LLM分析合并为一次调用 - One LLM call covers every ticker
+    ackman_outputs = generate_ackman_output_batch(analysis_data, use_cache)
+    
     for ticker in tickers:
-        progress.update_status("bill_ackman_agent", ticker, "Fetching financial metrics")
-        # 可以调整这些参数（period="annual"/"ttm", limit=5/10等）
-        # You can adjust these parameters (period="annual"/"ttm", limit=5/10, etc.)
-        metrics = get_financial_metrics(ticker, end_date, period="annual", limit=5)
-        
-        progress.update_status("bill_ackman_agent", ticker, "Gathering financial line items")
-        # 请求多个时期的数据（年度或TTM）以获得更强健的长期视图
-        # Request multiple periods of data (annual or TTM) for a more robust long-term view.
-        financial_line_items = search_line_items(
-            ticker,
-            [
-                "revenue",  # 收入
-                "operating_margin",  # 营业利润率
-                "debt_to_equity",  # 债务股权比
-                "free_cash_flow",  # 自由现金流
-                "total_assets",  # 总资产
-                "total_liabilities",  # 总负债
-                "dividends_and_other_cash_distributions",  # 分红和其他现金分配
-                "outstanding_shares"  # 流通股数
-            ],
-            end_date,
-            period="annual",  # 或"ttm"如果偏好过去12个月 - or "ttm" if you prefer trailing 12 months
-            limit=5           # 获取多达5个年度周期（如需要可更多）- fetch up to 5 annual periods (or more if needed)
-        )
-        
-        progress.update_status("bill_ackman_agent", ticker, "Getting market cap")
-        market_cap = get_market_cap(ticker, end_date)
-        
-        progress.update_status("bill_ackman_agent", ticker, "Analyzing business quality")
-        # 分析业务质量 - Analyze business quality
-        quality_analysis = analyze_business_quality(metrics, financial_line_items)
-        
-        progress.update_status("bill_ackman_agent", ticker, "Analyzing balance sheet and capital structure")
-        # 分析资产负债表和资本结构 - Analyze balance sheet and capital structure
-        balance_sheet_analysis = analyze_financial_discipline(metrics, financial_line_items)
-        
-        progress.update_status("bill_ackman_agent", ticker, "Calculating intrinsic value & margin of safety")
-        # 计算内在价值和安全边际 - Calculate intrinsic value & margin of safety
-        valuation_analysis = analyze_valuation(financial_line_items, market_cap)
-        
-        # 合并部分评分或信号 - Combine partial scores or signals
-        total_score = quality_analysis["score"] + balance_sheet_analysis["score"] + valuation_analysis["score"]
-        max_possible_score = 15  # 根据需要调整权重 - Adjust weighting as desired
-        
-        # 生成简单的买入/持有/卖出（买入/中性/卖出）信号
-        # Generate a simple buy/hold/sell (buy/neutral/sell) signal
-        if total_score >= 0.7 * max_possible_score:
-            signal = "买入"
-        elif total_score <= 0.3 * max_possible_score:
-            signal = "卖出"
-        else:
-            signal = "中性"
-        
-        # 整合所有分析数据 - Combine all analysis data
-        analysis_data[ticker] = {
-            "signal": signal,
-            "score": total_score,
-            "max_score": max_possible_score,
-            "quality_analysis": quality_analysis,
-            "balance_sheet_analysis": balance_sheet_analysis,
-            "valuation_analysis": valuation_analysis
-        }
-        
-        progress.update_status("bill_ackman_agent", ticker, "Generating Ackman analysis")
-        ackman_output = generate_ackman_output(
-            ticker=ticker, 
-            analysis_data=analysis_data,
-        )
-        
+        ackman_output = ackman_outputs[ticker]
         ackman_analysis[ticker] = {
             "signal": ackman_output.signal,
             "confidence": ackman_output.confidence,
             "reasoning": ackman_output.reasoning
         }
-        
-        progress.update_status("bill_ackman_agent", ticker, "Done")
+        _progress.update_status("bill_ackman_agent", ticker, "Done")
+    # 返回前确保所有排队的进度都已显示 - Make sure every queued update is shown before returning
+    _progress.flush()
     
     # 将结果包装在单个消息中以供链式传递 - Wrap results in a single message for the chain
     message = HumanMessage(
@@ -156,263 +139,519 @@ def bill_ackman_agent(state: AgentState):
     }
 
 
-def analyze_business_quality(metrics: list, financial_line_items: list) -> dict:
+# 阿克曼分析所需的财务报表项目 - Financial line items used by the Ackman analysis
+ACKMAN_LINE_ITEMS = [
+    "revenue",  # 收入
+    "operating_margin",  # 营业利润率
+    "debt_to_equity",  # 债务股权比
+    "free_cash_flow",  # 自由现金流
+    "total_assets",  # 总资产
+    "total_liabilities",  # 总负债
+    "dividends_and_other_cash_distributions",  # 分红和其他现金分配
+    "outstanding_shares"  # 流通股数
+]
+
+
+# 相同输入的LLM结论在磁盘上的缓存有效期 - On-disk TTL for LLM verdicts on identical inputs
+LLM_OUTPUT_CACHE_TTL = 7 * 24 * 60 * 60
+
+_file_cache = get_file_cache()
+
+
+def _report_cache_hit(ticker: str, endpoint: str):
+    """数据请求命中磁盘缓存时更新进度 - Report an on-disk cache hit for a data request"""
+    _progress.update_status("bill_ackman_agent", ticker, f"{endpoint} cache hit")
+
+
+# 数据请求的磁盘缓存与其他代理共用 - The on-disk cache for data requests is shared with the other agents
+_cached_financial_metrics = cached_fetch(
+    get_financial_metrics, "financial_metrics", RECENT_FINANCIALS_CACHE_TTL, HISTORICAL_FINANCIALS_CACHE_TTL,
+    model=FinancialMetrics, on_hit=_report_cache_hit,
+)
+_cached_line_items = cached_fetch(
+    search_line_items, "line_items", RECENT_FINANCIALS_CACHE_TTL, HISTORICAL_FINANCIALS_CACHE_TTL,
+    model=LineItem, on_hit=_report_cache_hit,
+)
+_cached_market_cap = cached_fetch(get_market_cap, "market_cap", MARKET_CAP_CACHE_TTL, on_hit=_report_cache_hit)
+
+
+def _fetch_ticker_data(ticker: str, end_date: str) -> tuple[list, list, float | None]:
     """
-    分析公司是否具有高质量的业务，具备稳定或增长的现金流，
-    持久的竞争优势，以及长期增长的潜力
-    阿克曼特别关注：
-    - 强劲的收入增长轨迹
-    - 持续的高运营利润率
-    - 稳定的自由现金流生成
-    - 高股本回报率表明存在护城河
+    并发获取单个股票的财务指标、财务报表项目和市值（三者互不依赖），优先读取磁盘缓存
+    Fetch financial metrics, line items and market cap for one ticker concurrently (they are independent),
+    serving from the on-disk cache when possible
+
+    Returns:
+        (metrics, financial_line_items, market_cap)
+    """
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # 可以调整这些参数（period="annual"/"ttm", limit=5/10等）
+        # You can adjust these parameters (period="annual"/"ttm", limit=5/10, etc.)
+        metrics_future = executor.submit(_cached_financial_metrics, ticker, end_date=end_date, period="annual", limit=5)
+        # 请求多个时期的数据（年度或TTM）以获得更强健的长期视图
+        # Request multiple periods of data (annual or TTM) for a more robust long-term view.
+        line_items_future = executor.submit(
+            _cached_line_items,
+            ticker,
+            line_items=ACKMAN_LINE_ITEMS,
+            end_date=end_date,
+            period="annual",  # 或"ttm"如果偏好过去12个月 - or "ttm" if you prefer trailing 12 months
+            limit=5           # 获取多达5个年度周期（如需要可更多）- fetch up to 5 annual periods (or more if needed)
+        )
+        market_cap_future = executor.submit(_cached_market_cap, ticker, end_date=end_date)
+        
+        return metrics_future.result(), line_items_future.result(), market_cap_future.result()
+
+
+def _analyze_ticker(ticker: str, end_date: str) -> tuple[str, dict, dict, float, float | None]:
+    """
+    分析单个股票：获取数据并计算业务质量和财务纪律评分
+    （估值在所有股票完成后向量化计算，LLM信号随后批量生成）
+    Analyze a single ticker: fetch data and compute the quality and discipline scores
+    (valuation is vectorized across tickers afterwards, then LLM signals are generated in one batch)
+
+    Returns:
+        (ticker, 业务质量分析 / quality analysis, 财务纪律分析 / balance sheet analysis,
+         最新自由现金流 / latest FCF (NaN when there are no line items), 市值 / market cap)
+    """
+    _progress.update_status("bill_ackman_agent", ticker, "Fetching financial data")
+    metrics, financial_line_items, market_cap = _fetch_ticker_data(ticker, end_date)
     
-    Analyze whether the company has a high-quality business with stable or growing cash flows,
-    durable competitive advantages, and potential for long-term growth.
-    Ackman particularly focuses on:
-    - Strong revenue growth trajectory
-    - Consistent high operating margins
-    - Stable free cash flow generation
-    - High ROE indicating moat presence
+    # 一次性提取各期财务数组，供各项分析共用 - Extract the per-period arrays once for all analyses
+    arrays = _extract_line_item_arrays(financial_line_items)
+    
+    _progress.update_status("bill_ackman_agent", ticker, "Analyzing business quality")
+    # 分析业务质量 - Analyze business quality
+    quality_analysis = analyze_business_quality(metrics, arrays)
+    
+    _progress.update_status("bill_ackman_agent", ticker, "Analyzing balance sheet and capital structure")
+    # 分析资产负债表和资本结构 - Analyze balance sheet and capital structure
+    balance_sheet_analysis = analyze_financial_discipline(metrics, arrays)
+    
+    return ticker, quality_analysis, balance_sheet_analysis, _latest_fcf(arrays), market_cap
+
+
+def _combine_analysis(quality_analysis: dict, balance_sheet_analysis: dict, valuation_analysis: dict) -> dict:
     """
-    score = 0
-    details = []
+    合并各项评分，生成简单的买入/中性/卖出信号
+    Combine the partial scores into a simple buy/neutral/sell signal
+    """
+    # 合并部分评分或信号 - Combine partial scores or signals
+    total_score = quality_analysis["score"] + balance_sheet_analysis["score"] + valuation_analysis["score"]
+    max_possible_score = 15  # 根据需要调整权重 - Adjust weighting as desired
     
-    if not metrics or not financial_line_items:
-        return {
-            "score": 0,
-            "details": "业务质量分析数据不足。"
-        }
+    # 生成简单的买入/持有/卖出（买入/中性/卖出）信号
+    # Generate a simple buy/hold/sell (buy/neutral/sell) signal
+    if total_score >= 0.7 * max_possible_score:
+        signal = "买入"
+    elif total_score <= 0.3 * max_possible_score:
+        signal = "卖出"
+    else:
+        signal = "中性"
+    
+    # 整合所有分析数据 - Combine all analysis data
+    return {
+        "signal": signal,
+        "score": total_score,
+        "max_score": max_possible_score,
+        "quality_analysis": quality_analysis,
+        "balance_sheet_analysis": balance_sheet_analysis,
+        "valuation_analysis": valuation_analysis
+    }
+
+
+# 按期间对齐的财务报表数组（缺失值为NaN）- Period-aligned line-item arrays (NaN when missing)
+_LineItemArrays = namedtuple(
+    "_LineItemArrays",
+    ["revenue", "op_margin", "fcf", "d_e", "div", "shares", "assets", "liab"]
+)
+
+# _LineItemArrays 字段对应的 LineItem 属性 - LineItem attribute behind each _LineItemArrays field
+_LINE_ITEM_FIELDS = _LineItemArrays(
+    revenue="revenue",
+    op_margin="operating_margin",
+    fcf="free_cash_flow",
+    d_e="debt_to_equity",
+    div="dividends_and_other_cash_distributions",
+    shares="outstanding_shares",
+    assets="total_assets",
+    liab="total_liabilities",
+)
+
+
+def _extract_line_item_arrays(financial_line_items: list) -> _LineItemArrays:
+    """
+    一次遍历财务报表项目，每个对象的每个字段只读取一次，提取为float64数组
+    Walk the line items once, reading each field of each object a single time, into float64 arrays
+    """
+    columns = tuple([] for _ in _LINE_ITEM_FIELDS)
+    for item in financial_line_items:
+        for column, name in zip(columns, _LINE_ITEM_FIELDS):
+            value = getattr(item, name, None)
+            column.append(np.nan if value is None else value)
+    return _LineItemArrays._make(np.asarray(column, dtype=np.float64) for column in columns)
+
+
+@njit(cache=True)
+def _valid(values: np.ndarray) -> np.ndarray:
+    """去掉缺失值（NaN）- Drop missing (NaN) values"""
+    return values[~np.isnan(values)]
+
+
+# 业务质量分析的结论标志位 - Outcome flags of the business quality analysis
+QUALITY_REVENUE_GROWTH_HIGH = 1 << 0
+QUALITY_REVENUE_GROWTH_LOW = 1 << 1
+QUALITY_REVENUE_FLAT = 1 << 2
+QUALITY_REVENUE_NO_DATA = 1 << 3
+QUALITY_MARGIN_HIGH = 1 << 4
+QUALITY_MARGIN_LOW = 1 << 5
+QUALITY_MARGIN_NO_DATA = 1 << 6
+QUALITY_FCF_POSITIVE = 1 << 7
+QUALITY_FCF_INCONSISTENT = 1 << 8
+QUALITY_FCF_NO_DATA = 1 << 9
+QUALITY_ROE_HIGH = 1 << 10
+QUALITY_ROE_LOW = 1 << 11
+QUALITY_ROE_NO_DATA = 1 << 12
+
+# 财务纪律分析的结论标志位 - Outcome flags of the financial discipline analysis
+DISCIPLINE_DE_LOW = 1 << 0
+DISCIPLINE_DE_HIGH = 1 << 1
+DISCIPLINE_LIAB_LOW = 1 << 2
+DISCIPLINE_LIAB_HIGH = 1 << 3
+DISCIPLINE_LEVERAGE_NO_DATA = 1 << 4
+DISCIPLINE_DIVIDENDS_PAID = 1 << 5
+DISCIPLINE_DIVIDENDS_INCONSISTENT = 1 << 6
+DISCIPLINE_DIVIDENDS_NO_DATA = 1 << 7
+DISCIPLINE_SHARES_DECREASING = 1 << 8
+DISCIPLINE_SHARES_NOT_DECREASING = 1 << 9
+DISCIPLINE_SHARES_NO_DATA = 1 << 10
+
+
+# 标志位 -> 说明文字。文字只有进入LLM提示时才需要，因此按标志位延迟格式化，评分内核只处理数值
+# Flag -> detail text. The text is only needed for the LLM prompt, so it is formatted lazily from the flags
+# and the scoring kernels stay purely numeric. Formatters receive the numeric extras of the analysis.
+_QUALITY_DETAILS = {
+    QUALITY_REVENUE_GROWTH_HIGH: lambda x: f"收入在整个期间增长了{(x['growth_rate']*100):.1f}%。",
+    QUALITY_REVENUE_GROWTH_LOW: lambda x: f"收入增长为正但累计低于50%（{(x['growth_rate']*100):.1f}%）。",
+    QUALITY_REVENUE_FLAT: lambda x: "收入没有显著增长或数据不足。",
+    QUALITY_REVENUE_NO_DATA: lambda x: "多期趋势的收入数据不足。",
+    QUALITY_MARGIN_HIGH: lambda x: "营业利润率经常超过15%。",
+    QUALITY_MARGIN_LOW: lambda x: "营业利润率未持续保持在15%以上。",
+    QUALITY_MARGIN_NO_DATA: lambda x: "各期间无营业利润率数据。",
+    QUALITY_FCF_POSITIVE: lambda x: "大部分期间显示正自由现金流。",
+    QUALITY_FCF_INCONSISTENT: lambda x: "自由现金流未持续为正。",
+    QUALITY_FCF_NO_DATA: lambda x: "各期间无自由现金流数据。",
+    QUALITY_ROE_HIGH: lambda x: f"高ROE为{x['roe']:.1%}，表明潜在护城河。",
+    QUALITY_ROE_LOW: lambda x: f"ROE为{x['roe']:.1%}，不表明强护城河。",
+    QUALITY_ROE_NO_DATA: lambda x: "指标中无ROE数据。",
+}
+
+_DISCIPLINE_DETAILS = {
+    DISCIPLINE_DE_LOW: lambda x: "大部分期间债务权益比<1.0。",
+    DISCIPLINE_DE_HIGH: lambda x: "许多期间债务权益比≥1.0。",
+    DISCIPLINE_LIAB_LOW: lambda x: "大部分期间负债资产比<50%。",
+    DISCIPLINE_LIAB_HIGH: lambda x: "许多期间负债资产比≥50%。",
+    DISCIPLINE_LEVERAGE_NO_DATA: lambda x: "无一致的杠杆比率数据。",
+    DISCIPLINE_DIVIDENDS_PAID: lambda x: "公司有向股东返还资本的历史（股息）。",
+    DISCIPLINE_DIVIDENDS_INCONSISTENT: lambda x: "股息未持续支付或无数据。",
+    DISCIPLINE_DIVIDENDS_NO_DATA: lambda x: "各期间无股息数据。",
+    DISCIPLINE_SHARES_DECREASING: lambda x: "流通股数随时间减少（可能回购）。",
+    DISCIPLINE_SHARES_NOT_DECREASING: lambda x: "流通股数在可用期间内未减少。",
+    DISCIPLINE_SHARES_NO_DATA: lambda x: "无多期股数数据来评估回购。",
+}
+
+
+def _render_details(flags: int, formatters: dict, **extras) -> str:
+    """按标志位顺序生成说明文字 - Render the detail text of every set flag, in flag order"""
+    return "; ".join(format_detail(extras) for flag, format_detail in formatters.items() if flags & flag)
+
+
+@njit(cache=True)
+def _score_business_quality(revenue: np.ndarray, op_margin: np.ndarray, fcf: np.ndarray, roe: float):
+    """
+    业务质量评分的数值内核，返回 (score, flags, growth_rate)；roe 缺失时传入NaN
+    Numeric core of the business quality score, returns (score, flags, growth_rate); pass NaN for a missing roe
+    """
+    score = 0
+    flags = 0
+    growth_rate = 0.0
     
     # 1. 多期收入增长分析 - Multi-period revenue growth analysis
-    revenues = [getattr(item, 'revenue', None) for item in financial_line_items if getattr(item, 'revenue', None) is not None]
-    if len(revenues) >= 2:
+    revenues = _valid(revenue)
+    if revenues.size >= 2:
         # 检查收入从第一期到最后一期是否整体增长 - Check if overall revenue grew from first to last
-        initial, final = revenues[0], revenues[-1]
-        if initial and final and final > initial:
+        initial = revenues[0]
+        final = revenues[-1]
+        if initial != 0 and final != 0 and final > initial:
             # 简单增长率 - Simple growth rate
             growth_rate = (final - initial) / abs(initial)
             if growth_rate > 0.5:  # 例如，在可用时间内增长50% - e.g., 50% growth over the available time
                 score += 2
-                details.append(f"收入在整个期间增长了{(growth_rate*100):.1f}%。")
+                flags |= QUALITY_REVENUE_GROWTH_HIGH
             else:
                 score += 1
-                details.append(f"收入增长为正但累计低于50%（{(growth_rate*100):.1f}%）。")
+                flags |= QUALITY_REVENUE_GROWTH_LOW
         else:
-            details.append("收入没有显著增长或数据不足。")
+            flags |= QUALITY_REVENUE_FLAT
     else:
-        details.append("多期趋势的收入数据不足。")
+        flags |= QUALITY_REVENUE_NO_DATA
     
     # 2. 营业利润率和自由现金流一致性 - Operating margin and free cash flow consistency
-    # 检查营业利润率或自由现金流是否持续为正/改善
-    # We'll check if operating_margin or free_cash_flow are consistently positive/improving
-    fcf_vals = [getattr(item, 'free_cash_flow', None) for item in financial_line_items if getattr(item, 'free_cash_flow', None) is not None]
-    op_margin_vals = [getattr(item, 'operating_margin', None) for item in financial_line_items if getattr(item, 'operating_margin', None) is not None]
-    
-    if op_margin_vals:
+    op_margin_vals = _valid(op_margin)
+    if op_margin_vals.size:
         # 检查大部分营业利润率是否>15% - Check if the majority of operating margins are > 15%
-        above_15 = sum(1 for m in op_margin_vals if m > 0.15)
-        if above_15 >= (len(op_margin_vals) // 2 + 1):
+        if (op_margin_vals > 0.15).sum() >= op_margin_vals.size // 2 + 1:
             score += 2
-            details.append("营业利润率经常超过15%。")
+            flags |= QUALITY_MARGIN_HIGH
         else:
-            details.append("营业利润率未持续保持在15%以上。")
+            flags |= QUALITY_MARGIN_LOW
     else:
-        details.append("各期间无营业利润率数据。")
+        flags |= QUALITY_MARGIN_NO_DATA
     
-    if fcf_vals:
+    fcf_vals = _valid(fcf)
+    if fcf_vals.size:
         # 检查自由现金流在大部分时期是否为正 - Check if free cash flow is positive in most periods
-        positive_fcf_count = sum(1 for f in fcf_vals if f > 0)
-        if positive_fcf_count >= (len(fcf_vals) // 2 + 1):
+        if (fcf_vals > 0).sum() >= fcf_vals.size // 2 + 1:
             score += 1
-            details.append("大部分期间显示正自由现金流。")
+            flags |= QUALITY_FCF_POSITIVE
         else:
-            details.append("自由现金流未持续为正。")
+            flags |= QUALITY_FCF_INCONSISTENT
     else:
-        details.append("各期间无自由现金流数据。")
+        flags |= QUALITY_FCF_NO_DATA
     
     # 3. 最新指标的股本回报率(ROE)检查 - Return on Equity (ROE) check from the latest metrics
-    # （如果需要多期ROE，也需要在financial_line_items中包含）
-    # (If you want multi-period ROE, you'd need that in financial_line_items as well.)
-    latest_metrics = metrics[0]
-    roe = getattr(latest_metrics, 'return_on_equity', None)
-    if roe and roe > 0.15:
-        score += 2
-        details.append(f"高ROE为{roe:.1%}，表明潜在护城河。")
-    elif roe:
-        details.append(f"ROE为{roe:.1%}，不表明强护城河。")
+    if not np.isnan(roe) and roe != 0:
+        if roe > 0.15:
+            score += 2
+            flags |= QUALITY_ROE_HIGH
+        else:
+            flags |= QUALITY_ROE_LOW
     else:
-        details.append("指标中无ROE数据。")
+        flags |= QUALITY_ROE_NO_DATA
     
-    return {
-        "score": score,
-        "details": "; ".join(details)
-    }
+    return score, flags, growth_rate
 
 
-def analyze_financial_discipline(metrics: list, financial_line_items: list) -> dict:
+@njit(cache=True)
+def _score_financial_discipline(d_e: np.ndarray, liab: np.ndarray, assets: np.ndarray, dividends: np.ndarray, shares: np.ndarray):
     """
-    评估公司在多个期间的资产负债表：
-    - 债务比率趋势
-    - 长期向股东返还资本（股息、回购）
-    
-    Evaluate the company's balance sheet over multiple periods:
-    - Debt ratio trends
-    - Capital returns to shareholders over time (dividends, buybacks)
+    财务纪律评分的数值内核，返回 (score, flags)
+    Numeric core of the financial discipline score, returns (score, flags)
     """
     score = 0
-    details = []
-    
-    if not metrics or not financial_line_items:
-        return {
-            "score": 0,
-            "details": "财务纪律分析数据不足。"
-        }
+    flags = 0
     
     # 1. Multi-period debt ratio or debt_to_equity
-    # Check if the company's leverage is stable or improving
-    debt_to_equity_vals = [getattr(item, 'debt_to_equity', None) for item in financial_line_items 
-                          if getattr(item, 'debt_to_equity', None) is not None]
-    
     # If we have multi-year data, see if D/E ratio has gone down or stayed <1 across most periods
-    if debt_to_equity_vals:
-        below_one_count = sum(1 for d in debt_to_equity_vals if d < 1.0)
-        if below_one_count >= (len(debt_to_equity_vals) // 2 + 1):
+    debt_to_equity_vals = _valid(d_e)
+    if debt_to_equity_vals.size:
+        if (debt_to_equity_vals < 1.0).sum() >= debt_to_equity_vals.size // 2 + 1:
             score += 2
-            details.append("大部分期间债务权益比<1.0。")
+            flags |= DISCIPLINE_DE_LOW
         else:
-            details.append("许多期间债务权益比≥1.0。")
+            flags |= DISCIPLINE_DE_HIGH
     else:
         # Fallback to total_liabilities/total_assets if D/E not available
-        liab_to_assets = []
-        for item in financial_line_items:
-            total_liabilities = getattr(item, 'total_liabilities', None)
-            total_assets = getattr(item, 'total_assets', None)
-            if total_liabilities and total_assets and total_assets > 0:
-                liab_to_assets.append(total_liabilities / total_assets)
-        
-        if liab_to_assets:
-            below_50pct_count = sum(1 for ratio in liab_to_assets if ratio < 0.5)
-            if below_50pct_count >= (len(liab_to_assets) // 2 + 1):
+        # 同一期间两者都有效（负债非零、资产为正）- Both present in the same period (non-zero liabilities, positive assets)
+        mask = ~np.isnan(liab) & (liab != 0) & (assets > 0)
+        liab_to_assets = liab[mask] / assets[mask]
+        if liab_to_assets.size:
+            if (liab_to_assets < 0.5).sum() >= liab_to_assets.size // 2 + 1:
                 score += 2
-                details.append("大部分期间负债资产比<50%。")
+                flags |= DISCIPLINE_LIAB_LOW
             else:
-                details.append("许多期间负债资产比≥50%。")
+                flags |= DISCIPLINE_LIAB_HIGH
         else:
-            details.append("无一致的杠杆比率数据。")
+            flags |= DISCIPLINE_LEVERAGE_NO_DATA
     
     # 2. Capital allocation approach (dividends + share counts)
-    # If the company paid dividends or reduced share count over time, it may reflect discipline
-    dividends_list = [getattr(item, 'dividends_and_other_cash_distributions', None) for item in financial_line_items if getattr(item, 'dividends_and_other_cash_distributions', None) is not None]
-    if dividends_list:
+    dividends_vals = _valid(dividends)
+    if dividends_vals.size:
         # Check if dividends were paid (i.e., negative outflows to shareholders) in most periods
-        paying_dividends_count = sum(1 for d in dividends_list if d < 0)
-        if paying_dividends_count >= (len(dividends_list) // 2 + 1):
+        if (dividends_vals < 0).sum() >= dividends_vals.size // 2 + 1:
             score += 1
-            details.append("公司有向股东返还资本的历史（股息）。")
+            flags |= DISCIPLINE_DIVIDENDS_PAID
         else:
-            details.append("股息未持续支付或无数据。")
+            flags |= DISCIPLINE_DIVIDENDS_INCONSISTENT
     else:
-        details.append("各期间无股息数据。")
+        flags |= DISCIPLINE_DIVIDENDS_NO_DATA
     
-    # Check for decreasing share count (simple approach):
-    # We can compare first vs last if we have at least two data points
-    shares = [getattr(item, 'outstanding_shares', None) for item in financial_line_items if getattr(item, 'outstanding_shares', None) is not None]
-    if len(shares) >= 2:
-        if shares[-1] < shares[0]:
+    # Check for decreasing share count: compare first vs last if we have at least two data points
+    share_vals = _valid(shares)
+    if share_vals.size >= 2:
+        if share_vals[-1] < share_vals[0]:
             score += 1
-            details.append("流通股数随时间减少（可能回购）。")
+            flags |= DISCIPLINE_SHARES_DECREASING
         else:
-            details.append("流通股数在可用期间内未减少。")
+            flags |= DISCIPLINE_SHARES_NOT_DECREASING
     else:
-        details.append("无多期股数数据来评估回购。")
+        flags |= DISCIPLINE_SHARES_NO_DATA
     
-    return {
-        "score": score,
-        "details": "; ".join(details)
-    }
+    return score, flags
 
 
-def analyze_valuation(financial_line_items: list, market_cap: float) -> dict:
+def analyze_business_quality(metrics: list, arrays: _LineItemArrays) -> dict:
     """
-    阿克曼投资于以内在价值折价交易的公司。
-    我们可以做简化的DCF或基于FCF的方法。
-    此函数目前仅使用最新的自由现金流，
-    但可以扩展为使用平均或多年FCF方法。
+    分析公司是否具有高质量的业务，具备稳定或增长的现金流，
+    持久的竞争优势，以及长期增长的潜力
+    阿克曼特别关注：
+    - 强劲的收入增长轨迹
+    - 持续的高运营利润率
+    - 稳定的自由现金流生成
+    - 高股本回报率表明存在护城河
     
-    Ackman invests in companies trading at a discount to intrinsic value.
-    We can do a simplified DCF or an FCF-based approach.
-    This function currently uses the latest free cash flow only, 
-    but you could expand it to use an average or multi-year FCF approach.
+    Analyze whether the company has a high-quality business with stable or growing cash flows,
+    durable competitive advantages, and potential for long-term growth.
+    Ackman particularly focuses on:
+    - Strong revenue growth trajectory
+    - Consistent high operating margins
+    - Stable free cash flow generation
+    - High ROE indicating moat presence
     """
-    if not financial_line_items or market_cap is None:
+    if not metrics or not arrays.revenue.size:
         return {
             "score": 0,
-            "details": "估值数据不足。"
+            "details": "业务质量分析数据不足。"
         }
     
-    # Example: use the most recent item for FCF
-    latest = financial_line_items[-1]  # the last one is presumably the most recent
-    fcf = getattr(latest, 'free_cash_flow', None) or 0
+    # （如果需要多期ROE，也需要在financial_line_items中包含）
+    # (If you want multi-period ROE, you'd need that in financial_line_items as well.)
+    roe = getattr(metrics[0], 'return_on_equity', None)
+    score, flags, growth_rate = _score_business_quality(
+        arrays.revenue, arrays.op_margin, arrays.fcf, np.nan if roe is None else float(roe)
+    )
     
-    # For demonstration, let's do a naive approach:
-    growth_rate = 0.06
-    discount_rate = 0.10
-    terminal_multiple = 15
-    projection_years = 5
+    return {
+        "score": int(score),
+        "details": _render_details(flags, _QUALITY_DETAILS, growth_rate=growth_rate, roe=roe)
+    }
+
+
+def analyze_financial_discipline(metrics: list, arrays: _LineItemArrays) -> dict:
+    """
+    评估公司在多个期间的资产负债表：
+    - 债务比率趋势
+    - 长期向股东返还资本（股息、回购）
     
-    if fcf <= 0:
+    Evaluate the company's balance sheet over multiple periods:
+    - Debt ratio trends
+    - Capital returns to shareholders over time (dividends, buybacks)
+    """
+    if not metrics or not arrays.revenue.size:
         return {
             "score": 0,
-            "details": f"无正FCF进行估值；FCF = {fcf}。",
-            "intrinsic_value": None
+            "details": "财务纪律分析数据不足。"
         }
     
-    present_value = 0
-    for year in range(1, projection_years + 1):
-        future_fcf = fcf * (1 + growth_rate) ** year
-        pv = future_fcf / ((1 + discount_rate) ** year)
-        present_value += pv
+    score, flags = _score_financial_discipline(arrays.d_e, arrays.liab, arrays.assets, arrays.div, arrays.shares)
+    
+    return {
+        "score": int(score),
+        "details": _render_details(flags, _DISCIPLINE_DETAILS)
+    }
+
+
+@njit(cache=True)
+def _dcf_intrinsic_value(fcf, growth_rate: float, discount_rate: float, terminal_multiple: float, projection_years: int):
+    """
+    简化DCF：N年增长的FCF现值（等比数列求和的闭式解）加上终值现值
+    Simplified DCF: present value of N years of growing FCF (closed-form geometric series) plus discounted terminal value
+
+    sum_{t=1..N} fcf*(1+g)^t/(1+r)^t = fcf*(1+g)/(r-g)*(1-q^N)，其中 q=(1+g)/(1+r)（要求 r != g）
+    fcf 可以是标量，也可以是多个股票的NumPy数组 - fcf may be a scalar or a NumPy array of several tickers
+    """
+    q = (1 + growth_rate) / (1 + discount_rate)
+    present_value = fcf * (1 + growth_rate) / (discount_rate - growth_rate) * (1 - q ** projection_years)
     
     # Terminal Value
-    terminal_value = (fcf * (1 + growth_rate) ** projection_years * terminal_multiple) \
-                     / ((1 + discount_rate) ** projection_years)
-    intrinsic_value = present_value + terminal_value
+    terminal_value = fcf * (1 + growth_rate) ** projection_years * terminal_multiple \
+                     * (1 + discount_rate) ** -projection_years
+    return present_value + terminal_value
+
+
+# 简化DCF的参数 - Parameters of the simplified DCF
+DCF_GROWTH_RATE = 0.06
+DCF_DISCOUNT_RATE = 0.10
+DCF_TERMINAL_MULTIPLE = 15
+DCF_PROJECTION_YEARS = 5
+
+
+def _latest_fcf(arrays: _LineItemArrays) -> float:
+    """
+    最新一期的自由现金流（缺失视为0）；没有任何财务报表项目时返回NaN
+    Free cash flow of the most recent period (missing counts as 0); NaN when there are no line items at all
+    """
+    if not arrays.fcf.size:
+        return np.nan
+    fcf = arrays.fcf[-1]  # the last one is presumably the most recent
+    return 0.0 if np.isnan(fcf) else float(fcf)
+
+
+def analyze_valuation_batch(fcf_latest: np.ndarray, market_caps: np.ndarray) -> list[dict]:
+    """
+    阿克曼投资于以内在价值折价交易的公司。
+    对所有股票一次性向量化计算简化DCF内在价值、安全边际和估值评分，
+    目前仅使用最新的自由现金流。
     
-    # Compare with market cap => margin of safety
-    margin_of_safety = (intrinsic_value - market_cap) / market_cap
+    Ackman invests in companies trading at a discount to intrinsic value.
+    Computes the simplified DCF intrinsic value, margin of safety and valuation score
+    for every ticker in one vectorized pass, using the latest free cash flow only.
+
+    Args:
+        fcf_latest: 每个股票的最新FCF，NaN表示没有财务数据 / latest FCF per ticker, NaN when there is no data
+        market_caps: 每个股票的市值，NaN表示缺失 / market cap per ticker, NaN when missing
+    """
+    has_data = ~np.isnan(fcf_latest) & ~np.isnan(market_caps)
+    positive = has_data & (fcf_latest > 0)
     
-    score = 0
-    if margin_of_safety > 0.3:
-        score += 3
-    elif margin_of_safety > 0.1:
-        score += 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        intrinsic_values = np.where(
+            positive,
+            _dcf_intrinsic_value(fcf_latest, DCF_GROWTH_RATE, DCF_DISCOUNT_RATE, DCF_TERMINAL_MULTIPLE, DCF_PROJECTION_YEARS),
+            np.nan
+        )
+        # Compare with market cap => margin of safety
+        margins_of_safety = (intrinsic_values - market_caps) / market_caps
+    scores = np.where(margins_of_safety > 0.3, 3, np.where(margins_of_safety > 0.1, 1, 0))
     
-    details = [
-        f"计算内在价值：~{intrinsic_value:,.2f} / Calculated intrinsic value: ~{intrinsic_value:,.2f}",
-        f"市值：~{market_cap:,.2f} / Market cap: ~{market_cap:,.2f}",
-        f"安全边际：{margin_of_safety:.2%} / Margin of safety: {margin_of_safety:.2%}"
-    ]
+    valuations = []
+    for i in range(len(fcf_latest)):
+        if not has_data[i]:
+            valuations.append({
+                "score": 0,
+                "details": "估值数据不足。"
+            })
+            continue
+        
+        if not positive[i]:
+            fcf = fcf_latest[i]
+            valuations.append({
+                "score": 0,
+                "details": f"无正FCF进行估值；FCF = {fcf}。",
+                "intrinsic_value": None
+            })
+            continue
+        
+        intrinsic_value = float(intrinsic_values[i])
+        market_cap = float(market_caps[i])
+        margin_of_safety = float(margins_of_safety[i])
+        details = [
+            f"计算内在价值：~{intrinsic_value:,.2f} / Calculated intrinsic value: ~{intrinsic_value:,.2f}",
+            f"市值：~{market_cap:,.2f} / Market cap: ~{market_cap:,.2f}",
+            f"安全边际：{margin_of_safety:.2%} / Margin of safety: {margin_of_safety:.2%}"
+        ]
+        valuations.append({
+            "score": int(scores[i]),
+            "details": "; ".join(details),
+            "intrinsic_value": intrinsic_value,
+            "margin_of_safety": margin_of_safety
+        })
     
-    return {
-        "score": score,
-        "details": "; ".join(details),
-        "intrinsic_value": intrinsic_value,
-        "margin_of_safety": margin_of_safety
-    }
+    return valuations
 
 
-def generate_ackman_output(
-    ticker: str,
-    analysis_data: dict[str, any],
-) -> BillAckmanSignal:
-    """
-    基于比尔·阿克曼的风格生成投资决策
-    Generates investment decisions in the style of Bill Ackman.
-    """
-    template = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            """你是比尔·阿克曼的人工智能代理，使用他的原则做出投资决策：
+# 阿克曼分析的系统提示 - System prompt for the Ackman calls
+_ACKMAN_SYSTEM_PROMPT = """你是比尔·阿克曼的人工智能代理，使用他的原则做出投资决策：
 
             1. 寻找具有持久竞争优势（护城河）的高质量企业。
             2. 优先考虑持续的自由现金流和增长潜力。
@@ -435,39 +674,129 @@ def generate_ackman_output(
               "confidence": 0到100之间的浮点数,
               "reasoning": "字符串"
             }}"""
-        ),
-        (
-            "human",
-            """基于以下分析，创建阿克曼风格的投资信号。
 
-            {ticker}的分析数据：
+# 提示模板在模块加载时构建一次，每次调用直接复用 - The prompt template is built once at import and reused per call
+_ACKMAN_BATCH_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        _ACKMAN_SYSTEM_PROMPT
+    ),
+    (
+        "human",
+        """基于以下分析，为每个股票创建阿克曼风格的投资信号。
+
+            股票：{tickers}
+
+            各股票的分析数据：
             {analysis_data}
 
-            完全按照以下JSON格式返回交易信号：
+            返回以股票代码为键的JSON对象，每个值完全按照上述交易信号格式：
             {{
-              "signal": "买入" | "卖出" | "中性",
-              "confidence": 0到100之间的浮点数,
-              "reasoning": "字符串"
+              "TICKER1": {{
+                "signal": "买入" | "卖出" | "中性",
+                "confidence": 0到100之间的浮点数,
+                "reasoning": "字符串"
+              }},
+              "TICKER2": {{
+                ...
+              }}
             }}
             """
-        )
-    ])
+    )
+])
 
-    prompt = template.invoke({
-        "analysis_data": json.dumps(analysis_data, indent=2),
-        "ticker": ticker
-    })
+# 提示模板的版本，修改提示时递增，使旧的缓存结论失效 - Prompt version; bump it when the prompts change to invalidate cached verdicts
+_ACKMAN_PROMPT_VERSION = "bill_ackman_v1"
 
-    def create_default_bill_ackman_signal():
-        return BillAckmanSignal(
-            signal="中性",
-            confidence=0.0,
-            reasoning="分析错误，默认为中性。"
-        )
+_DEFAULT_REASONING = "分析错误，默认为中性。"
+
+
+def _default_ackman_signal() -> BillAckmanSignal:
+    """LLM调用失败时的默认信号 - Default signal when the LLM call fails"""
+    return BillAckmanSignal(
+        signal="中性",
+        confidence=0.0,
+        reasoning=_DEFAULT_REASONING
+    )
+
+
+def _default_ackman_batch(tickers: tuple[str, ...]) -> BillAckmanBatch:
+    """LLM批量调用失败时的默认信号 - Default signals when the batch LLM call fails"""
+    return BillAckmanBatch({ticker: _default_ackman_signal() for ticker in tickers})
+
+
+def _is_default_signal(signal: BillAckmanSignal) -> bool:
+    """是否为失败时的默认信号（不应缓存）- Whether this is the failure default (must not be cached)"""
+    return signal.confidence == 0.0 and signal.reasoning == _DEFAULT_REASONING
+
+
+def _llm_cache_params(analysis_data: dict[str, any]) -> dict:
+    """LLM输出缓存的键：模型、提示版本和分析数据的哈希 - LLM output cache key: model, prompt version and a hash of the analysis data"""
+    return {
+        "model": get_model_id(),
+        "prompt": _ACKMAN_PROMPT_VERSION,
+        "analysis": content_hash(analysis_data)
+    }
 
-    return call_llm(
+
+def _load_cached_signal(ticker: str, cache_params: dict) -> BillAckmanSignal | None:
+    """读取缓存的LLM信号 - Load a cached LLM signal"""
+    cached = _file_cache.get("ackman_llm", ticker, "signal", cache_params, LLM_OUTPUT_CACHE_TTL)
+    if cached is None:
+        return None
+    _progress.update_status("bill_ackman_agent", ticker, "LLM cache hit")
+    # 缓存内容是之前校验过的LLM输出，跳过重复校验；新的LLM输出仍由 call_llm 校验
+    # The cached payload was validated when first produced, so skip re-validation; fresh LLM output is still validated
+    return BillAckmanSignal.model_construct(**cached)
+
+
+def generate_ackman_output_batch(
+    analysis_data: dict[str, dict],
+    use_cache: bool = True,
+) -> dict[str, BillAckmanSignal]:
+    """
+    一次LLM调用为多个股票生成阿克曼风格的投资决策
+    Generates Ackman-style investment decisions for several tickers in a single LLM call.
+
+    每个股票先查LLM输出缓存，只有未命中的股票进入批量提示
+    Each ticker is looked up in the LLM output cache first; only the misses go into the batch prompt.
+    """
+    signals = {}
+    pending = {}
+    cache_params = {}
+    for ticker, ticker_analysis in analysis_data.items():
+        cache_params[ticker] = _llm_cache_params({ticker: ticker_analysis})
+        cached = _load_cached_signal(ticker, cache_params[ticker]) if use_cache else None
+        if cached is not None:
+            signals[ticker] = cached
+        else:
+            pending[ticker] = ticker_analysis
+    
+    if not pending:
+        return signals
+    
+    for ticker in pending:
+        _progress.update_status("bill_ackman_agent", ticker, "Generating Ackman analysis")
+    
+    prompt = _ACKMAN_BATCH_PROMPT_TEMPLATE.invoke({
+        "analysis_data": dumps(pending),
+        "tickers": ", ".join(pending)
+    })
+
+    result = call_llm(
         prompt=prompt, 
-        pydantic_model=BillAckmanSignal, 
+        pydantic_model=BillAckmanBatch, 
         agent_name="bill_ackman_agent", 
-        default_factory=create_default_bill_ackman_signal,
+        default_factory=partial(_default_ackman_batch, tuple(pending)),
     )
+    
+    for ticker in pending:
+        signal = result.root.get(ticker)
+        if signal is None:
+            # LLM漏掉的股票使用默认信号，不缓存 - Tickers missing from the LLM output get the default, uncached
+            signal = _default_ackman_signal()
+        elif not _is_default_signal(signal):
+            _file_cache.set("ackman_llm", ticker, "signal", cache_params[ticker], signal.model_dump())
+        signals[ticker] = signal
+    
+    return signals
@@ -1,28 +1,77 @@
 from langchain_openai import ChatOpenAI
 from graph.state import AgentState, show_agent_reasoning
 from tools.api import get_financial_metrics, get_market_cap, search_line_items
+from data.cache import (
+    HISTORICAL_FINANCIALS_CACHE_TTL,
+    MARKET_CAP_CACHE_TTL,
+    RECENT_FINANCIALS_CACHE_TTL,
+    cached_fetch,
+    get_file_cache,
+)
+from data.models import FinancialMetrics, LineItem
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage
-from pydantic import BaseModel
-import json
-from typing_extensions import Literal
-from utils.progress import progress
-from utils.llm import call_llm
+from pydantic import BaseModel, field_validator
+import asyncio
+import numpy as np
+from enum import IntEnum
+from functools import lru_cache
+from utils.progress import progress, ProgressProxy
+from utils.llm import call_llm_batch
+from llm.models import get_model_id
+from utils.jit import njit, NUMBA_AVAILABLE
+from utils.serialization import content_hash, dumps
 
 """
 Cathie Wood颠覆性创新分析师代理 - 基于凯西·伍德的颠覆性创新投资策略
 Cathie Wood disruptive innovation analyst agent - Based on Cathie Wood's disruptive innovation investment strategy
 """
 
+# 进度更新经后台队列转发，并发处理股票时不会阻塞在渲染锁上
+# Progress updates go through a background queue so concurrent tickers never block on rendering
+_progress = ProgressProxy(progress)
+
+
+class Signal(IntEnum):
+    """
+    交易信号，整数值可以直接求和用于多空投票
+    Trading signal; the integer values sum directly for consensus voting
+    """
+    BEARISH = -1
+    NEUTRAL = 0
+    BULLISH = 1
+
+
+# 信号的显示标签，与其他分析师输出的字符串保持一致
+# Display labels, matching the strings the other analysts emit
+SIGNAL_LABELS = {
+    Signal.BULLISH: "买入",
+    Signal.BEARISH: "卖出",
+    Signal.NEUTRAL: "中性",
+}
+_SIGNALS_BY_LABEL = {
+    **{label: signal for signal, label in SIGNAL_LABELS.items()},
+    **{signal.name.lower(): signal for signal in Signal},
+}
+
+
 class CathieWoodSignal(BaseModel):
     """
     凯西·伍德分析信号模型 - 包含投资信号、置信度和推理
     Cathie Wood analysis signal model - Contains investment signal, confidence and reasoning
     """
-    signal: Literal["买入", "卖出", "中性"]
+    signal: Signal
     confidence: float
     reasoning: str
 
+    @field_validator("signal", mode="before")
+    @classmethod
+    def _parse_signal(cls, value):
+        """LLM输出的是标签字符串（买入/卖出/中性）- The LLM answers with label strings (买入/卖出/中性)"""
+        if isinstance(value, str):
+            return _SIGNALS_BY_LABEL.get(value.strip().lower(), value)
+        return value
+
 
 def cathie_wood_agent(state: AgentState):
     """
@@ -45,94 +94,35 @@ def cathie_wood_agent(state: AgentState):
     data = state["data"]
     end_date = data["end_date"]
     tickers = data["tickers"]
+    # 元数据中设置 no_cache 时跳过LLM输出缓存 - Skip the LLM output cache when the metadata sets no_cache
+    use_cache = not state["metadata"].get("no_cache", False)
 
-    # 收集分析数据 - Collect analysis data
-    analysis_data = {}
-    cw_analysis = {}
-
-    for ticker in tickers:
-        progress.update_status("cathie_wood_agent", ticker, "Fetching financial metrics")
-        # 可以调整这些参数（period="annual"/"ttm", limit=5/10等）
-        # You can adjust these parameters (period="annual"/"ttm", limit=5/10, etc.)
-        metrics = get_financial_metrics(ticker, end_date, period="annual", limit=5)
-
-        progress.update_status("cathie_wood_agent", ticker, "Gathering financial line items")
-        # 请求多个时期的数据（年度或TTM）以获得更强健的视图
-        # Request multiple periods of data (annual or TTM) for a more robust view.
-        financial_line_items = search_line_items(
-            ticker,
-            [
-                "revenue",  # 收入
-                "gross_margin",  # 毛利率
-                "operating_margin",  # 营业利润率
-                "debt_to_equity",  # 债务股权比
-                "free_cash_flow",  # 自由现金流
-                "total_assets",  # 总资产
-                "total_liabilities",  # 总负债
-                "dividends_and_other_cash_distributions",  # 分红和其他现金分配
-                "outstanding_shares",  # 流通股数
-                "research_and_development",  # 研发费用
-                "capital_expenditure",  # 资本支出
-                "operating_expense",  # 运营费用
-            ],
-            end_date,
-            period="annual",
-            limit=5
-        )
-
-        progress.update_status("cathie_wood_agent", ticker, "Getting market cap")
-        market_cap = get_market_cap(ticker, end_date)
+    # 第一步：并发获取数据并评分 - Pass 1: fetch and score every ticker concurrently
+    analysis_data = dict(asyncio.run(_process_tickers(tickers, end_date)))
 
-        progress.update_status("cathie_wood_agent", ticker, "Analyzing disruptive potential")
-        # 分析颠覆性潜力 - Analyze disruptive potential
-        disruptive_analysis = analyze_disruptive_potential(metrics, financial_line_items)
-
-        progress.update_status("cathie_wood_agent", ticker, "Analyzing innovation-driven growth")
-        # 分析创新驱动的增长 - Analyze innovation-driven growth
-        innovation_analysis = analyze_innovation_growth(metrics, financial_line_items)
-
-        progress.update_status("cathie_wood_agent", ticker, "Calculating valuation & high-growth scenario")
-        # 计算估值和高增长情景 - Calculate valuation & high-growth scenario
-        valuation_analysis = analyze_cathie_wood_valuation(financial_line_items, market_cap)
-
-        # 合并部分评分或信号 - Combine partial scores or signals
-        total_score = disruptive_analysis["score"] + innovation_analysis["score"] + valuation_analysis["score"]
-        max_possible_score = 15  # 根据需要调整权重 - Adjust weighting as desired
-
-        if total_score >= 0.7 * max_possible_score:
-            signal = "bullish"
-        elif total_score <= 0.3 * max_possible_score:
-            signal = "bearish"
-        else:
-            signal = "neutral"
-
-        # 整合所有分析数据 - Combine all analysis data
-        analysis_data[ticker] = {
-            "signal": signal,
-            "score": total_score,
-            "max_score": max_possible_score,
-            "disruptive_analysis": disruptive_analysis,
-            "innovation_analysis": innovation_analysis,
-            "valuation_analysis": valuation_analysis
-        }
-
-        progress.update_status("cathie_wood_agent", ticker, "Generating Cathie Wood style analysis")
-        cw_output = generate_cathie_wood_output(
-            ticker=ticker,
-            analysis_data=analysis_data,
-        )
+    # 第二步：所有股票的LLM调用作为一个批次发送，数据不足的股票不调用LLM
+    # Pass 2: send every ticker's LLM call as one batch; tickers with insufficient data skip the LLM
+    cw_outputs = generate_cathie_wood_outputs(
+        {ticker: ticker_analysis for ticker, ticker_analysis in analysis_data.items() if ticker_analysis is not None},
+        use_cache,
+    )
 
+    # 结果字典按股票数量一次分配好，循环中只填充 - Size the result dict for every ticker once and fill it in place
+    cw_analysis = dict.fromkeys(tickers)
+    for ticker in cw_analysis:
+        cw_output = cw_outputs.get(ticker) or _insufficient_data_signal()
         cw_analysis[ticker] = {
-            "signal": cw_output.signal,
+            "signal": SIGNAL_LABELS[cw_output.signal],
             "confidence": cw_output.confidence,
             "reasoning": cw_output.reasoning
         }
-
-        progress.update_status("cathie_wood_agent", ticker, "Done")
+        _progress.update_status("cathie_wood_agent", ticker, "Done")
+    # 返回前确保所有排队的进度都已显示 - Make sure every queued update is shown before returning
+    _progress.flush()
 
     # 将结果包装在单个消息中 - Wrap results in a single message
     message = HumanMessage(
-        content=json.dumps(cw_analysis),
+        content=dumps(cw_analysis),
         name="cathie_wood_agent"
     )
 
@@ -149,128 +139,382 @@ def cathie_wood_agent(state: AgentState):
     }
 
 
-def analyze_disruptive_potential(metrics: list, financial_line_items: list) -> dict:
+# 同时处理的股票数量上限，限制对数据源和LLM的并发请求
+# Maximum number of tickers processed at once, bounding concurrent data provider and LLM requests
+MAX_CONCURRENT_TICKERS = 5
+
+# 请求多个时期的数据（年度或TTM）以获得更强健的视图
+# Request multiple periods of data (annual or TTM) for a more robust view.
+CATHIE_WOOD_LINE_ITEMS = [
+    "revenue",  # 收入
+    "gross_margin",  # 毛利率
+    "operating_margin",  # 营业利润率
+    "debt_to_equity",  # 债务股权比
+    "free_cash_flow",  # 自由现金流
+    "total_assets",  # 总资产
+    "total_liabilities",  # 总负债
+    "dividends_and_other_cash_distributions",  # 分红和其他现金分配
+    "outstanding_shares",  # 流通股数
+    "research_and_development",  # 研发费用
+    "capital_expenditure",  # 资本支出
+    "operating_expense",  # 运营费用
+]
+
+
+# 相同输入的LLM结论在磁盘上的缓存有效期 - On-disk TTL for LLM verdicts on identical inputs
+LLM_OUTPUT_CACHE_TTL = 7 * 24 * 60 * 60
+
+_file_cache = get_file_cache()
+
+
+def _report_cache_hit(ticker: str, endpoint: str):
+    """数据请求命中磁盘缓存时更新进度 - Report an on-disk cache hit for a data request"""
+    _progress.update_status("cathie_wood_agent", ticker, f"{endpoint} cache hit")
+
+
+# 数据请求的磁盘缓存与其他代理共用 - The on-disk cache for data requests is shared with the other agents
+_cached_financial_metrics = cached_fetch(
+    get_financial_metrics, "financial_metrics", RECENT_FINANCIALS_CACHE_TTL, HISTORICAL_FINANCIALS_CACHE_TTL,
+    model=FinancialMetrics, on_hit=_report_cache_hit,
+)
+_cached_line_items = cached_fetch(
+    search_line_items, "line_items", RECENT_FINANCIALS_CACHE_TTL, HISTORICAL_FINANCIALS_CACHE_TTL,
+    model=LineItem, on_hit=_report_cache_hit,
+)
+_cached_market_cap = cached_fetch(get_market_cap, "market_cap", MARKET_CAP_CACHE_TTL, on_hit=_report_cache_hit)
+
+
+def _extract_series(financial_line_items: list) -> dict[str, np.ndarray]:
     """
-    分析公司是否具有颠覆性产品、技术或商业模式
-    评估颠覆性潜力的多个维度：
-    1. 收入增长加速 - 表明市场采用情况
-    2. 研发强度 - 显示创新投资水平
-    3. 毛利率趋势 - 暗示定价权和可扩展性
-    4. 运营杠杆 - 展示商业模式效率
-    5. 市场份额动态 - 表明竞争地位
+    将财务报表项目的每个字段提取为float64数组（缺失值为NaN），各分析函数共用
+    Extract every line item field into a float64 array (missing values as NaN), shared by the analyzers
+
+    报表项目是 LineItem 的额外字段，且只在有数据时才设置，因此直接读取额外字段字典，
+    用 dict.get 代替 hasattr/getattr（属性不存在时会走异常路径）
+    Line items are LineItem extra fields that are only set when data exists, so read the extras dict
+    directly: dict.get replaces hasattr/getattr, which go through an exception when the attribute is missing
+    """
+    # 只遍历一次报表项目，构建 期间 x 字段 的表；float64 数组中 None 会转为 NaN
+    # Walk the line items once into a period x field table; None becomes NaN in a float64 array
+    table = np.array(
+        [[extra.get(field) for field in CATHIE_WOOD_LINE_ITEMS] for extra in (item.model_extra or {} for item in financial_line_items)],
+        dtype=np.float64,
+    ).reshape(len(financial_line_items), len(CATHIE_WOOD_LINE_ITEMS))
+    # 转置并复制，使每个字段的数组在内存中连续 - Transpose and copy so each field's array is contiguous
+    return dict(zip(CATHIE_WOOD_LINE_ITEMS, table.T.copy()))
+
+
+@njit(cache=True)
+def _present(values: np.ndarray) -> np.ndarray:
+    """有数据的期间（对应 is not None 过滤）- Periods with data (the `is not None` filter)"""
+    return values[~np.isnan(values)]
+
+
+@njit(cache=True)
+def _nonzero(values: np.ndarray) -> np.ndarray:
+    """有数据且非零的期间（对应真值过滤）- Periods with non-zero data (the truthiness filter)"""
+    return values[~np.isnan(values) & (values != 0)]
+
+
+async def _process_tickers(tickers: list[str], end_date: str) -> list[tuple]:
+    """
+    并发分析所有股票，按输入顺序返回 (ticker, analysis)
+    Analyze every ticker concurrently and return (ticker, analysis) in input order
+    """
+    # 信号量需要在运行中的事件循环内创建 - The semaphore must be created inside the running event loop
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TICKERS)
+    return await asyncio.gather(*(_process_ticker(ticker, end_date, semaphore) for ticker in tickers))
+
+
+async def _process_ticker(ticker: str, end_date: str, semaphore: asyncio.Semaphore) -> tuple:
+    """
+    获取单个股票的数据并评分，数据不足时返回 (ticker, None)
+    阻塞的数据请求在线程中运行，财务指标和市值并发请求，两者都有时才请求报表项目
     
-    Analyze whether the company has disruptive products, technology, or business model.
-    Evaluates multiple dimensions of disruptive potential:
-    1. Revenue Growth Acceleration - indicates market adoption
-    2. R&D Intensity - shows innovation investment
-    3. Gross Margin Trends - suggests pricing power and scalability
-    4. Operating Leverage - demonstrates business model efficiency
-    5. Market Share Dynamics - indicates competitive position
+    Fetch and score one ticker, returning (ticker, None) when the data is insufficient.
+    Blocking data requests run in threads; metrics and market cap are requested concurrently,
+    and line items only when both are present.
     """
-    score = 0
-    details = []
+    async with semaphore:
+        _progress.update_status("cathie_wood_agent", ticker, "Fetching financial data")
+        # 可以调整这些参数（period="annual"/"ttm", limit=5/10等）
+        # You can adjust these parameters (period="annual"/"ttm", limit=5/10, etc.)
+        metrics, market_cap = await asyncio.gather(
+            asyncio.to_thread(_cached_financial_metrics, ticker, end_date=end_date, period="annual", limit=5),
+            asyncio.to_thread(_cached_market_cap, ticker, end_date=end_date),
+        )
+        # 没有财务指标或市值时不再请求报表项目，直接返回中性信号
+        # Without metrics or market cap, skip the line item request and go straight to a neutral signal
+        if not metrics or market_cap is None:
+            _progress.update_status("cathie_wood_agent", ticker, "Insufficient data, skipping analysis")
+            return ticker, None
+
+        financial_line_items = await asyncio.to_thread(
+            _cached_line_items, ticker, line_items=CATHIE_WOOD_LINE_ITEMS, end_date=end_date, period="annual", limit=5
+        )
+        # 少于两个期间无法计算任何趋势 - Fewer than two periods leaves no trend to analyze
+        if len(financial_line_items) < 2:
+            _progress.update_status("cathie_wood_agent", ticker, "Insufficient data, skipping analysis")
+            return ticker, None
 
-    if not metrics or not financial_line_items:
-        return {
-            "score": 0,
-            "details": "Insufficient data to analyze disruptive potential"
-        }
+        _progress.update_status("cathie_wood_agent", ticker, "Analyzing disruptive potential, growth & valuation")
+        # 评分只需不到一毫秒，直接在事件循环中计算 - Scoring takes well under a millisecond, so run it inline on the event loop
+        ticker_analysis = _score_ticker(metrics, financial_line_items, market_cap)
+
+        return ticker, ticker_analysis
+
+
+def _score_ticker(metrics: list, financial_line_items: list, market_cap: float) -> dict:
+    """
+    对单个股票的数据评分，纯函数，不依赖任何共享状态
+    Score one ticker's data; a pure function that touches no shared state
+    """
+    # 财务报表项目只提取一次，三个分析函数共用 - Extract the line items once for all three analyzers
+    series = _extract_series(financial_line_items)
+
+    # 分析颠覆性潜力 - Analyze disruptive potential
+    disruptive_analysis = analyze_disruptive_potential(metrics, series)
+
+    # 分析创新驱动的增长 - Analyze innovation-driven growth
+    innovation_analysis = analyze_innovation_growth(metrics, series)
+
+    # 计算估值和高增长情景 - Calculate valuation & high-growth scenario
+    valuation_analysis = analyze_cathie_wood_valuation(series, market_cap)
+
+    # 合并部分评分或信号 - Combine partial scores or signals
+    total_score = disruptive_analysis["score"] + innovation_analysis["score"] + valuation_analysis["score"]
+    max_possible_score = 15  # 根据需要调整权重 - Adjust weighting as desired
+
+    if total_score >= 0.7 * max_possible_score:
+        signal = Signal.BULLISH
+    elif total_score <= 0.3 * max_possible_score:
+        signal = Signal.BEARISH
+    else:
+        signal = Signal.NEUTRAL
+
+    # 整合所有分析数据 - Combine all analysis data
+    return {
+        "signal": SIGNAL_LABELS[signal],
+        "score": total_score,
+        "max_score": max_possible_score,
+        "disruptive_analysis": disruptive_analysis,
+        "innovation_analysis": innovation_analysis,
+        "valuation_analysis": valuation_analysis
+    }
+
+
+# 评分档位表：阈值升序排列，_tier 返回数值严格大于的阈值个数，作为分数和说明的下标
+# Score tier tables: thresholds are ascending and _tier returns how many of them the value strictly exceeds,
+# which indexes the points and labels (equivalent to the original `>` if/elif ladders)
+_GROWTH_THRESHOLDS = (0.2, 0.5, 1.0)
+_GROWTH_POINTS = (0, 1, 2, 3)
+_LIMITED_GROWTH_POINTS = (0, 0, 1, 2)  # 只有两个期间时分数减半 - lower points with only two periods
+_GROWTH_LABELS = ("Limited", "Moderate", "Strong", "Exceptional")
+
+_MARGIN_TREND_THRESHOLDS = (0.0, 0.05)  # 毛利率改善 - gross margin improvement
+_MARGIN_TREND_LABELS = ("", "Slightly improving", "Expanding")
+
+_RD_INTENSITY_THRESHOLDS = (0.05, 0.08, 0.15)  # 研发占收入比例 - R&D as a share of revenue
+_RD_INTENSITY_LABELS = ("", "Some", "Moderate", "High")
+
+_RD_GROWTH_THRESHOLDS = (0.2, 0.5)
+_RD_GROWTH_POINTS = (0, 2, 3)
+_RD_GROWTH_LABELS = ("", "Moderate", "Strong")
+
+# 派息率按 < 比较，用 _tier_at_or_below - Payout ratio compares with <, so it uses _tier_at_or_below
+_PAYOUT_THRESHOLDS = (0.2, 0.4)
+_PAYOUT_POINTS = (2, 1, 0)
+_PAYOUT_LABELS = ("Strong", "Moderate", "")
+
+_MARGIN_OF_SAFETY_THRESHOLDS = (0.2, 0.5)
+_MARGIN_OF_SAFETY_POINTS = (0, 1, 3)
+
+
+@njit(cache=True)
+def _tier(value, thresholds) -> int:
+    """数值严格大于的阈值个数（NaN 为 0，同 bisect_left）- Number of thresholds the value strictly exceeds (0 for NaN, like bisect_left)"""
+    tier = 0
+    for threshold in thresholds:
+        if value > threshold:
+            tier += 1
+    return tier
+
+
+@njit(cache=True)
+def _tier_at_or_below(value, thresholds) -> int:
+    """不大于数值的阈值个数（NaN 为全部，同 bisect_right）- Number of thresholds not above the value (all for NaN, like bisect_right)"""
+    tier = 0
+    for threshold in thresholds:
+        if not value < threshold:
+            tier += 1
+    return tier
+
+
+# 颠覆性潜力分析的结论标志位 - Outcome flags of the disruptive potential analysis
+DISRUPT_REVENUE_ACCELERATING = 1 << 0
+DISRUPT_REVENUE_GROWTH = 1 << 1
+DISRUPT_REVENUE_GROWTH_LIMITED = 1 << 2
+DISRUPT_REVENUE_NO_DATA = 1 << 3
+DISRUPT_MARGIN_IMPROVING = 1 << 4
+DISRUPT_MARGIN_HIGH = 1 << 5
+DISRUPT_MARGIN_NO_DATA = 1 << 6
+DISRUPT_OPERATING_LEVERAGE = 1 << 7
+DISRUPT_OPERATING_LEVERAGE_NO_DATA = 1 << 8
+DISRUPT_RD_INVESTMENT = 1 << 9
+DISRUPT_RD_NO_DATA = 1 << 10
+
+# 创新增长分析的结论标志位 - Outcome flags of the innovation-driven growth analysis
+INNOVATION_RD_GROWTH = 1 << 0
+INNOVATION_RD_INTENSITY_RISING = 1 << 1
+INNOVATION_RD_NO_DATA = 1 << 2
+INNOVATION_FCF_STRONG = 1 << 3
+INNOVATION_FCF_CONSISTENT = 1 << 4
+INNOVATION_FCF_MODERATE = 1 << 5
+INNOVATION_FCF_NO_DATA = 1 << 6
+INNOVATION_OP_MARGIN_STRONG = 1 << 7
+INNOVATION_OP_MARGIN_HEALTHY = 1 << 8
+INNOVATION_OP_MARGIN_IMPROVING = 1 << 9
+INNOVATION_OP_MARGIN_NO_DATA = 1 << 10
+INNOVATION_CAPEX_STRONG = 1 << 11
+INNOVATION_CAPEX_MODERATE = 1 << 12
+INNOVATION_CAPEX_NO_DATA = 1 << 13
+INNOVATION_REINVESTMENT = 1 << 14
+INNOVATION_DIVIDENDS_NO_DATA = 1 << 15
+
+# 说明文字用到的数值在各内核 values 数组中的位置 - Positions of the detail values in each kernel's `values` array
+V_FIRST_GROWTH, V_LATEST_GROWTH, V_MARGIN_TREND, V_GROSS_MARGIN, V_RD_INTENSITY = range(5)  # 颠覆性潜力 - disruptive
+V_RD_GROWTH, V_RD_INTENSITY_START, V_RD_INTENSITY_END, V_OP_MARGIN, V_PAYOUT_RATIO = range(5)  # 创新增长 - innovation
+
+
+@njit(cache=True, error_model="numpy")
+def _score_disruptive_potential(revenue: np.ndarray, gross_margin: np.ndarray, operating_expense: np.ndarray, rd: np.ndarray):
+    """
+    颠覆性潜力评分的数值内核，返回 (score, flags, values)
+    Numeric core of the disruptive potential score, returns (score, flags, values)
+    """
+    score = 0
+    flags = 0
+    values = np.zeros(5)
 
     # 1. 收入增长分析 - 检查增长加速情况 - Revenue Growth Analysis - Check for accelerating growth
-    revenues = [item.revenue for item in financial_line_items if item.revenue]
-    if len(revenues) >= 2:  # 降低从3个期间到2个期间的要求 / Lower requirement from 3 to 2 periods
-        if len(revenues) >= 3:
-            # 3个或更多期间：进行增长加速分析 / 3+ periods: perform growth acceleration analysis
-            growth_rates = []
-            for i in range(len(revenues)-1):
-                if revenues[i] and revenues[i+1]:
-                    growth_rate = (revenues[i+1] - revenues[i]) / abs(revenues[i]) if revenues[i] != 0 else 0
-                    growth_rates.append(growth_rate)
-
-            # 检查增长是否在加速 - Check if growth is accelerating
-            if len(growth_rates) >= 2 and growth_rates[-1] > growth_rates[0]:
-                score += 2
-                details.append(f"Revenue growth is accelerating: {(growth_rates[-1]*100):.1f}% vs {(growth_rates[0]*100):.1f}%")
-
-            # 检查绝对增长率 - Check absolute growth rate
-            latest_growth = growth_rates[-1] if growth_rates else 0
-            if latest_growth > 1.0:  # 超过100%的增长 - Over 100% growth
-                score += 3
-                details.append(f"Exceptional revenue growth: {(latest_growth*100):.1f}%")
-            elif latest_growth > 0.5:  # 50%以上增长 - Over 50% growth
-                score += 2
-                details.append(f"Strong revenue growth: {(latest_growth*100):.1f}%")
-            elif latest_growth > 0.2:  # 20%以上增长 - Over 20% growth
-                score += 1
-                details.append(f"Moderate revenue growth: {(latest_growth*100):.1f}%")
-        else:
-            # 只有2个期间：基础增长分析 / Only 2 periods: basic growth analysis
-            if revenues[0] and revenues[1] and revenues[1] != 0:
-                growth_rate = (revenues[0] - revenues[1]) / abs(revenues[1])
-                if growth_rate > 1.0:  # 超过100%的增长
-                    score += 2
-                    details.append(f"Exceptional revenue growth (limited data): {(growth_rate*100):.1f}%")
-                elif growth_rate > 0.5:  # 50%以上增长
-                    score += 1
-                    details.append(f"Strong revenue growth (limited data): {(growth_rate*100):.1f}%")
-                elif growth_rate > 0.2:  # 20%以上增长
-                    details.append(f"Moderate revenue growth (limited data): {(growth_rate*100):.1f}%")
-                else:
-                    details.append(f"Limited revenue growth (limited data): {(growth_rate*100):.1f}%")
+    revenues = _nonzero(revenue)
+    if revenues.size >= 3:
+        # 3个或更多期间：进行增长加速分析 / 3+ periods: perform growth acceleration analysis
+        growth_rates = np.diff(revenues) / np.abs(revenues[:-1])
+        values[V_FIRST_GROWTH] = growth_rates[0]
+        values[V_LATEST_GROWTH] = growth_rates[-1]
+
+        # 检查增长是否在加速 - Check if growth is accelerating
+        if growth_rates[-1] > growth_rates[0]:
+            score += 2
+            flags |= DISRUPT_REVENUE_ACCELERATING
+
+        # 检查绝对增长率 - Check absolute growth rate
+        tier = _tier(growth_rates[-1], _GROWTH_THRESHOLDS)
+        score += _GROWTH_POINTS[tier]
+        if tier:
+            flags |= DISRUPT_REVENUE_GROWTH
+    elif revenues.size == 2:
+        # 只有2个期间：基础增长分析（零值已被过滤）/ Only 2 periods: basic growth analysis (zeros are already filtered out)
+        growth_rate = (revenues[0] - revenues[1]) / abs(revenues[1])
+        values[V_LATEST_GROWTH] = growth_rate
+        score += _LIMITED_GROWTH_POINTS[_tier(growth_rate, _GROWTH_THRESHOLDS)]
+        flags |= DISRUPT_REVENUE_GROWTH_LIMITED
     else:
-        details.append("Insufficient revenue data for growth analysis")
+        flags |= DISRUPT_REVENUE_NO_DATA
 
     # 2. 毛利率分析 - 检查毛利率扩张情况 - Gross Margin Analysis - Check for expanding margins
-    gross_margins = [item.gross_margin for item in financial_line_items if hasattr(item, 'gross_margin') and item.gross_margin is not None]
-    if len(gross_margins) >= 2:
+    gross_margins = _present(gross_margin)
+    if gross_margins.size >= 2:
         margin_trend = gross_margins[-1] - gross_margins[0]
-        if margin_trend > 0.05:  # 5%的改善 - 5% improvement
-            score += 2
-            details.append(f"Expanding gross margins: +{(margin_trend*100):.1f}%")
-        elif margin_trend > 0:
-            score += 1
-            details.append(f"Slightly improving gross margins: +{(margin_trend*100):.1f}%")
+        values[V_MARGIN_TREND] = margin_trend
+        tier = _tier(margin_trend, _MARGIN_TREND_THRESHOLDS)
+        score += tier
+        if tier:
+            flags |= DISRUPT_MARGIN_IMPROVING
 
         # 检查绝对毛利率水平 - Check absolute margin level
+        values[V_GROSS_MARGIN] = gross_margins[-1]
         if gross_margins[-1] > 0.50:  # 高毛利率业务 - High margin business
             score += 2
-            details.append(f"High gross margin: {(gross_margins[-1]*100):.1f}%")
+            flags |= DISRUPT_MARGIN_HIGH
     else:
-        details.append("Insufficient gross margin data")
+        flags |= DISRUPT_MARGIN_NO_DATA
 
     # 3. 运营杠杆分析 - Operating Leverage Analysis
-    revenues = [item.revenue for item in financial_line_items if item.revenue]
-    operating_expenses = [
-        item.operating_expense
-        for item in financial_line_items
-        if hasattr(item, "operating_expense") and item.operating_expense
-    ]
-
-    if len(revenues) >= 2 and len(operating_expenses) >= 2:
+    operating_expenses = _nonzero(operating_expense)
+    if revenues.size >= 2 and operating_expenses.size >= 2:
         rev_growth = (revenues[-1] - revenues[0]) / abs(revenues[0])
         opex_growth = (operating_expenses[-1] - operating_expenses[0]) / abs(operating_expenses[0])
 
         if rev_growth > opex_growth:
             score += 2
-            details.append("Positive operating leverage: Revenue growing faster than expenses")
+            flags |= DISRUPT_OPERATING_LEVERAGE
     else:
-        details.append("Insufficient data for operating leverage analysis")
+        flags |= DISRUPT_OPERATING_LEVERAGE_NO_DATA
 
-    # 4. R&D Investment Analysis
-    rd_expenses = [item.research_and_development for item in financial_line_items if hasattr(item, 'research_and_development') and item.research_and_development is not None]
-    if rd_expenses and revenues:
+    # 4. 研发投入分析 - R&D Investment Analysis
+    rd_expenses = _present(rd)
+    if rd_expenses.size and revenues.size:
         rd_intensity = rd_expenses[-1] / revenues[-1]
-        if rd_intensity > 0.15:  # High R&D intensity
-            score += 3
-            details.append(f"High R&D investment: {(rd_intensity*100):.1f}% of revenue")
-        elif rd_intensity > 0.08:
-            score += 2
-            details.append(f"Moderate R&D investment: {(rd_intensity*100):.1f}% of revenue")
-        elif rd_intensity > 0.05:
-            score += 1
-            details.append(f"Some R&D investment: {(rd_intensity*100):.1f}% of revenue")
+        values[V_RD_INTENSITY] = rd_intensity
+        tier = _tier(rd_intensity, _RD_INTENSITY_THRESHOLDS)
+        score += tier
+        if tier:
+            flags |= DISRUPT_RD_INVESTMENT
     else:
-        details.append("No R&D data available")
+        flags |= DISRUPT_RD_NO_DATA
+
+    return score, flags, values
+
+
+_DISRUPTIVE_DETAILS = {
+    DISRUPT_REVENUE_ACCELERATING: lambda v: f"Revenue growth is accelerating: {(v[V_LATEST_GROWTH]*100):.1f}% vs {(v[V_FIRST_GROWTH]*100):.1f}%",
+    DISRUPT_REVENUE_GROWTH: lambda v: f"{_GROWTH_LABELS[_tier(v[V_LATEST_GROWTH], _GROWTH_THRESHOLDS)]} revenue growth: {(v[V_LATEST_GROWTH]*100):.1f}%",
+    DISRUPT_REVENUE_GROWTH_LIMITED: lambda v: f"{_GROWTH_LABELS[_tier(v[V_LATEST_GROWTH], _GROWTH_THRESHOLDS)]} revenue growth (limited data): {(v[V_LATEST_GROWTH]*100):.1f}%",
+    DISRUPT_REVENUE_NO_DATA: lambda v: "Insufficient revenue data for growth analysis",
+    DISRUPT_MARGIN_IMPROVING: lambda v: f"{_MARGIN_TREND_LABELS[_tier(v[V_MARGIN_TREND], _MARGIN_TREND_THRESHOLDS)]} gross margins: +{(v[V_MARGIN_TREND]*100):.1f}%",
+    DISRUPT_MARGIN_HIGH: lambda v: f"High gross margin: {(v[V_GROSS_MARGIN]*100):.1f}%",
+    DISRUPT_MARGIN_NO_DATA: lambda v: "Insufficient gross margin data",
+    DISRUPT_OPERATING_LEVERAGE: lambda v: "Positive operating leverage: Revenue growing faster than expenses",
+    DISRUPT_OPERATING_LEVERAGE_NO_DATA: lambda v: "Insufficient data for operating leverage analysis",
+    DISRUPT_RD_INVESTMENT: lambda v: f"{_RD_INTENSITY_LABELS[_tier(v[V_RD_INTENSITY], _RD_INTENSITY_THRESHOLDS)]} R&D investment: {(v[V_RD_INTENSITY]*100):.1f}% of revenue",
+    DISRUPT_RD_NO_DATA: lambda v: "No R&D data available",
+}
+
+
+def _render_details(flags: int, formatters: dict, values: np.ndarray) -> str:
+    """按标志位顺序生成说明文字 - Render the detail text of every set flag, in flag order"""
+    return "; ".join(format_detail(values) for flag, format_detail in formatters.items() if flags & flag)
+
+
+def analyze_disruptive_potential(metrics: list, series: dict[str, np.ndarray]) -> dict:
+    """
+    分析公司是否具有颠覆性产品、技术或商业模式
+    评估颠覆性潜力的多个维度：
+    1. 收入增长加速 - 表明市场采用情况
+    2. 研发强度 - 显示创新投资水平
+    3. 毛利率趋势 - 暗示定价权和可扩展性
+    4. 运营杠杆 - 展示商业模式效率
+    5. 市场份额动态 - 表明竞争地位
+    
+    Analyze whether the company has disruptive products, technology, or business model.
+    Evaluates multiple dimensions of disruptive potential:
+    1. Revenue Growth Acceleration - indicates market adoption
+    2. R&D Intensity - shows innovation investment
+    3. Gross Margin Trends - suggests pricing power and scalability
+    4. Operating Leverage - demonstrates business model efficiency
+    5. Market Share Dynamics - indicates competitive position
+    """
+    if not metrics or not series["revenue"].size:
+        return {
+            "score": 0,
+            "details": "Insufficient data to analyze disruptive potential"
+        }
+
+    score, flags, values = _score_disruptive_potential(
+        series["revenue"], series["gross_margin"], series["operating_expense"], series["research_and_development"]
+    )
 
     # Normalize score to be out of 5
     max_possible_score = 12  # Sum of all possible points
@@ -278,125 +522,166 @@ def analyze_disruptive_potential(metrics: list, financial_line_items: list) -> d
 
     return {
         "score": normalized_score,
-        "details": "; ".join(details),
-        "raw_score": score,
+        "details": _render_details(flags, _DISRUPTIVE_DETAILS, values),
+        "raw_score": int(score),
         "max_score": max_possible_score
     }
 
 
-def analyze_innovation_growth(metrics: list, financial_line_items: list) -> dict:
+@njit(cache=True, error_model="numpy")
+def _score_innovation_growth(
+    revenue: np.ndarray,
+    rd: np.ndarray,
+    fcf: np.ndarray,
+    op_margin: np.ndarray,
+    capex: np.ndarray,
+    dividends: np.ndarray,
+):
     """
-    Evaluate the company's commitment to innovation and potential for exponential growth.
-    Analyzes multiple dimensions:
-    1. R&D Investment Trends - measures commitment to innovation
-    2. Free Cash Flow Generation - indicates ability to fund innovation
-    3. Operating Efficiency - shows scalability of innovation
-    4. Capital Allocation - reveals innovation-focused management
-    5. Growth Reinvestment - demonstrates commitment to future growth
+    创新增长评分的数值内核，返回 (score, flags, values)
+    Numeric core of the innovation-driven growth score, returns (score, flags, values)
     """
     score = 0
-    details = []
-
-    if not metrics or not financial_line_items:
-        return {
-            "score": 0,
-            "details": "Insufficient data to analyze innovation-driven growth"
-        }
-
-    # 1. R&D Investment Trends
-    rd_expenses = [
-        item.research_and_development
-        for item in financial_line_items
-        if hasattr(item, "research_and_development") and item.research_and_development
-    ]
-    revenues = [item.revenue for item in financial_line_items if item.revenue]
-
-    if rd_expenses and revenues and len(rd_expenses) >= 2:
-        # Check R&D growth rate
-        rd_growth = (rd_expenses[-1] - rd_expenses[0]) / abs(rd_expenses[0]) if rd_expenses[0] != 0 else 0
-        if rd_growth > 0.5:  # 50% growth in R&D
-            score += 3
-            details.append(f"Strong R&D investment growth: +{(rd_growth*100):.1f}%")
-        elif rd_growth > 0.2:
-            score += 2
-            details.append(f"Moderate R&D investment growth: +{(rd_growth*100):.1f}%")
-
-        # Check R&D intensity trend
+    flags = 0
+    values = np.zeros(5)
+
+    # 1. 研发投入趋势 - R&D Investment Trends
+    rd_expenses = _nonzero(rd)
+    revenues = _nonzero(revenue)
+
+    if revenues.size and rd_expenses.size >= 2:
+        # 检查研发增长率（零值已被过滤）- Check R&D growth rate (zeros are already filtered out)
+        rd_growth = (rd_expenses[-1] - rd_expenses[0]) / abs(rd_expenses[0])
+        values[V_RD_GROWTH] = rd_growth
+        tier = _tier(rd_growth, _RD_GROWTH_THRESHOLDS)
+        score += _RD_GROWTH_POINTS[tier]
+        if tier:
+            flags |= INNOVATION_RD_GROWTH
+
+        # 检查研发强度趋势 - Check R&D intensity trend
         rd_intensity_start = rd_expenses[0] / revenues[0]
         rd_intensity_end = rd_expenses[-1] / revenues[-1]
+        values[V_RD_INTENSITY_START] = rd_intensity_start
+        values[V_RD_INTENSITY_END] = rd_intensity_end
         if rd_intensity_end > rd_intensity_start:
             score += 2
-            details.append(f"Increasing R&D intensity: {(rd_intensity_end*100):.1f}% vs {(rd_intensity_start*100):.1f}%")
+            flags |= INNOVATION_RD_INTENSITY_RISING
     else:
-        details.append("Insufficient R&D data for trend analysis")
+        flags |= INNOVATION_RD_NO_DATA
 
-    # 2. Free Cash Flow Analysis
-    fcf_vals = [item.free_cash_flow for item in financial_line_items if hasattr(item, 'free_cash_flow') and item.free_cash_flow is not None]
-    if fcf_vals and len(fcf_vals) >= 2:
-        # Check FCF growth and consistency
+    # 2. 自由现金流分析 - Free Cash Flow Analysis
+    fcf_vals = _present(fcf)
+    if fcf_vals.size >= 2:
+        # 检查FCF增长和一致性 - Check FCF growth and consistency
         fcf_growth = (fcf_vals[-1] - fcf_vals[0]) / abs(fcf_vals[0])
-        positive_fcf_count = sum(1 for f in fcf_vals if f > 0)
+        positive_fcf_count = (fcf_vals > 0).sum()
 
-        if fcf_growth > 0.3 and positive_fcf_count == len(fcf_vals):
+        if fcf_growth > 0.3 and positive_fcf_count == fcf_vals.size:
             score += 3
-            details.append("Strong and consistent FCF growth, excellent innovation funding capacity")
-        elif positive_fcf_count >= len(fcf_vals) * 0.75:
+            flags |= INNOVATION_FCF_STRONG
+        elif positive_fcf_count >= fcf_vals.size * 0.75:
             score += 2
-            details.append("Consistent positive FCF, good innovation funding capacity")
-        elif positive_fcf_count > len(fcf_vals) * 0.5:
+            flags |= INNOVATION_FCF_CONSISTENT
+        elif positive_fcf_count > fcf_vals.size * 0.5:
             score += 1
-            details.append("Moderately consistent FCF, adequate innovation funding capacity")
+            flags |= INNOVATION_FCF_MODERATE
     else:
-        details.append("Insufficient FCF data for analysis")
+        flags |= INNOVATION_FCF_NO_DATA
 
-    # 3. Operating Efficiency Analysis
-    op_margin_vals = [item.operating_margin for item in financial_line_items 
-                     if hasattr(item, 'operating_margin') and item.operating_margin is not None]
-    
-    if op_margin_vals and len(op_margin_vals) >= 2:
-        # Check margin improvement
+    # 3. 运营效率分析 - Operating Efficiency Analysis
+    op_margin_vals = _present(op_margin)
+    if op_margin_vals.size >= 2:
+        # 检查利润率改善 - Check margin improvement
         margin_trend = op_margin_vals[-1] - op_margin_vals[0]
+        values[V_OP_MARGIN] = op_margin_vals[-1]
 
         if op_margin_vals[-1] > 0.15 and margin_trend > 0:
             score += 3
-            details.append(f"Strong and improving operating margin: {(op_margin_vals[-1]*100):.1f}%")
+            flags |= INNOVATION_OP_MARGIN_STRONG
         elif op_margin_vals[-1] > 0.10:
             score += 2
-            details.append(f"Healthy operating margin: {(op_margin_vals[-1]*100):.1f}%")
+            flags |= INNOVATION_OP_MARGIN_HEALTHY
         elif margin_trend > 0:
             score += 1
-            details.append("Improving operating efficiency")
+            flags |= INNOVATION_OP_MARGIN_IMPROVING
     else:
-        details.append("Insufficient operating margin data")
+        flags |= INNOVATION_OP_MARGIN_NO_DATA
 
-    # 4. Capital Allocation Analysis
-    capex = [item.capital_expenditure for item in financial_line_items if hasattr(item, 'capital_expenditure') and item.capital_expenditure]
-    if capex and revenues and len(capex) >= 2:
-        capex_intensity = abs(capex[-1]) / revenues[-1]
-        capex_growth = (abs(capex[-1]) - abs(capex[0])) / abs(capex[0]) if capex[0] != 0 else 0
+    # 4. 资本配置分析 - Capital Allocation Analysis
+    capex_vals = _nonzero(capex)
+    if revenues.size and capex_vals.size >= 2:
+        capex_intensity = abs(capex_vals[-1]) / revenues[-1]
+        capex_growth = (abs(capex_vals[-1]) - abs(capex_vals[0])) / abs(capex_vals[0])
 
         if capex_intensity > 0.10 and capex_growth > 0.2:
             score += 2
-            details.append("Strong investment in growth infrastructure")
+            flags |= INNOVATION_CAPEX_STRONG
         elif capex_intensity > 0.05:
             score += 1
-            details.append("Moderate investment in growth infrastructure")
+            flags |= INNOVATION_CAPEX_MODERATE
     else:
-        details.append("Insufficient CAPEX data")
-
-    # 5. Growth Reinvestment Analysis
-    dividends = [item.dividends_and_other_cash_distributions for item in financial_line_items if hasattr(item, 'dividends_and_other_cash_distributions') and item.dividends_and_other_cash_distributions]
-    if dividends and fcf_vals:
-        # Check if company prioritizes reinvestment over dividends
-        latest_payout_ratio = dividends[-1] / fcf_vals[-1] if fcf_vals[-1] != 0 else 1
-        if latest_payout_ratio < 0.2:  # Low dividend payout ratio suggests reinvestment focus
-            score += 2
-            details.append("Strong focus on reinvestment over dividends")
-        elif latest_payout_ratio < 0.4:
-            score += 1
-            details.append("Moderate focus on reinvestment over dividends")
+        flags |= INNOVATION_CAPEX_NO_DATA
+
+    # 5. 增长再投资分析 - Growth Reinvestment Analysis
+    dividend_vals = _nonzero(dividends)
+    if dividend_vals.size and fcf_vals.size:
+        # 检查公司是否优先再投资而非分红 - Check if company prioritizes reinvestment over dividends
+        latest_payout_ratio = dividend_vals[-1] / fcf_vals[-1] if fcf_vals[-1] != 0 else 1.0
+        values[V_PAYOUT_RATIO] = latest_payout_ratio
+        points = _PAYOUT_POINTS[_tier_at_or_below(latest_payout_ratio, _PAYOUT_THRESHOLDS)]
+        score += points
+        if points:
+            flags |= INNOVATION_REINVESTMENT
     else:
-        details.append("Insufficient dividend data")
+        flags |= INNOVATION_DIVIDENDS_NO_DATA
+
+    return score, flags, values
+
+
+_INNOVATION_DETAILS = {
+    INNOVATION_RD_GROWTH: lambda v: f"{_RD_GROWTH_LABELS[_tier(v[V_RD_GROWTH], _RD_GROWTH_THRESHOLDS)]} R&D investment growth: +{(v[V_RD_GROWTH]*100):.1f}%",
+    INNOVATION_RD_INTENSITY_RISING: lambda v: f"Increasing R&D intensity: {(v[V_RD_INTENSITY_END]*100):.1f}% vs {(v[V_RD_INTENSITY_START]*100):.1f}%",
+    INNOVATION_RD_NO_DATA: lambda v: "Insufficient R&D data for trend analysis",
+    INNOVATION_FCF_STRONG: lambda v: "Strong and consistent FCF growth, excellent innovation funding capacity",
+    INNOVATION_FCF_CONSISTENT: lambda v: "Consistent positive FCF, good innovation funding capacity",
+    INNOVATION_FCF_MODERATE: lambda v: "Moderately consistent FCF, adequate innovation funding capacity",
+    INNOVATION_FCF_NO_DATA: lambda v: "Insufficient FCF data for analysis",
+    INNOVATION_OP_MARGIN_STRONG: lambda v: f"Strong and improving operating margin: {(v[V_OP_MARGIN]*100):.1f}%",
+    INNOVATION_OP_MARGIN_HEALTHY: lambda v: f"Healthy operating margin: {(v[V_OP_MARGIN]*100):.1f}%",
+    INNOVATION_OP_MARGIN_IMPROVING: lambda v: "Improving operating efficiency",
+    INNOVATION_OP_MARGIN_NO_DATA: lambda v: "Insufficient operating margin data",
+    INNOVATION_CAPEX_STRONG: lambda v: "Strong investment in growth infrastructure",
+    INNOVATION_CAPEX_MODERATE: lambda v: "Moderate investment in growth infrastructure",
+    INNOVATION_CAPEX_NO_DATA: lambda v: "Insufficient CAPEX data",
+    INNOVATION_REINVESTMENT: lambda v: f"{_PAYOUT_LABELS[_tier_at_or_below(v[V_PAYOUT_RATIO], _PAYOUT_THRESHOLDS)]} focus on reinvestment over dividends",
+    INNOVATION_DIVIDENDS_NO_DATA: lambda v: "Insufficient dividend data",
+}
+
+
+def analyze_innovation_growth(metrics: list, series: dict[str, np.ndarray]) -> dict:
+    """
+    Evaluate the company's commitment to innovation and potential for exponential growth.
+    Analyzes multiple dimensions:
+    1. R&D Investment Trends - measures commitment to innovation
+    2. Free Cash Flow Generation - indicates ability to fund innovation
+    3. Operating Efficiency - shows scalability of innovation
+    4. Capital Allocation - reveals innovation-focused management
+    5. Growth Reinvestment - demonstrates commitment to future growth
+    """
+    if not metrics or not series["revenue"].size:
+        return {
+            "score": 0,
+            "details": "Insufficient data to analyze innovation-driven growth"
+        }
+
+    score, flags, values = _score_innovation_growth(
+        series["revenue"],
+        series["research_and_development"],
+        series["free_cash_flow"],
+        series["operating_margin"],
+        series["capital_expenditure"],
+        series["dividends_and_other_cash_distributions"],
+    )
 
     # Normalize score to be out of 5
     max_possible_score = 15  # Sum of all possible points
@@ -404,26 +689,41 @@ def analyze_innovation_growth(metrics: list, financial_line_items: list) -> dict
 
     return {
         "score": normalized_score,
-        "details": "; ".join(details),
-        "raw_score": score,
+        "details": _render_details(flags, _INNOVATION_DETAILS, values),
+        "raw_score": int(score),
         "max_score": max_possible_score
     }
 
 
-def analyze_cathie_wood_valuation(financial_line_items: list, market_cap: float) -> dict:
+@lru_cache(maxsize=32)
+def _dcf_factors(growth_rate: float, discount_rate: float, projection_years: int) -> tuple[float, float]:
+    """
+    DCF的折现系数，只取决于参数，与FCF无关，因此按参数缓存
+    DCF discount factors. They depend only on the parameters, not on FCF, so they are cached per parameter set.
+
+    Returns:
+        (pv_factor, terminal_factor):
+        sum_{t=1..N} ((1+g)/(1+r))^t，以及第N年的 ((1+g)/(1+r))^N / and ((1+g)/(1+r))^N for the final year
+    """
+    years = np.arange(1, projection_years + 1)
+    growth = (1 + growth_rate) ** years / (1 + discount_rate) ** years
+    return float(growth.sum()), float(growth[-1])
+
+
+def analyze_cathie_wood_valuation(series: dict[str, np.ndarray], market_cap: float) -> dict:
     """
     Cathie Wood often focuses on long-term exponential growth potential. We can do
     a simplified approach looking for a large total addressable market (TAM) and the
     company's ability to capture a sizable portion.
     """
-    if not financial_line_items or market_cap is None:
+    if not series["free_cash_flow"].size or market_cap is None:
         return {
             "score": 0,
             "details": "Insufficient data for valuation"
         }
 
-    latest = financial_line_items[-1]
-    fcf = latest.free_cash_flow if latest.free_cash_flow else 0
+    # 最后一个期间的FCF，缺失时为0 - FCF of the last period, 0 when missing
+    fcf = np.nan_to_num(series["free_cash_flow"][-1])
 
     if fcf <= 0:
         return {
@@ -439,24 +739,16 @@ def analyze_cathie_wood_valuation(financial_line_items: list, market_cap: float)
     terminal_multiple = 25
     projection_years = 5
 
-    present_value = 0
-    for year in range(1, projection_years + 1):
-        future_fcf = fcf * (1 + growth_rate) ** year
-        pv = future_fcf / ((1 + discount_rate) ** year)
-        present_value += pv
+    pv_factor, terminal_factor = _dcf_factors(growth_rate, discount_rate, projection_years)
+    present_value = fcf * pv_factor
 
     # Terminal Value
-    terminal_value = (fcf * (1 + growth_rate) ** projection_years * terminal_multiple) \
-                     / ((1 + discount_rate) ** projection_years)
+    terminal_value = fcf * terminal_factor * terminal_multiple
     intrinsic_value = present_value + terminal_value
 
     margin_of_safety = (intrinsic_value - market_cap) / market_cap
 
-    score = 0
-    if margin_of_safety > 0.5:
-        score += 3
-    elif margin_of_safety > 0.2:
-        score += 1
+    score = _MARGIN_OF_SAFETY_POINTS[_tier(margin_of_safety, _MARGIN_OF_SAFETY_THRESHOLDS)]
 
     details = [
         f"Calculated intrinsic value: ~{intrinsic_value:,.2f}",
@@ -472,73 +764,162 @@ def analyze_cathie_wood_valuation(financial_line_items: list, market_cap: float)
     }
 
 
-# 移除了 model_name 和 model_provider 参数，因为模型固定为 GPT-4o
-# Removed model_name and model_provider parameters as the model is fixed to GPT-4o
-def generate_cathie_wood_output(
-    ticker: str,
-    analysis_data: dict[str, any],
-    # model_name: str, # 已移除 (Removed)
-    # model_provider: str, # 已移除 (Removed)
-) -> CathieWoodSignal:
-    """
-    Generates investment decisions in the style of Cathie Wood.
-    """
-    template = ChatPromptTemplate.from_messages([
-        (
-            "system",
-            """你是凯西·伍德的 AI 智能体，运用她的原则进行投资决策：
-            
-            "1. 寻找能够利用颠覆性创新的公司。"
-            "2. 强调指数级增长潜力和巨大的潜在市场。"
-            "3. 专注于科技、医疗保健或其他面向未来的行业。"
-            "4. 考虑多年的投资期限以寻找潜在的突破。"
-            "5. 为追求高回报，接受更高的波动性。"
-            "6. 评估管理层的愿景和研发投资能力。"
-            "规则："
-            "- 识别颠覆性或突破性技术。"
-            "- 评估多年收入增长的强劲潜力。"
-            "- 检查公司是否能够在大型市场中有效扩展。"
-            "- 使用增长导向的估值方法。"
-            "- 提供数据驱动的建议（买入/卖出/中性）。"""
-        ),
-        (
-            "human",
-                """根据以下数据，像凯西·伍德那样创建投资信号。
-
-                股票{ticker} 的分析数据:
-                {analysis_data}
-
-                按照此格式返回 JSON:
-                {{
-                  "signal": "买入/中性/卖出",
-                  "confidence": float (0-100),
-                  "reasoning": "string"
-                }}
-            """,
-        )
-    ])
+def _warmup_kernels():
+    """
+    用小数组调用一次各数值内核，使JIT编译（或读取编译缓存）发生在导入时，而不是第一个股票上
+    Call each numeric kernel once on small arrays so JIT compilation (or loading the compile cache)
+    happens at import rather than on the first ticker
+    """
+    sample = np.array([1.0, 2.0, 3.0])
+    _score_disruptive_potential(sample, sample, sample, sample)
+    _score_innovation_growth(sample, sample, sample, sample, sample, sample)
+    _tier(0.0, _MARGIN_OF_SAFETY_THRESHOLDS)
+
+
+if NUMBA_AVAILABLE:
+    _warmup_kernels()
+
+
+# 提示模板不随股票变化，在模块加载时构建一次 - The prompt template is ticker-invariant, so build it once at import
+# 不变的说明和输出格式都放在最前面的系统消息里，所有股票的请求共享同一个前缀，可以命中服务端的提示缓存
+# All fixed instructions, including the output format, live in the leading system message so every
+# ticker's request shares one prefix that the provider's prompt cache can reuse
+_CW_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    (
+        "system",
+        """你是凯西·伍德的 AI 智能体，运用她的原则进行投资决策：
+        
+        "1. 寻找能够利用颠覆性创新的公司。"
+        "2. 强调指数级增长潜力和巨大的潜在市场。"
+        "3. 专注于科技、医疗保健或其他面向未来的行业。"
+        "4. 考虑多年的投资期限以寻找潜在的突破。"
+        "5. 为追求高回报，接受更高的波动性。"
+        "6. 评估管理层的愿景和研发投资能力。"
+        "规则："
+        "- 识别颠覆性或突破性技术。"
+        "- 评估多年收入增长的强劲潜力。"
+        "- 检查公司是否能够在大型市场中有效扩展。"
+        "- 使用增长导向的估值方法。"
+        "- 提供数据驱动的建议（买入/卖出/中性）。"
+        
+        按照此格式返回 JSON:
+        {{
+          "signal": "买入/中性/卖出",
+          "confidence": float (0-100),
+          "reasoning": "string"
+        }}"""
+    ),
+    (
+        "human",
+            """根据以下数据，像凯西·伍德那样创建投资信号。
+
+            股票{ticker} 的分析数据:
+            {analysis_data}
+        """,
+    )
+])
 
-    prompt = template.invoke({
-        "analysis_data": json.dumps(analysis_data, indent=2),
-        "ticker": ticker
-    })
+# 提示的版本：既是系统提示前缀的缓存键，也是LLM输出缓存键的一部分，修改提示时递增
+# Prompt version: the prompt cache key for the system prefix and part of the LLM output cache key; bump when the prompts change
+_CW_PROMPT_CACHE_KEY = "cathie_wood_system_v1"
 
-    def create_default_cathie_wood_signal():
-        return CathieWoodSignal(
-            signal="中性",
-            confidence=0.0,
-            reasoning="Error in analysis, defaulting to neutral"
-        )
 
-    # 调用 call_llm 时不再传递 model_name 和 model_provider
-    # model_name and model_provider are no longer passed when calling call_llm
-    return call_llm(
-        prompt=prompt,
-        # model_name=model_name, # 已移除 (Removed)
-        # model_provider=model_provider, # 已移除 (Removed)
+def generate_cathie_wood_outputs(analysis_data: dict[str, dict], use_cache: bool = True) -> dict[str, CathieWoodSignal]:
+    """
+    为多个股票生成凯西·伍德风格的投资决策，所有提示作为一个批次发送
+    每个股票先查LLM输出缓存，只有未命中的股票进入批次
+
+    Generates Cathie Wood style decisions for several tickers, sending every prompt as one pooled batch.
+    Each ticker is looked up in the LLM output cache first; only the misses are sent.
+    """
+    signals = {}
+    pending = {}
+    cache_params = {}
+    for ticker, ticker_analysis in analysis_data.items():
+        cache_params[ticker] = _llm_cache_params({ticker: ticker_analysis})
+        cached = _load_cached_signal(ticker, cache_params[ticker]) if use_cache else None
+        if cached is not None:
+            signals[ticker] = cached
+        else:
+            # 只序列化未命中缓存的股票的分析 - Only serialize the analysis of cache misses
+            pending[ticker] = _serialize_analysis({ticker: ticker_analysis})
+            _progress.update_status("cathie_wood_agent", ticker, "Generating Cathie Wood style analysis")
+
+    if not pending:
+        return signals
+
+    prompts = [_build_cathie_wood_prompt(ticker, payload) for ticker, payload in pending.items()]
+    outputs = call_llm_batch(
+        prompts=prompts,
         pydantic_model=CathieWoodSignal,
         agent_name="cathie_wood_agent",
-        default_factory=create_default_cathie_wood_signal,
+        default_factory=_default_cathie_wood_signal,
+        prompt_cache_key=_CW_PROMPT_CACHE_KEY,
+    )
+
+    for ticker, signal in zip(pending, outputs):
+        # 不缓存失败时的默认结果 - Do not cache the fallback default
+        if not _is_default_signal(signal):
+            _file_cache.set("cathie_wood_llm", ticker, "signal", cache_params[ticker], signal.model_dump(mode="json"))
+        signals[ticker] = signal
+    return signals
+
+
+def _serialize_analysis(analysis_data: dict[str, any]) -> str:
+    """
+    提示中使用紧凑JSON，键排序使相同的分析得到相同的提示
+    Compact JSON for the prompt, with sorted keys so identical analyses produce identical prompts
+    """
+    return dumps(analysis_data, sort_keys=True)
+
+
+def _build_cathie_wood_prompt(ticker: str, payload: str):
+    """用序列化后的分析数据构建单个股票的提示 - Build the prompt for one ticker from its serialized analysis"""
+    return _CW_PROMPT_TEMPLATE.invoke({
+        "analysis_data": payload,
+        "ticker": ticker
+    })
+
+
+_DEFAULT_REASONING = "Error in analysis, defaulting to neutral"
+
+
+def _default_cathie_wood_signal() -> CathieWoodSignal:
+    """分析失败时的默认信号 - Default signal when the analysis fails"""
+    return CathieWoodSignal(
+        signal=Signal.NEUTRAL,
+        confidence=0.0,
+        reasoning=_DEFAULT_REASONING
     )
 
-# source: https://ark-invest.com
\ No newline at end of file
+
+def _insufficient_data_signal() -> CathieWoodSignal:
+    """数据不足时不调用LLM，直接返回中性信号 - Neutral signal for tickers with insufficient data, without an LLM call"""
+    return CathieWoodSignal(
+        signal=Signal.NEUTRAL,
+        confidence=0.0,
+        reasoning="Insufficient data"
+    )
+
+
+def _is_default_signal(signal: CathieWoodSignal) -> bool:
+    """是否为失败时的默认信号（不应缓存）- Whether this is the failure default (must not be cached)"""
+    return signal.confidence == 0.0 and signal.reasoning == _DEFAULT_REASONING
+
+
+def _llm_cache_params(analysis_data: dict[str, any]) -> dict:
+    """LLM输出缓存的键：模型、提示版本和分析数据的哈希 - LLM output cache key: model, prompt version and a hash of the analysis data"""
+    return {
+        "model": get_model_id(),
+        "prompt": _CW_PROMPT_CACHE_KEY,
+        "analysis": content_hash(analysis_data)
+    }
+
+
+def _load_cached_signal(ticker: str, cache_params: dict) -> CathieWoodSignal | None:
+    """读取缓存的LLM信号 - Load a cached LLM signal"""
+    cached = _file_cache.get("cathie_wood_llm", ticker, "signal", cache_params, LLM_OUTPUT_CACHE_TTL)
+    if cached is None:
+        return None
+    _progress.update_status("cathie_wood_agent", ticker, "LLM cache hit")
+    return CathieWoodSignal(**cached)
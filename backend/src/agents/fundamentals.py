@@ -9,8 +9,57 @@ from langchain_core.messages import HumanMessage
 from graph.state import AgentState, show_agent_reasoning
 from utils.progress import progress
 import json
+from operator import attrgetter
+import numpy as np
 
-from tools.api import get_financial_metrics
+from tools.api import get_financial_metrics_batch
+
+
+# 盈利能力阈值标准 - Profitability threshold criteria
+_PROFITABILITY_THRESHOLDS = np.array([
+    0.15,  # 强劲的ROE大于15% - Strong ROE above 15%
+    0.20,  # 健康的净利润率大于20% - Healthy profit margins above 20%
+    0.15,  # 强劲的营业效率大于15% - Strong operating efficiency above 15%
+])
+
+# 成长性阈值标准 - Growth threshold criteria
+_GROWTH_THRESHOLDS = np.array([
+    0.10,  # 10%收入增长 - 10% revenue growth
+    0.10,  # 10%盈利增长 - 10% earnings growth
+    0.10,  # 10%账面价值增长 - 10% book value growth
+])
+
+# 估值比率阈值（值越高表示越贵）- Valuation ratio thresholds (higher values indicate more expensive)
+_PRICE_RATIO_THRESHOLDS = np.array([
+    25.0,  # 合理的市盈率小于25 - Reasonable P/E ratio below 25
+    3.0,   # 合理的市净率小于3 - Reasonable P/B ratio below 3
+    5.0,   # 合理的市销率小于5 - Reasonable P/S ratio below 5
+])
+
+# 评分用到的指标，每个指标取出为一列（股票维度的数组）
+# Metrics used for scoring; each one is pulled out as a column across tickers
+_SCORED_METRICS = (
+    "return_on_equity",          # 净资产收益率 - Return on Equity
+    "net_margin",                # 净利润率 - Net Profit Margin
+    "operating_margin",          # 营业利润率 - Operating Margin
+    "revenue_growth",            # 收入增长率 - Revenue Growth
+    "earnings_growth",           # 盈利增长率 - Earnings Growth
+    "book_value_growth",         # 账面价值增长率 - Book Value Growth
+    "current_ratio",             # 流动比率 - Current Ratio
+    "debt_to_equity",            # 负债权益比 - Debt-to-Equity Ratio
+    "free_cash_flow_per_share",  # 每股自由现金流 - Free Cash Flow per Share
+    "earnings_per_share",        # 每股收益 - Earnings per Share
+    "price_to_earnings_ratio",   # 市盈率 - Price-to-Earnings Ratio
+    "price_to_book_ratio",       # 市净率 - Price-to-Book Ratio
+    "price_to_sales_ratio",      # 市销率 - Price-to-Sales Ratio
+)
+
+# 一次取出股票的全部评分指标为元组（NumPy 会把 None 转为 NaN）
+# Fetches all scored metrics of a ticker as one tuple (NumPy turns None into NaN)
+_get_scored_metrics = attrgetter(*_SCORED_METRICS)
+
+# 信号编码：1 看涨，-1 看跌，0 中性 - Signal encoding: 1 bullish, -1 bearish, 0 neutral
+_SIGNAL_NAMES = {1: "bullish", -1: "bearish", 0: "neutral"}
 
 
 ##### 基本面代理 - Fundamental Agent #####
@@ -31,6 +80,8 @@ def fundamentals_agent(state: AgentState):
     data = state["data"]
     end_date = data["end_date"]
     tickers = data["tickers"]
+    # 只有显示推理时才生成说明文字，否则保留原始数值 - Only build detail text when reasoning is shown; otherwise keep raw values
+    verbose = state["metadata"].get("show_reasoning", False)
 
     # 为每个股票代码初始化基本面分析 - Initialize fundamental analysis for each ticker
     fundamental_analysis = {}
@@ -38,131 +89,26 @@ def fundamentals_agent(state: AgentState):
     for ticker in tickers:
         progress.update_status("fundamentals_agent", ticker, "Fetching financial metrics")
 
-        # 获取财务指标 - Get the financial metrics
-        financial_metrics = get_financial_metrics(
-            ticker=ticker,
-            end_date=end_date,
-            period="ttm",  # TTM - 过去十二个月 - TTM - Trailing Twelve Months
-            limit=10,
-        )
-
-        if not financial_metrics:
-            progress.update_status("fundamentals_agent", ticker, "Failed: No financial metrics found")
-            continue
-
-        # 获取最新的财务指标 - Pull the most recent financial metrics
-        metrics = financial_metrics[0]
-
-        # 为不同基本面方面初始化信号列表 - Initialize signals list for different fundamental aspects
-        signals = []
-        reasoning = {}
-
-        progress.update_status("fundamentals_agent", ticker, "Analyzing profitability")
-        # 1. 盈利能力分析 - Profitability Analysis
-        return_on_equity = metrics.return_on_equity      # 净资产收益率 - Return on Equity
-        net_margin = metrics.net_margin                  # 净利润率 - Net Profit Margin
-        operating_margin = metrics.operating_margin      # 营业利润率 - Operating Margin
-
-        # 盈利能力阈值标准 - Profitability threshold criteria
-        thresholds = [
-            (return_on_equity, 0.15),    # 强劲的ROE大于15% - Strong ROE above 15%
-            (net_margin, 0.20),          # 健康的净利润率大于20% - Healthy profit margins above 20%
-            (operating_margin, 0.15),    # 强劲的营业效率大于15% - Strong operating efficiency above 15%
-        ]
-        profitability_score = sum(metric is not None and metric > threshold for metric, threshold in thresholds)
-
-        signals.append("bullish" if profitability_score >= 2 else "bearish" if profitability_score == 0 else "neutral")
-        reasoning["profitability_signal"] = {
-            "signal": signals[0],
-            "details": (f"ROE: {return_on_equity:.2%}" if return_on_equity else "ROE: N/A") + ", " + (f"净利润率: {net_margin:.2%}" if net_margin else "净利润率: N/A") + ", " + (f"营业利润率: {operating_margin:.2%}" if operating_margin else "营业利润率: N/A"),
-        }
-
-        progress.update_status("fundamentals_agent", ticker, "Analyzing growth")
-        # 2. 成长性分析 - Growth Analysis
-        revenue_growth = metrics.revenue_growth        # 收入增长率 - Revenue Growth
-        earnings_growth = metrics.earnings_growth      # 盈利增长率 - Earnings Growth
-        book_value_growth = metrics.book_value_growth  # 账面价值增长率 - Book Value Growth
-
-        # 成长性阈值标准 - Growth threshold criteria
-        thresholds = [
-            (revenue_growth, 0.10),     # 10%收入增长 - 10% revenue growth
-            (earnings_growth, 0.10),    # 10%盈利增长 - 10% earnings growth
-            (book_value_growth, 0.10),  # 10%账面价值增长 - 10% book value growth
-        ]
-        growth_score = sum(metric is not None and metric > threshold for metric, threshold in thresholds)
-
-        signals.append("bullish" if growth_score >= 2 else "bearish" if growth_score == 0 else "neutral")
-        reasoning["growth_signal"] = {
-            "signal": signals[1],
-            "details": (f"收入增长: {revenue_growth:.2%}" if revenue_growth else "收入增长: N/A") + ", " + (f"盈利增长: {earnings_growth:.2%}" if earnings_growth else "盈利增长: N/A"),
-        }
-
-        progress.update_status("fundamentals_agent", ticker, "Analyzing financial health")
-        # 3. 财务健康度分析 - Financial Health Analysis
-        current_ratio = metrics.current_ratio                          # 流动比率 - Current Ratio
-        debt_to_equity = metrics.debt_to_equity                        # 负债权益比 - Debt-to-Equity Ratio
-        free_cash_flow_per_share = metrics.free_cash_flow_per_share    # 每股自由现金流 - Free Cash Flow per Share
-        earnings_per_share = metrics.earnings_per_share                # 每股收益 - Earnings per Share
-
-        health_score = 0
-        if current_ratio and current_ratio > 1.5:  # 强劲的流动性 - Strong liquidity
-            health_score += 1
-        if debt_to_equity and debt_to_equity < 0.5:  # 保守的债务水平 - Conservative debt levels
-            health_score += 1
-        if free_cash_flow_per_share and earnings_per_share and free_cash_flow_per_share > earnings_per_share * 0.8:  # 强劲的自由现金流转换 - Strong FCF conversion
-            health_score += 1
-
-        signals.append("bullish" if health_score >= 2 else "bearish" if health_score == 0 else "neutral")
-        reasoning["financial_health_signal"] = {
-            "signal": signals[2],
-            "details": (f"流动比率: {current_ratio:.2f}" if current_ratio else "流动比率: N/A") + ", " + (f"负债权益比: {debt_to_equity:.2f}" if debt_to_equity else "负债权益比: N/A"),
-        }
-
-        progress.update_status("fundamentals_agent", ticker, "Analyzing valuation ratios")
-        # 4. 估值比率分析 - Price-to-X Ratios Analysis
-        pe_ratio = metrics.price_to_earnings_ratio  # 市盈率 - Price-to-Earnings Ratio
-        pb_ratio = metrics.price_to_book_ratio      # 市净率 - Price-to-Book Ratio
-        ps_ratio = metrics.price_to_sales_ratio     # 市销率 - Price-to-Sales Ratio
-
-        # 估值比率阈值（值越高表示越贵）- Valuation ratio thresholds (higher values indicate more expensive)
-        thresholds = [
-            (pe_ratio, 25),  # 合理的市盈率小于25 - Reasonable P/E ratio below 25
-            (pb_ratio, 3),   # 合理的市净率小于3 - Reasonable P/B ratio below 3
-            (ps_ratio, 5),   # 合理的市销率小于5 - Reasonable P/S ratio below 5
-        ]
-        # 注意：这里计算的是"过高"的估值比率数量 - Note: This counts "excessive" valuation ratios
-        price_ratio_score = sum(metric is not None and metric > threshold for metric, threshold in thresholds)
-
-        # 估值比率越高越看跌（价格过高）- Higher valuation ratios are more bearish (overpriced)
-        signals.append("bearish" if price_ratio_score >= 2 else "bullish" if price_ratio_score == 0 else "neutral")
-        reasoning["price_ratios_signal"] = {
-            "signal": signals[3],
-            "details": (f"市盈率: {pe_ratio:.2f}" if pe_ratio else "市盈率: N/A") + ", " + (f"市净率: {pb_ratio:.2f}" if pb_ratio else "市净率: N/A") + ", " + (f"市销率: {ps_ratio:.2f}" if ps_ratio else "市销率: N/A"),
-        }
-
-        progress.update_status("fundamentals_agent", ticker, "Calculating final signal")
-        # 确定整体信号 - Determine overall signal
-        bullish_signals = signals.count("bullish")
-        bearish_signals = signals.count("bearish")
+    # 一次获取所有股票的财务指标 - Get the financial metrics for every ticker at once
+    financial_metrics = get_financial_metrics_batch(
+        tickers,
+        end_date=end_date,
+        period="ttm",  # TTM - 过去十二个月 - TTM - Trailing Twelve Months
+        limit=10,
+    )
 
-        if bullish_signals > bearish_signals:
-            overall_signal = "bullish"
-        elif bearish_signals > bullish_signals:
-            overall_signal = "bearish"
+    # 获取每个股票最新的财务指标 - Pull the most recent financial metrics of each ticker
+    latest = {}
+    for ticker, ticker_metrics in financial_metrics.items():
+        if ticker_metrics:
+            latest[ticker] = ticker_metrics[0]
         else:
-            overall_signal = "neutral"
-
-        # 计算置信度 - Calculate confidence level
-        total_signals = len(signals)
-        confidence = round(max(bullish_signals, bearish_signals) / total_signals, 2) * 100
-
-        fundamental_analysis[ticker] = {
-            "signal": overall_signal,
-            "confidence": confidence,
-            "reasoning": reasoning,
-        }
+            progress.update_status("fundamentals_agent", ticker, "Failed: No financial metrics found")
 
-        progress.update_status("fundamentals_agent", ticker, "Done")
+    if latest:
+        for ticker, ticker_analysis in zip(latest, _analyze_metrics(list(latest.values()), verbose)):
+            fundamental_analysis[ticker] = ticker_analysis
+            progress.update_status("fundamentals_agent", ticker, "Done")
 
     # 创建基本面分析消息 - Create the fundamental analysis message
     message = HumanMessage(
@@ -171,7 +117,7 @@ def fundamentals_agent(state: AgentState):
     )
 
     # 如果设置了标志则打印推理过程 - Print the reasoning if the flag is set
-    if state["metadata"]["show_reasoning"]:
+    if verbose:
         show_agent_reasoning(fundamental_analysis, "Fundamental Analysis Agent")
 
     # 将信号添加到analyst_signals列表 - Add the signal to the analyst_signals list
@@ -181,3 +127,143 @@ def fundamentals_agent(state: AgentState):
         "messages": [message],
         "data": data,
     }
+
+
+def _metric_columns(metrics: list) -> dict[str, np.ndarray]:
+    """
+    把每个股票的指标对象转换为按指标分列的数组，缺失值为 NaN（与阈值比较时永远为 False）
+    Turn the per-ticker metrics objects into one array per metric; missing values become NaN,
+    which never passes a threshold comparison
+    """
+    table = np.array(
+        [_get_scored_metrics(m) for m in metrics],
+        dtype=np.float64,
+    ).reshape(len(metrics), len(_SCORED_METRICS))
+    return dict(zip(_SCORED_METRICS, table.T))
+
+
+def _count_above(columns: dict[str, np.ndarray], fields: tuple, thresholds: np.ndarray) -> np.ndarray:
+    """
+    每个股票超过对应阈值的指标个数，所有股票一次比较
+    Number of metrics above their thresholds for every ticker, in one comparison
+    """
+    return (np.column_stack([columns[field] for field in fields]) > thresholds).sum(axis=1)
+
+
+def _score_signals(scores: np.ndarray) -> np.ndarray:
+    """分数 >= 2 看涨，0 看跌，其余中性 - A score of 2+ is bullish, 0 is bearish, anything else neutral"""
+    return np.select([scores >= 2, scores == 0], [1, -1], 0)
+
+
+def _analyze_metrics(metrics: list, verbose: bool = True) -> list[dict]:
+    """
+    对所有股票的最新财务指标一起评分，返回与输入顺序一致的分析结果
+    Score the latest financial metrics of every ticker together, returning analyses in input order
+    """
+    columns = _metric_columns(metrics)
+
+    # 1. 盈利能力分析 - Profitability Analysis
+    profitability_score = _count_above(
+        columns, ("return_on_equity", "net_margin", "operating_margin"), _PROFITABILITY_THRESHOLDS
+    )
+
+    # 2. 成长性分析 - Growth Analysis
+    growth_score = _count_above(
+        columns, ("revenue_growth", "earnings_growth", "book_value_growth"), _GROWTH_THRESHOLDS
+    )
+
+    # 3. 财务健康度分析 - Financial Health Analysis
+    current_ratio = columns["current_ratio"]
+    debt_to_equity = columns["debt_to_equity"]
+    free_cash_flow_per_share = columns["free_cash_flow_per_share"]
+    earnings_per_share = columns["earnings_per_share"]
+    health_score = (
+        (current_ratio > 1.5).astype(int)  # 强劲的流动性 - Strong liquidity
+        + ((debt_to_equity != 0) & (debt_to_equity < 0.5))  # 保守的债务水平 - Conservative debt levels
+        # 强劲的自由现金流转换 - Strong FCF conversion
+        + ((free_cash_flow_per_share != 0) & (earnings_per_share != 0) & (free_cash_flow_per_share > earnings_per_share * 0.8))
+    )
+
+    # 4. 估值比率分析 - Price-to-X Ratios Analysis
+    # 注意：这里计算的是"过高"的估值比率数量 - Note: This counts "excessive" valuation ratios
+    price_ratio_score = _count_above(
+        columns, ("price_to_earnings_ratio", "price_to_book_ratio", "price_to_sales_ratio"), _PRICE_RATIO_THRESHOLDS
+    )
+
+    # 每行是一个股票的四个信号 - Each row holds one ticker's four signals
+    signals = np.column_stack([
+        _score_signals(profitability_score),
+        _score_signals(growth_score),
+        _score_signals(health_score),
+        # 估值比率越高越看跌（价格过高）- Higher valuation ratios are more bearish (overpriced)
+        -_score_signals(price_ratio_score),
+    ])
+
+    # 确定整体信号 - Determine overall signal
+    bullish_signals = (signals == 1).sum(axis=1)
+    bearish_signals = (signals == -1).sum(axis=1)
+    overall_signals = np.sign(bullish_signals - bearish_signals)
+
+    # 计算置信度（整数百分比，避免 66.00000000000001 这样的浮点误差）- Calculate confidence as a whole percentage, avoiding float artifacts like 66.00000000000001
+    total_signals = signals.shape[1]
+    confidences = np.rint(100 * np.maximum(bullish_signals, bearish_signals) / total_signals).astype(int)
+
+    return [
+        {
+            "signal": _SIGNAL_NAMES[int(overall_signal)],
+            "confidence": int(confidence),
+            "reasoning": _build_reasoning(m, [_SIGNAL_NAMES[int(signal)] for signal in row], verbose),
+        }
+        for m, row, overall_signal, confidence in zip(metrics, signals, overall_signals, confidences)
+    ]
+
+
+def _fmt(value, spec: str) -> str:
+    """格式化指标，缺失或为零时显示 N/A - Format a metric, showing N/A when it is missing or zero"""
+    return format(value, spec) if value else "N/A"
+
+
+def _build_reasoning(metrics, signals: list[str], verbose: bool = True) -> dict:
+    """
+    组装单个股票各方面的信号和说明；不显示推理时说明为原始指标值
+    Assemble the per-aspect signals and details for one ticker; without verbose the details are the raw metric values
+    """
+    m = metrics
+    if not verbose:
+        return {
+            "profitability_signal": {
+                "signal": signals[0],
+                "details": {"return_on_equity": m.return_on_equity, "net_margin": m.net_margin, "operating_margin": m.operating_margin},
+            },
+            "growth_signal": {
+                "signal": signals[1],
+                "details": {"revenue_growth": m.revenue_growth, "earnings_growth": m.earnings_growth},
+            },
+            "financial_health_signal": {
+                "signal": signals[2],
+                "details": {"current_ratio": m.current_ratio, "debt_to_equity": m.debt_to_equity},
+            },
+            "price_ratios_signal": {
+                "signal": signals[3],
+                "details": {"pe_ratio": m.price_to_earnings_ratio, "pb_ratio": m.price_to_book_ratio, "ps_ratio": m.price_to_sales_ratio},
+            },
+        }
+
+    return {
+        "profitability_signal": {
+            "signal": signals[0],
+            "details": f"ROE: {_fmt(m.return_on_equity, '.2%')}, 净利润率: {_fmt(m.net_margin, '.2%')}, 营业利润率: {_fmt(m.operating_margin, '.2%')}",
+        },
+        "growth_signal": {
+            "signal": signals[1],
+            "details": f"收入增长: {_fmt(m.revenue_growth, '.2%')}, 盈利增长: {_fmt(m.earnings_growth, '.2%')}",
+        },
+        "financial_health_signal": {
+            "signal": signals[2],
+            "details": f"流动比率: {_fmt(m.current_ratio, '.2f')}, 负债权益比: {_fmt(m.debt_to_equity, '.2f')}",
+        },
+        "price_ratios_signal": {
+            "signal": signals[3],
+            "details": f"市盈率: {_fmt(m.price_to_earnings_ratio, '.2f')}, 市净率: {_fmt(m.price_to_book_ratio, '.2f')}, 市销率: {_fmt(m.price_to_sales_ratio, '.2f')}",
+        },
+    }
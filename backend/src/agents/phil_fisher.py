@@ -3,8 +3,8 @@ Phil Fisher成长投资分析师代理 - 基于菲利普·费雪的投资原则
 Phil Fisher growth investing analyst agent - Based on Philip Fisher's investment principles
 """
 from graph.state import AgentState, show_agent_reasoning
+from data.cache import get_file_cache
 from tools.api import (
-    get_financial_metrics,
     get_market_cap,
     search_line_items,
     get_insider_trades,
@@ -17,7 +17,13 @@ import json
 from typing_extensions import Literal
 from utils.progress import progress
 from utils.llm import call_llm
-import statistics
+from llm.models import get_model_id
+from utils.jit import njit, NUMBA_AVAILABLE
+from utils.serialization import content_hash, dumps
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+import numpy as np
+import re
 
 
 class PhilFisherSignal(BaseModel):
@@ -54,219 +60,425 @@ def phil_fisher_agent(state: AgentState):
     start_date = data["start_date"]
     end_date = data["end_date"]
     tickers = data["tickers"]
+    # 设置 no_cache 时总是重新调用LLM - With no_cache set the LLM is always called again
+    use_cache = not state["metadata"].get("no_cache", False)
 
-    analysis_data = {}
-    fisher_analysis = {}
-
-    for ticker in tickers:
-        progress.update_status("phil_fisher_agent", ticker, "Fetching financial metrics")
-        metrics = get_financial_metrics(ticker, end_date, period="annual", limit=5)
-
-        progress.update_status("phil_fisher_agent", ticker, "Gathering financial line items")
-        # 收集财务数据项：收入、净利润、每股收益、研发费用等
-        # Collect financial data items: revenue, net income, EPS, R&D expenses, etc.
-        financial_line_items = search_line_items(
-            ticker,
-            [
-                "revenue",
-                "net_income",
-                "earnings_per_share",
-                "free_cash_flow",
-                "research_and_development",
-                "operating_income",
-                "operating_margin",
-                "gross_margin",
-                "total_debt",
-                "shareholders_equity",
-                "cash_and_equivalents",
-                "ebit",
-                "ebitda",
-            ],
-            end_date,
-            period="annual",
-            limit=5,
-        )
+    # 各股票之间没有依赖，数据请求是I/O密集型，并发分析
+    # Tickers are independent and data fetching is I/O-bound, so analyze them concurrently
+    with ThreadPoolExecutor(max_workers=max(1, min(32, len(tickers)))) as executor:
+        # map 按输入顺序返回，保持输出中的股票顺序 - map yields in input order, keeping ticker order stable
+        fisher_analysis = dict(executor.map(_analyze_ticker, tickers, repeat(end_date), repeat(use_cache)))
+
+    # 包装结果
+    # Wrap up results
+    message = HumanMessage(content=json.dumps(fisher_analysis), name="phil_fisher_agent")
 
-        progress.update_status("phil_fisher_agent", ticker, "Getting market cap")
-        market_cap = get_market_cap(ticker, end_date)
+    if state["metadata"].get("show_reasoning"):
+        show_agent_reasoning(fisher_analysis, "Phil Fisher Agent")
+
+    # Save signals to state
+    state["data"]["analyst_signals"]["phil_fisher_agent"] = fisher_analysis
+    return {"messages": [message], "data": state["data"]}
 
-        progress.update_status("phil_fisher_agent", ticker, "Fetching insider trades")
-        insider_trades = get_insider_trades(ticker, end_date, start_date=None, limit=50)
 
-        progress.update_status("phil_fisher_agent", ticker, "Fetching company news")
-        company_news = get_company_news(ticker, end_date, start_date=None, limit=50)
+def _analyze_ticker(ticker: str, end_date: str, use_cache: bool = True) -> tuple[str, dict]:
+    """
+    获取单个股票的数据、评分并生成费雪风格的信号
+    Fetch, score and generate the Fisher-style signal for one ticker
+    """
+    progress.update_status("phil_fisher_agent", ticker, "Fetching financial data")
+    # 四个数据请求互不依赖，同时发出；每个分析函数之前才等待它需要的结果
+    # The four data requests are independent, so issue them together and wait on each one right before the analyzer that needs it
+    executor = ThreadPoolExecutor(max_workers=4)
+    try:
+        line_items_future = executor.submit(
+            search_line_items, ticker, PHIL_FISHER_LINE_ITEMS, end_date, period="annual", limit=5
+        )
+        market_cap_future = executor.submit(get_market_cap, ticker, end_date)
+        insider_trades_future = executor.submit(get_insider_trades, ticker, end_date, start_date=None, limit=50)
+        company_news_future = executor.submit(get_company_news, ticker, end_date, start_date=None, limit=50)
+
+        # 财务报表项目只提取一次，各分析函数共用 - Extract the line items once for all analyzers
+        series = _extract_series(line_items_future.result())
+        market_cap = market_cap_future.result()
+        # 没有财务报表或市值时各项分析都没有意义，直接返回中性且不调用LLM
+        # Without line items or a market cap none of the analyses are meaningful, so return neutral and skip the LLM
+        if not _period_count(series) or market_cap is None:
+            progress.update_status("phil_fisher_agent", ticker, "Failed: Insufficient data")
+            return ticker, {"signal": "中性", "confidence": 0.0, "reasoning": "数据不足，默认为中性"}
 
         progress.update_status("phil_fisher_agent", ticker, "Analyzing growth & quality")
-        growth_quality = analyze_fisher_growth_quality(financial_line_items)
+        growth_quality = analyze_fisher_growth_quality(series)
 
         progress.update_status("phil_fisher_agent", ticker, "Analyzing margins & stability")
-        margins_stability = analyze_margins_stability(financial_line_items)
+        margins_stability = analyze_margins_stability(series)
 
         progress.update_status("phil_fisher_agent", ticker, "Analyzing management efficiency & leverage")
-        mgmt_efficiency = analyze_management_efficiency_leverage(financial_line_items)
+        mgmt_efficiency = analyze_management_efficiency_leverage(series)
 
         progress.update_status("phil_fisher_agent", ticker, "Analyzing valuation (Fisher style)")
-        fisher_valuation = analyze_fisher_valuation(financial_line_items, market_cap)
+        fisher_valuation = analyze_fisher_valuation(series, market_cap)
 
+        insider_trades = insider_trades_future.result()
         progress.update_status("phil_fisher_agent", ticker, "Analyzing insider activity")
         insider_activity = analyze_insider_activity(insider_trades)
 
+        company_news = company_news_future.result()
         progress.update_status("phil_fisher_agent", ticker, "Analyzing sentiment")
         sentiment_analysis = analyze_sentiment(company_news)
+    finally:
+        # 不等待：数据不足提前返回时，不再等待仍在进行的内幕交易和新闻请求（其结果被丢弃）
+        # Don't wait: on the insufficient-data early return the in-flight insider and news requests are left to finish in the background, their results discarded
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # 综合评分：权重分配
+    # Comprehensive scoring: weight allocation
+    total_score = (
+        growth_quality["score"] * 0.30
+        + margins_stability["score"] * 0.25
+        + mgmt_efficiency["score"] * 0.20
+        + fisher_valuation["score"] * 0.15
+        + insider_activity["score"] * 0.05
+        + sentiment_analysis["score"] * 0.05
+    )
 
-        # 综合评分：权重分配
-        # Comprehensive scoring: weight allocation
-        total_score = (
-            growth_quality["score"] * 0.30
-            + margins_stability["score"] * 0.25
-            + mgmt_efficiency["score"] * 0.20
-            + fisher_valuation["score"] * 0.15
-            + insider_activity["score"] * 0.05
-            + sentiment_analysis["score"] * 0.05
-        )
-
-        max_possible_score = 10
-
-        # 信号生成逻辑
-        # Signal generation logic
-        if total_score >= 7.5:
-            signal = "买入"
-        elif total_score <= 4.5:
-            signal = "卖出"
-        else:
-            signal = "中性"
-
-        analysis_data[ticker] = {
-            "signal": signal,
-            "score": total_score,
-            "max_score": max_possible_score,
-            "growth_quality": growth_quality,
-            "margins_stability": margins_stability,
-            "management_efficiency": mgmt_efficiency,
-            "valuation_analysis": fisher_valuation,
-            "insider_activity": insider_activity,
-            "sentiment_analysis": sentiment_analysis,
-        }
-
-        progress.update_status("phil_fisher_agent", ticker, "Generating Phil Fisher-style analysis")
-        fisher_output = generate_fisher_output(
-            ticker=ticker,
-            analysis_data=analysis_data,
-        )
-
-        fisher_analysis[ticker] = {
-            "signal": fisher_output.signal,
-            "confidence": fisher_output.confidence,
-            "reasoning": fisher_output.reasoning,
-        }
-
-        progress.update_status("phil_fisher_agent", ticker, "Done")
-
-    # 包装结果
-    # Wrap up results
-    message = HumanMessage(content=json.dumps(fisher_analysis), name="phil_fisher_agent")
+    max_possible_score = 10
 
-    if state["metadata"].get("show_reasoning"):
-        show_agent_reasoning(fisher_analysis, "Phil Fisher Agent")
-
-    # Save signals to state
-    state["data"]["analyst_signals"]["phil_fisher_agent"] = fisher_analysis
-    return {"messages": [message], "data": state["data"]}
+    # 信号生成逻辑
+    # Signal generation logic
+    if total_score >= 7.5:
+        signal = "买入"
+    elif total_score <= 4.5:
+        signal = "卖出"
+    else:
+        signal = "中性"
+
+    ticker_analysis = {
+        "signal": signal,
+        "score": total_score,
+        "max_score": max_possible_score,
+        "growth_quality": growth_quality,
+        "margins_stability": margins_stability,
+        "management_efficiency": mgmt_efficiency,
+        "valuation_analysis": fisher_valuation,
+        "insider_activity": insider_activity,
+        "sentiment_analysis": sentiment_analysis,
+    }
+
+    progress.update_status("phil_fisher_agent", ticker, "Generating Phil Fisher-style analysis")
+    # 只传入当前股票的分析数据 - Pass only this ticker's analysis data
+    fisher_output = generate_fisher_output(
+        ticker=ticker,
+        analysis_data={ticker: ticker_analysis},
+        end_date=end_date,
+        use_cache=use_cache,
+    )
 
+    progress.update_status("phil_fisher_agent", ticker, "Done")
+
+    return ticker, {
+        "signal": fisher_output.signal,
+        "confidence": fisher_output.confidence,
+        "reasoning": fisher_output.reasoning,
+    }
+
+
+# 收集财务数据项：收入、净利润、每股收益、研发费用等
+# Collect financial data items: revenue, net income, EPS, R&D expenses, etc.
+PHIL_FISHER_LINE_ITEMS = [
+    "revenue",
+    "net_income",
+    "earnings_per_share",
+    "free_cash_flow",
+    "research_and_development",
+    "operating_income",
+    "operating_margin",
+    "gross_margin",
+    "total_debt",
+    "shareholders_equity",
+    "cash_and_equivalents",
+    "ebit",
+    "ebitda",
+]
+
+
+def _extract_series(financial_line_items: list) -> dict[str, np.ndarray]:
+    """
+    将财务报表项目的每个字段提取为float64数组（缺失值为NaN），各分析函数共用
+    Extract every line item field into a float64 array (missing values as NaN), shared by the analyzers
 
-def analyze_fisher_growth_quality(financial_line_items: list) -> dict:
+    报表项目是 LineItem 的额外字段，且只在有数据时才设置，因此只遍历一次额外字段字典，
+    代替每个分析函数中对每个字段的 hasattr/getattr 扫描
+    Line items are LineItem extra fields that are only set when data exists, so walk the extras dicts once
+    instead of a hasattr/getattr scan per field in every analyzer
     """
-    评估增长与质量：
-    - 收入增长
-    - 每股收益增长
-    - 研发投入占比
-    
-    Evaluate growth and quality:
-    - Revenue growth
-    - EPS growth
-    - R&D investment ratio
+    # 期间 x 字段 的表；float64 数组中 None 会转为 NaN - Period x field table; None becomes NaN in a float64 array
+    table = np.array(
+        [[extra.get(field) for field in PHIL_FISHER_LINE_ITEMS] for extra in (item.model_extra or {} for item in financial_line_items)],
+        dtype=np.float64,
+    ).reshape(len(financial_line_items), len(PHIL_FISHER_LINE_ITEMS))
+    # 转置并复制，使每个字段的数组在内存中连续 - Transpose and copy so each field's array is contiguous
+    return dict(zip(PHIL_FISHER_LINE_ITEMS, table.T.copy()))
+
+
+def _present(values: np.ndarray) -> np.ndarray:
+    """有数据的期间（对应 is not None 过滤）- Periods with data (the `is not None` filter)"""
+    return values[~np.isnan(values)]
+
+
+def _period_count(series: dict[str, np.ndarray]) -> int:
+    """报表期间数（每个字段数组的长度相同）- Number of reporting periods (every field array has the same length)"""
+    return series["revenue"].size
+
+
+# 评分档位表：阈值升序排列，_tier 返回数值严格大于的阈值个数，作为分数和说明的下标
+# Score tier tables: thresholds are ascending and _tier returns how many of them the value strictly exceeds,
+# which indexes the points and labels (equivalent to the original `>` if/elif ladders)
+_GROWTH_THRESHOLDS = (0.10, 0.40, 0.80)  # 收入和每股收益增长 - revenue and EPS growth
+_GROWTH_LABELS = ("微弱或负增长", "轻微", "中等", "强劲")
+
+_GROSS_MARGIN_THRESHOLDS = (0.3, 0.5)
+_GROSS_MARGIN_LABELS = ("较低", "中等", "较高")
+
+# 利润率波动按 < 比较，用 _tier_at_or_below - Margin volatility compares with <, so it uses _tier_at_or_below
+_MARGIN_STDEV_THRESHOLDS = (0.02, 0.05)
+_MARGIN_STDEV_POINTS = (2, 1, 0)
+_MARGIN_STDEV_LABELS = ("营业利润率多年稳定", "营业利润率较为稳定", "营业利润率波动较大")
+
+_ROE_THRESHOLDS = (0.0, 0.1, 0.2)
+_ROE_LABELS = ("ROE接近零或负值", "ROE较低但为正", "ROE中等", "ROE较高")
+
+_DEBT_TO_EQUITY_THRESHOLDS = (0.3, 1.0)
+_DEBT_TO_EQUITY_POINTS = (2, 1, 0)
+_DEBT_TO_EQUITY_LABELS = ("负债权益比较低", "负债权益比适中", "负债权益比较高")
+
+# 市盈率和自由现金流比率共用同一组阈值 - P/E and P/FCF share the same thresholds
+_VALUATION_MULTIPLE_THRESHOLDS = (20.0, 30.0)
+_VALUATION_MULTIPLE_POINTS = (2, 1, 0)
+_PE_LABELS = ("市盈率合理", "市盈率偏高但可接受", "市盈率过高")
+_PFCF_LABELS = ("自由现金流比率合理", "自由现金流比率偏高", "自由现金流比率过高")
+
+
+@njit(cache=True)
+def _tier(value, thresholds) -> int:
+    """数值严格大于的阈值个数（NaN 为 0）- Number of thresholds the value strictly exceeds (0 for NaN)"""
+    tier = 0
+    for threshold in thresholds:
+        if value > threshold:
+            tier += 1
+    return tier
+
+
+@njit(cache=True)
+def _tier_at_or_below(value, thresholds) -> int:
+    """不大于数值的阈值个数（NaN 为全部）- Number of thresholds not above the value (all for NaN)"""
+    tier = 0
+    for threshold in thresholds:
+        if not value < threshold:
+            tier += 1
+    return tier
+
+
+# 增长与质量分析的结论标志位 - Outcome flags of the growth & quality analysis
+GROWTH_REVENUE = 1 << 0
+GROWTH_REVENUE_BAD_BASE = 1 << 1
+GROWTH_REVENUE_NO_DATA = 1 << 2
+GROWTH_EPS = 1 << 3
+GROWTH_EPS_BAD_BASE = 1 << 4
+GROWTH_EPS_NO_DATA = 1 << 5
+GROWTH_RD_BALANCED = 1 << 6
+GROWTH_RD_HIGH = 1 << 7
+GROWTH_RD_LOW = 1 << 8
+GROWTH_RD_NONE = 1 << 9
+GROWTH_RD_NO_DATA = 1 << 10
+
+# 利润率稳定性分析的结论标志位 - Outcome flags of the margin stability analysis
+MARGIN_OP_STABLE = 1 << 0
+MARGIN_OP_DECLINING = 1 << 1
+MARGIN_OP_NEGATIVE = 1 << 2
+MARGIN_OP_NO_DATA = 1 << 3
+MARGIN_GROSS = 1 << 4
+MARGIN_GROSS_NO_DATA = 1 << 5
+MARGIN_STABILITY = 1 << 6
+MARGIN_STABILITY_NO_DATA = 1 << 7
+
+# 说明文字用到的数值在各内核 values 数组中的位置 - Positions of the detail values in each kernel's `values` array
+V_REVENUE_GROWTH, V_EPS_GROWTH, V_RD_RATIO = range(3)  # 增长与质量 - growth & quality
+V_OLDEST_OP_MARGIN, V_NEWEST_OP_MARGIN, V_GROSS_MARGIN, V_OP_MARGIN_STDEV = range(4)  # 利润率稳定性 - margin stability
+
+
+@njit(cache=True, error_model="numpy")
+def _score_growth_quality(revenues: np.ndarray, eps_values: np.ndarray, rnd_values: np.ndarray):
     """
-    if not financial_line_items or len(financial_line_items) < 2:
-        return {
-            "score": 0,
-            "details": "财务数据不足，无法评估增长与质量",
-        }
-
-    details = []
-    raw_score = 0  # 原始分数（0-9），最终转换为0-10
+    增长与质量评分的数值内核，返回 (raw_score, flags, values)，原始分数为 0-9
+    Numeric core of the growth & quality score, returns (raw_score, flags, values) with a 0-9 raw score
+    """
+    raw_score = 0
+    flags = 0
+    values = np.zeros(3)
 
     # 1. 收入增长（YoY）
-    revenues = [getattr(fi, 'revenue', None) for fi in financial_line_items if hasattr(fi, 'revenue') and getattr(fi, 'revenue', None) is not None]
-    if len(revenues) >= 2:
+    if revenues.size >= 2:
         latest_rev = revenues[0]
         oldest_rev = revenues[-1]
         if oldest_rev > 0:
             rev_growth = (latest_rev - oldest_rev) / abs(oldest_rev)
-            if rev_growth > 0.80:
-                raw_score += 3
-                details.append(f"收入增长强劲：{rev_growth:.1%}")
-            elif rev_growth > 0.40:
-                raw_score += 2
-                details.append(f"收入增长中等：{rev_growth:.1%}")
-            elif rev_growth > 0.10:
-                raw_score += 1
-                details.append(f"收入增长轻微：{rev_growth:.1%}")
-            else:
-                details.append(f"收入增长微弱或负增长：{rev_growth:.1%}")
+            values[V_REVENUE_GROWTH] = rev_growth
+            raw_score += _tier(rev_growth, _GROWTH_THRESHOLDS)
+            flags |= GROWTH_REVENUE
         else:
-            details.append("初始收入为零或负值，无法计算增长")
+            flags |= GROWTH_REVENUE_BAD_BASE
     else:
-        details.append("收入数据不足，无法计算增长")
+        flags |= GROWTH_REVENUE_NO_DATA
 
     # 2. 每股收益增长（YoY）
-    eps_values = [getattr(fi, 'earnings_per_share', None) for fi in financial_line_items if hasattr(fi, 'earnings_per_share') and getattr(fi, 'earnings_per_share', None) is not None]
-    if len(eps_values) >= 2:
+    if eps_values.size >= 2:
         latest_eps = eps_values[0]
         oldest_eps = eps_values[-1]
         if abs(oldest_eps) > 1e-9:
             eps_growth = (latest_eps - oldest_eps) / abs(oldest_eps)
-            if eps_growth > 0.80:
-                raw_score += 3
-                details.append(f"每股收益增长强劲：{eps_growth:.1%}")
-            elif eps_growth > 0.40:
-                raw_score += 2
-                details.append(f"每股收益增长中等：{eps_growth:.1%}")
-            elif eps_growth > 0.10:
-                raw_score += 1
-                details.append(f"每股收益增长轻微：{eps_growth:.1%}")
-            else:
-                details.append(f"每股收益增长微弱或负增长：{eps_growth:.1%}")
+            values[V_EPS_GROWTH] = eps_growth
+            raw_score += _tier(eps_growth, _GROWTH_THRESHOLDS)
+            flags |= GROWTH_EPS
         else:
-            details.append("初始每股收益接近零，跳过计算")
+            flags |= GROWTH_EPS_BAD_BASE
     else:
-        details.append("每股收益数据不足，无法计算增长")
+        flags |= GROWTH_EPS_NO_DATA
 
     # 3. 研发投入占比
-    rnd_values = [getattr(fi, 'research_and_development', None) for fi in financial_line_items if hasattr(fi, 'research_and_development') and getattr(fi, 'research_and_development', None) is not None]
-    if rnd_values and revenues and len(rnd_values) == len(revenues):
+    if rnd_values.size and revenues.size and rnd_values.size == revenues.size:
         recent_rnd = rnd_values[0]
-        recent_rev = revenues[0] if revenues[0] else 1e-9
+        recent_rev = revenues[0] if revenues[0] != 0 else 1e-9
         rnd_ratio = recent_rnd / recent_rev
+        values[V_RD_RATIO] = rnd_ratio
         if 0.03 <= rnd_ratio <= 0.15:
             raw_score += 3
-            details.append(f"研发投入占比合理：{rnd_ratio:.1%}")
+            flags |= GROWTH_RD_BALANCED
         elif rnd_ratio > 0.15:
             raw_score += 2
-            details.append(f"研发投入占比偏高：{rnd_ratio:.1%}")
+            flags |= GROWTH_RD_HIGH
         elif rnd_ratio > 0.0:
             raw_score += 1
-            details.append(f"研发投入占比偏低：{rnd_ratio:.1%}")
+            flags |= GROWTH_RD_LOW
         else:
-            details.append("无显著研发投入")
+            flags |= GROWTH_RD_NONE
     else:
-        details.append("研发数据不足，无法评估")
+        flags |= GROWTH_RD_NO_DATA
+
+    return raw_score, flags, values
+
+
+_GROWTH_QUALITY_DETAILS = {
+    GROWTH_REVENUE: lambda v: f"收入增长{_GROWTH_LABELS[_tier(v[V_REVENUE_GROWTH], _GROWTH_THRESHOLDS)]}：{v[V_REVENUE_GROWTH]:.1%}",
+    GROWTH_REVENUE_BAD_BASE: lambda v: "初始收入为零或负值，无法计算增长",
+    GROWTH_REVENUE_NO_DATA: lambda v: "收入数据不足，无法计算增长",
+    GROWTH_EPS: lambda v: f"每股收益增长{_GROWTH_LABELS[_tier(v[V_EPS_GROWTH], _GROWTH_THRESHOLDS)]}：{v[V_EPS_GROWTH]:.1%}",
+    GROWTH_EPS_BAD_BASE: lambda v: "初始每股收益接近零，跳过计算",
+    GROWTH_EPS_NO_DATA: lambda v: "每股收益数据不足，无法计算增长",
+    GROWTH_RD_BALANCED: lambda v: f"研发投入占比合理：{v[V_RD_RATIO]:.1%}",
+    GROWTH_RD_HIGH: lambda v: f"研发投入占比偏高：{v[V_RD_RATIO]:.1%}",
+    GROWTH_RD_LOW: lambda v: f"研发投入占比偏低：{v[V_RD_RATIO]:.1%}",
+    GROWTH_RD_NONE: lambda v: "无显著研发投入",
+    GROWTH_RD_NO_DATA: lambda v: "研发数据不足，无法评估",
+}
+
+
+@njit(cache=True, error_model="numpy")
+def _score_margins(op_margins: np.ndarray, gross_margins: np.ndarray):
+    """
+    利润率稳定性评分的数值内核，返回 (raw_score, flags, values)，原始分数为 0-6
+    Numeric core of the margin stability score, returns (raw_score, flags, values) with a 0-6 raw score
+    """
+    raw_score = 0
+    flags = 0
+    values = np.zeros(4)
+
+    # 1. 营业利润率一致性
+    n = op_margins.size
+    if n >= 2:
+        oldest_op_margin = op_margins[-1]
+        newest_op_margin = op_margins[0]
+        values[V_OLDEST_OP_MARGIN] = oldest_op_margin
+        values[V_NEWEST_OP_MARGIN] = newest_op_margin
+        if newest_op_margin >= oldest_op_margin > 0:
+            raw_score += 2
+            flags |= MARGIN_OP_STABLE
+        elif newest_op_margin > 0:
+            raw_score += 1
+            flags |= MARGIN_OP_DECLINING
+        else:
+            flags |= MARGIN_OP_NEGATIVE
+    else:
+        flags |= MARGIN_OP_NO_DATA
+
+    # 2. 毛利率水平
+    if gross_margins.size:
+        recent_gm = gross_margins[0]
+        values[V_GROSS_MARGIN] = recent_gm
+        raw_score += _tier(recent_gm, _GROSS_MARGIN_THRESHOLDS)
+        flags |= MARGIN_GROSS
+    else:
+        flags |= MARGIN_GROSS_NO_DATA
+
+    # 3. 多年度利润率稳定性（总体标准差）- Multi-year stability (population standard deviation)
+    if n >= 3:
+        stdev = np.std(op_margins)
+        values[V_OP_MARGIN_STDEV] = stdev
+        raw_score += _MARGIN_STDEV_POINTS[_tier_at_or_below(stdev, _MARGIN_STDEV_THRESHOLDS)]
+        flags |= MARGIN_STABILITY
+    else:
+        flags |= MARGIN_STABILITY_NO_DATA
+
+    return raw_score, flags, values
+
+
+_MARGIN_DETAILS = {
+    MARGIN_OP_STABLE: lambda v: f"营业利润率稳定或提升：{v[V_OLDEST_OP_MARGIN]:.1%} -> {v[V_NEWEST_OP_MARGIN]:.1%}",
+    MARGIN_OP_DECLINING: lambda v: "营业利润率为正但略有下降",
+    MARGIN_OP_NEGATIVE: lambda v: "营业利润率可能为负或不确定",
+    MARGIN_OP_NO_DATA: lambda v: "营业利润率数据不足",
+    MARGIN_GROSS: lambda v: f"毛利率{_GROSS_MARGIN_LABELS[_tier(v[V_GROSS_MARGIN], _GROSS_MARGIN_THRESHOLDS)]}：{v[V_GROSS_MARGIN]:.1%}",
+    MARGIN_GROSS_NO_DATA: lambda v: "无毛利率数据",
+    MARGIN_STABILITY: lambda v: _MARGIN_STDEV_LABELS[_tier_at_or_below(v[V_OP_MARGIN_STDEV], _MARGIN_STDEV_THRESHOLDS)],
+    MARGIN_STABILITY_NO_DATA: lambda v: "数据不足，无法评估多年稳定性",
+}
+
+
+def _render_details(flags: int, formatters: dict, values: np.ndarray) -> str:
+    """按标志位顺序生成说明文字 - Render the detail text of every set flag, in flag order"""
+    return "; ".join(format_detail(values) for flag, format_detail in formatters.items() if flags & flag)
+
+
+def analyze_fisher_growth_quality(series: dict[str, np.ndarray]) -> dict:
+    """
+    评估增长与质量：
+    - 收入增长
+    - 每股收益增长
+    - 研发投入占比
+    
+    Evaluate growth and quality:
+    - Revenue growth
+    - EPS growth
+    - R&D investment ratio
+    """
+    if _period_count(series) < 2:
+        return {
+            "score": 0,
+            "details": "财务数据不足，无法评估增长与质量",
+        }
+
+    raw_score, flags, values = _score_growth_quality(
+        _present(series["revenue"]),
+        _present(series["earnings_per_share"]),
+        _present(series["research_and_development"]),
+    )
 
     # 转换为0-10分
     final_score = min(10, (raw_score / 9) * 10)
-    return {"score": final_score, "details": "; ".join(details)}
+    return {"score": final_score, "details": _render_details(flags, _GROWTH_QUALITY_DETAILS, values)}
 
 
-def analyze_margins_stability(financial_line_items: list) -> dict:
+def analyze_margins_stability(series: dict[str, np.ndarray]) -> dict:
     """
     评估利润率稳定性：
     - 营业利润率
@@ -278,66 +490,38 @@ def analyze_margins_stability(financial_line_items: list) -> dict:
     - Gross margin
     - Multi-year stability
     """
-    if not financial_line_items or len(financial_line_items) < 2:
+    if _period_count(series) < 2:
         return {
             "score": 0,
             "details": "数据不足，无法评估利润率稳定性",
         }
 
-    details = []
-    raw_score = 0  # 原始分数（0-6），最终转换为0-10
+    raw_score, flags, values = _score_margins(
+        _present(series["operating_margin"]),
+        _present(series["gross_margin"]),
+    )
 
-    # 1. 营业利润率一致性
-    op_margins = [getattr(fi, 'operating_margin', None) for fi in financial_line_items if hasattr(fi, 'operating_margin') and getattr(fi, 'operating_margin', None) is not None]
-    if len(op_margins) >= 2:
-        oldest_op_margin = op_margins[-1]
-        newest_op_margin = op_margins[0]
-        if newest_op_margin >= oldest_op_margin > 0:
-            raw_score += 2
-            details.append(f"营业利润率稳定或提升：{oldest_op_margin:.1%} -> {newest_op_margin:.1%}")
-        elif newest_op_margin > 0:
-            raw_score += 1
-            details.append(f"营业利润率为正但略有下降")
-        else:
-            details.append(f"营业利润率可能为负或不确定")
-    else:
-        details.append("营业利润率数据不足")
+    # 转换为0-10分
+    final_score = min(10, (raw_score / 6) * 10)
+    return {"score": final_score, "details": _render_details(flags, _MARGIN_DETAILS, values)}
 
-    # 2. 毛利率水平
-    gm_values = [getattr(fi, 'gross_margin', None) for fi in financial_line_items if hasattr(fi, 'gross_margin') and getattr(fi, 'gross_margin', None) is not None]
-    if gm_values:
-        recent_gm = gm_values[0]
-        if recent_gm > 0.5:
-            raw_score += 2
-            details.append(f"毛利率较高：{recent_gm:.1%}")
-        elif recent_gm > 0.3:
-            raw_score += 1
-            details.append(f"毛利率中等：{recent_gm:.1%}")
-        else:
-            details.append(f"毛利率较低：{recent_gm:.1%}")
-    else:
-        details.append("无毛利率数据")
 
-    # 3. 多年度利润率稳定性
-    if len(op_margins) >= 3:
-        stdev = statistics.pstdev(op_margins)
-        if stdev < 0.02:
-            raw_score += 2
-            details.append("营业利润率多年稳定")
-        elif stdev < 0.05:
-            raw_score += 1
-            details.append("营业利润率较为稳定")
-        else:
-            details.append("营业利润率波动较大")
-    else:
-        details.append("数据不足，无法评估多年稳定性")
+def _warmup_kernels():
+    """
+    用小数组调用一次各数值内核，使JIT编译（或读取编译缓存）发生在导入时，而不是第一个股票上
+    Call each numeric kernel once on small arrays so JIT compilation (or loading the compile cache)
+    happens at import rather than on the first ticker
+    """
+    sample = np.array([1.0, 2.0, 3.0])
+    _score_growth_quality(sample, sample, sample)
+    _score_margins(sample, sample)
 
-    # 转换为0-10分
-    final_score = min(10, (raw_score / 6) * 10)
-    return {"score": final_score, "details": "; ".join(details)}
 
+if NUMBA_AVAILABLE:
+    _warmup_kernels()
 
-def analyze_management_efficiency_leverage(financial_line_items: list) -> dict:
+
+def analyze_management_efficiency_leverage(series: dict[str, np.ndarray]) -> dict:
     """
     评估管理效率与杠杆：
     - 净资产收益率（ROE）
@@ -349,7 +533,7 @@ def analyze_management_efficiency_leverage(financial_line_items: list) -> dict:
     - Debt-to-equity ratio
     - Free cash flow consistency
     """
-    if not financial_line_items:
+    if not _period_count(series):
         return {
             "score": 0,
             "details": "数据不足，无法评估管理效率",
@@ -359,50 +543,37 @@ def analyze_management_efficiency_leverage(financial_line_items: list) -> dict:
     raw_score = 0  # 原始分数（0-6），最终转换为0-10
 
     # 1. 净资产收益率（ROE）
-    ni_values = [getattr(fi, 'net_income', None) for fi in financial_line_items if hasattr(fi, 'net_income') and getattr(fi, 'net_income', None) is not None]
-    eq_values = [getattr(fi, 'shareholders_equity', None) for fi in financial_line_items if hasattr(fi, 'shareholders_equity') and getattr(fi, 'shareholders_equity', None) is not None]
-    if ni_values and eq_values and len(ni_values) == len(eq_values):
+    ni_values = _present(series["net_income"])
+    eq_values = _present(series["shareholders_equity"])
+    if ni_values.size and eq_values.size and ni_values.size == eq_values.size:
         recent_ni = ni_values[0]
         recent_eq = eq_values[0] if eq_values[0] else 1e-9
         if recent_ni > 0:
             roe = recent_ni / recent_eq
-            if roe > 0.2:
-                raw_score += 3
-                details.append(f"ROE较高：{roe:.1%}")
-            elif roe > 0.1:
-                raw_score += 2
-                details.append(f"ROE中等：{roe:.1%}")
-            elif roe > 0:
-                raw_score += 1
-                details.append(f"ROE较低但为正：{roe:.1%}")
-            else:
-                details.append(f"ROE接近零或负值：{roe:.1%}")
+            roe_tier = _tier(roe, _ROE_THRESHOLDS)
+            raw_score += roe_tier
+            details.append(f"{_ROE_LABELS[roe_tier]}：{roe:.1%}")
         else:
             details.append("净利润为零或负值，影响ROE")
     else:
         details.append("数据不足，无法计算ROE")
 
     # 2. 负债权益比
-    debt_values = [getattr(fi, 'total_debt', None) for fi in financial_line_items if hasattr(fi, 'total_debt') and getattr(fi, 'total_debt', None) is not None]
-    if debt_values and eq_values and len(debt_values) == len(eq_values):
+    debt_values = _present(series["total_debt"])
+    if debt_values.size and eq_values.size and debt_values.size == eq_values.size:
         recent_debt = debt_values[0]
         recent_equity = eq_values[0] if eq_values[0] else 1e-9
         dte = recent_debt / recent_equity
-        if dte < 0.3:
-            raw_score += 2
-            details.append(f"负债权益比较低：{dte:.2f}")
-        elif dte < 1.0:
-            raw_score += 1
-            details.append(f"负债权益比适中：{dte:.2f}")
-        else:
-            details.append(f"负债权益比较高：{dte:.2f}")
+        dte_tier = _tier_at_or_below(dte, _DEBT_TO_EQUITY_THRESHOLDS)
+        raw_score += _DEBT_TO_EQUITY_POINTS[dte_tier]
+        details.append(f"{_DEBT_TO_EQUITY_LABELS[dte_tier]}：{dte:.2f}")
     else:
         details.append("数据不足，无法计算负债权益比")
 
     # 3. 自由现金流一致性
-    fcf_values = [getattr(fi, 'free_cash_flow', None) for fi in financial_line_items if hasattr(fi, 'free_cash_flow') and getattr(fi, 'free_cash_flow', None) is not None]
-    if fcf_values and len(fcf_values) >= 2:
-        positive_fcf_count = sum(1 for x in fcf_values if x and x > 0)
+    fcf_values = _present(series["free_cash_flow"])
+    if fcf_values.size >= 2:
+        positive_fcf_count = int((fcf_values > 0).sum())
         ratio = positive_fcf_count / len(fcf_values)
         if ratio > 0.8:
             raw_score += 1
@@ -417,7 +588,7 @@ def analyze_management_efficiency_leverage(financial_line_items: list) -> dict:
     return {"score": final_score, "details": "; ".join(details)}
 
 
-def analyze_fisher_valuation(financial_line_items: list, market_cap: float | None) -> dict:
+def analyze_fisher_valuation(series: dict[str, np.ndarray], market_cap: float | None) -> dict:
     """
     评估估值（Phil Fisher风格）：
     - 市盈率（P/E）
@@ -427,45 +598,31 @@ def analyze_fisher_valuation(financial_line_items: list, market_cap: float | Non
     - Price-to-earnings ratio (P/E)
     - Price-to-free cash flow ratio (P/FCF)
     """
-    if not financial_line_items or market_cap is None:
+    if not _period_count(series) or market_cap is None:
         return {"score": 0, "details": "数据不足，无法评估估值"}
 
     details = []
     raw_score = 0
 
     # 1) 市盈率（P/E）
-    net_incomes = [getattr(fi, 'net_income', None) for fi in financial_line_items if hasattr(fi, 'net_income') and getattr(fi, 'net_income', None) is not None]
-    recent_net_income = net_incomes[0] if net_incomes else None
+    net_incomes = _present(series["net_income"])
+    recent_net_income = net_incomes[0] if net_incomes.size else None
     if recent_net_income and recent_net_income > 0:
         pe = market_cap / recent_net_income
-        pe_points = 0
-        if pe < 20:
-            pe_points = 2
-            details.append(f"市盈率合理：{pe:.2f}")
-        elif pe < 30:
-            pe_points = 1
-            details.append(f"市盈率偏高但可接受：{pe:.2f}")
-        else:
-            details.append(f"市盈率过高：{pe:.2f}")
-        raw_score += pe_points
+        pe_tier = _tier_at_or_below(pe, _VALUATION_MULTIPLE_THRESHOLDS)
+        raw_score += _VALUATION_MULTIPLE_POINTS[pe_tier]
+        details.append(f"{_PE_LABELS[pe_tier]}：{pe:.2f}")
     else:
         details.append("净利润为零或负值，无法计算市盈率")
 
     # 2) 自由现金流比率（P/FCF）
-    fcf_values = [getattr(fi, 'free_cash_flow', None) for fi in financial_line_items if hasattr(fi, 'free_cash_flow') and getattr(fi, 'free_cash_flow', None) is not None]
-    recent_fcf = fcf_values[0] if fcf_values else None
+    fcf_values = _present(series["free_cash_flow"])
+    recent_fcf = fcf_values[0] if fcf_values.size else None
     if recent_fcf and recent_fcf > 0:
         pfcf = market_cap / recent_fcf
-        pfcf_points = 0
-        if pfcf < 20:
-            pfcf_points = 2
-            details.append(f"自由现金流比率合理：{pfcf:.2f}")
-        elif pfcf < 30:
-            pfcf_points = 1
-            details.append(f"自由现金流比率偏高：{pfcf:.2f}")
-        else:
-            details.append(f"自由现金流比率过高：{pfcf:.2f}")
-        raw_score += pfcf_points
+        pfcf_tier = _tier_at_or_below(pfcf, _VALUATION_MULTIPLE_THRESHOLDS)
+        raw_score += _VALUATION_MULTIPLE_POINTS[pfcf_tier]
+        details.append(f"{_PFCF_LABELS[pfcf_tier]}：{pfcf:.2f}")
     else:
         details.append("自由现金流为零或负值，无法计算比率")
 
@@ -489,13 +646,13 @@ def analyze_insider_activity(insider_trades: list) -> dict:
         details.append("无内部交易数据，默认中性")
         return {"score": score, "details": "; ".join(details)}
 
-    buys, sells = 0, 0
-    for trade in insider_trades:
-        if trade.transaction_shares is not None:
-            if trade.transaction_shares > 0:
-                buys += 1
-            elif trade.transaction_shares < 0:
-                sells += 1
+    # 交易股数取出为一个数组，买入/卖出各用一次比较计数 - Pull the traded shares into one array and count buys/sells with one comparison each
+    shares = np.fromiter(
+        (trade.transaction_shares for trade in insider_trades if trade.transaction_shares is not None),
+        dtype=np.float64,
+    )
+    buys = int((shares > 0).sum())
+    sells = int((shares < 0).sum())
 
     total = buys + sells
     if total == 0:
@@ -516,6 +673,12 @@ def analyze_insider_activity(insider_trades: list) -> dict:
     return {"score": score, "details": "; ".join(details)}
 
 
+# 负面新闻关键词，编译为一个忽略大小写的正则，每个标题只扫描一次
+# Negative news keywords, compiled into one case-insensitive regex so each title is scanned once
+NEGATIVE_KEYWORDS = ["lawsuit", "fraud", "negative", "downturn", "decline", "investigation", "recall"]
+_NEGATIVE_KEYWORDS_RE = re.compile("|".join(map(re.escape, NEGATIVE_KEYWORDS)), re.IGNORECASE)
+
+
 def analyze_sentiment(news_items: list) -> dict:
     """
     评估新闻情绪：
@@ -527,12 +690,7 @@ def analyze_sentiment(news_items: list) -> dict:
     if not news_items:
         return {"score": 5, "details": "无新闻数据，默认中性"}
 
-    negative_keywords = ["lawsuit", "fraud", "negative", "downturn", "decline", "investigation", "recall"]
-    negative_count = 0
-    for news in news_items:
-        title_lower = (news.title or "").lower()
-        if any(word in title_lower for word in negative_keywords):
-            negative_count += 1
+    negative_count = sum(1 for news in news_items if _NEGATIVE_KEYWORDS_RE.search(news.title or ""))
 
     details = []
     if negative_count > len(news_items) * 0.3:
@@ -548,67 +706,115 @@ def analyze_sentiment(news_items: list) -> dict:
     return {"score": score, "details": "; ".join(details)}
 
 
+# LLM结论的磁盘缓存有效期：年度数据在一天内很少变化
+# On-disk TTL for LLM verdicts: annual data rarely changes within a day
+LLM_OUTPUT_CACHE_TTL = 24 * 60 * 60
+
+# 提示模板的版本，修改模板时递增，使旧的缓存结论失效 - Prompt template version; bump it when the template changes to invalidate cached verdicts
+_FISHER_PROMPT_VERSION = "phil_fisher_v1"
+
+_DEFAULT_REASONING = "分析出错；默认为中性"
+
+_file_cache = get_file_cache()
+
+
+# 提示模板在模块加载时构建一次，每个股票只做变量替换 - The prompt template is built once at import; each ticker only fills in variables
+_FISHER_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """你是菲利普·费雪的人工智能代理。你根据菲利普·费雪的知名原则做出投资决策：
+
+            1. 强调长期增长潜力和管理质量
+            2. 专注于投资研发以开发未来产品/服务的公司
+            3. 寻找强劲的盈利能力和一致的利润率
+            4. 愿意为优秀公司支付更高价格，但仍关注估值
+            5. 依靠彻底的研究（小道消息）和全面的基本面检查
+
+            当你提供推理时，请用菲利普·费雪的语调：
+            - 详细讨论公司的增长前景，提供具体指标和趋势
+            - 评估管理质量和他们的资本配置决策
+            - 强调研发投资和可能推动未来增长的产品管道
+            - 用精确数字评估利润率和盈利能力指标的一致性
+            - 解释可能在3-5年以上维持增长的竞争优势
+            - 使用菲利普·费雪有条理、专注增长、长期导向的语调
+
+            严格按照以下JSON格式返回你的最终输出：
+            {{
+              "signal": "买入" | "卖出" | "中性",
+              "confidence": 0 到 100,
+              "reasoning": "string"
+            }}
+            """,
+        ),
+        (
+            "human",
+            """根据以下{ticker}的分析数据，产生你的菲利普·费雪风格投资信号。
+
+            分析数据：
+            {analysis_data}
+
+            仅返回有效的JSON，包含"signal"、"confidence"和"reasoning"。
+            """,
+        ),
+    ]
+)
+
+
+def _default_fisher_signal() -> PhilFisherSignal:
+    """LLM调用失败时的默认信号 - Default signal when the LLM call fails"""
+    return PhilFisherSignal(
+        signal="中性",
+        confidence=0.0,
+        reasoning=_DEFAULT_REASONING
+    )
+
+
+def _llm_cache_params(end_date: str | None, analysis_data: dict[str, any]) -> dict:
+    """
+    LLM输出缓存的键：模型、提示版本、截止日期和分析数据的哈希
+    LLM output cache key: model, prompt version, end date and a hash of the analysis data
+    """
+    return {
+        "model": get_model_id(),
+        "prompt": _FISHER_PROMPT_VERSION,
+        "end_date": end_date,
+        "analysis": content_hash(analysis_data),
+    }
+
+
 def generate_fisher_output(
     ticker: str,
     analysis_data: dict[str, any],
+    end_date: str | None = None,
+    use_cache: bool = True,
 ) -> PhilFisherSignal:
     """
     基于菲利普·费雪原则从LLM获取投资决策
     Generate Phil Fisher-style investment decision from LLM
-    """
-    template = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """你是菲利普·费雪的人工智能代理。你根据菲利普·费雪的知名原则做出投资决策：
-
-                1. 强调长期增长潜力和管理质量
-                2. 专注于投资研发以开发未来产品/服务的公司
-                3. 寻找强劲的盈利能力和一致的利润率
-                4. 愿意为优秀公司支付更高价格，但仍关注估值
-                5. 依靠彻底的研究（小道消息）和全面的基本面检查
-                
-                当你提供推理时，请用菲利普·费雪的语调：
-                - 详细讨论公司的增长前景，提供具体指标和趋势
-                - 评估管理质量和他们的资本配置决策
-                - 强调研发投资和可能推动未来增长的产品管道
-                - 用精确数字评估利润率和盈利能力指标的一致性
-                - 解释可能在3-5年以上维持增长的竞争优势
-                - 使用菲利普·费雪有条理、专注增长、长期导向的语调
-                
-                严格按照以下JSON格式返回你的最终输出：
-                {{
-                  "signal": "买入" | "卖出" | "中性",
-                  "confidence": 0 到 100,
-                  "reasoning": "string"
-                }}
-                """,
-            ),
-            (
-                "human",
-                """根据以下{ticker}的分析数据，产生你的菲利普·费雪风格投资信号。
-
-                分析数据：
-                {analysis_data}
-
-                仅返回有效的JSON，包含"signal"、"confidence"和"reasoning"。
-                """,
-            ),
-        ]
-    )
-
-    prompt = template.invoke({"analysis_data": json.dumps(analysis_data, indent=2), "ticker": ticker})
 
-    def create_default_signal():
-        return PhilFisherSignal(
-            signal="中性",
-            confidence=0.0,
-            reasoning="分析出错；默认为中性"
-        )
-
-    return call_llm(
+    结果按分析数据的哈希缓存在磁盘上，相同输入的重复运行不再调用LLM
+    Results are cached on disk keyed by a hash of the analysis data, so reruns with identical inputs skip the LLM call
+    """
+    cache_params = _llm_cache_params(end_date, analysis_data)
+    if use_cache:
+        cached = _file_cache.get("phil_fisher_llm", ticker, "signal", cache_params, LLM_OUTPUT_CACHE_TTL)
+        if cached is not None:
+            progress.update_status("phil_fisher_agent", ticker, "LLM cache hit")
+            # 缓存内容是之前校验过的LLM输出 - The cached payload was validated when first produced
+            return PhilFisherSignal.model_construct(**cached)
+
+    # 紧凑JSON：不缩进、保留中文字符，减少发送给模型的token - Compact JSON without indentation or \uXXXX escapes to send fewer tokens
+    prompt = _FISHER_PROMPT_TEMPLATE.invoke({"analysis_data": dumps(analysis_data), "ticker": ticker})
+
+    result = call_llm(
         prompt=prompt,
         pydantic_model=PhilFisherSignal,
         agent_name="phil_fisher_agent",
-        default_factory=create_default_signal,
+        default_factory=_default_fisher_signal,
     )
+
+    # 不缓存失败时的默认结果 - Do not cache the fallback default
+    if not (result.confidence == 0.0 and result.reasoning == _DEFAULT_REASONING):
+        _file_cache.set("phil_fisher_llm", ticker, "signal", cache_params, result.model_dump())
+    return result
@@ -5,15 +5,17 @@ Portfolio Management Agent - Multi-asset trading decision system
 基于分析师信号做出最终交易决策，支持多头和空头策略
 Makes final trading decisions based on analyst signals, supporting both long and short strategies
 """
-import json
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 
+from data.cache import get_file_cache
 from graph.state import AgentState, show_agent_reasoning
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from typing_extensions import Literal
 from utils.progress import progress
-from utils.llm import call_llm
+from utils.llm import call_llm, call_llm_batch
+from llm.models import get_model_id
+from utils.serialization import content_hash, dumps
 
 
 class PortfolioDecision(BaseModel):
@@ -29,6 +31,10 @@ class PortfolioManagerOutput(BaseModel):
     decisions: dict[str, PortfolioDecision] = Field(description="股票代码到交易决策的字典 - Dictionary of ticker to trading decisions")
 
 
+# 一次转换整个 股票→决策 字典 - Dumps a whole ticker → decision dict in one pass
+_DECISIONS_ADAPTER = TypeAdapter(dict[str, PortfolioDecision])
+
+
 ##### 投资组合管理代理 - Portfolio Management Agent #####
 def portfolio_management_agent(state: AgentState):
     """
@@ -49,6 +55,11 @@ def portfolio_management_agent(state: AgentState):
     portfolio = state["data"]["portfolio"]
     analyst_signals = state["data"]["analyst_signals"]
     tickers = state["data"]["tickers"]
+    # 设置 no_cache 时总是重新调用LLM - With no_cache set the LLM is always called again
+    use_cache = not state["metadata"].get("no_cache", False)
+    # 设置 per_ticker_decisions 时每个股票单独决策，默认所有股票在一个提示中联合分配资金
+    # With per_ticker_decisions set each ticker is decided on its own; by default one prompt allocates cash across all tickers
+    per_ticker = state["metadata"].get("per_ticker_decisions", False)
 
     progress.update_status("portfolio_management_agent", None, "Analyzing signals")
 
@@ -56,7 +67,16 @@ def portfolio_management_agent(state: AgentState):
     position_limits = {}      # 仓位限制 - Position limits
     current_prices = {}       # 当前价格 - Current prices
     max_shares = {}          # 最大股数 - Maximum shares
-    signals_by_ticker = {}   # 按股票分组的信号 - Signals grouped by ticker
+    signals_by_ticker = {ticker: {} for ticker in tickers}   # 按股票分组的信号 - Signals grouped by ticker
+
+    # 分析师信号是 代理→股票→信号，一次遍历转换为 股票→代理→信号
+    # Analyst signals are agent → ticker → signal; invert them into ticker → agent → signal in one pass
+    for agent, signals in analyst_signals.items():
+        if agent == "risk_management_agent":
+            continue
+        for ticker, signal in signals.items():
+            if ticker in signals_by_ticker:
+                signals_by_ticker[ticker][agent] = {"signal": signal["signal"], "confidence": signal["confidence"]}
     
     for ticker in tickers:
         progress.update_status("portfolio_management_agent", ticker, "Processing analyst signals")
@@ -72,38 +92,52 @@ def portfolio_management_agent(state: AgentState):
         else:
             max_shares[ticker] = 0
 
-        # 获取该股票的信号 - Get signals for the ticker
-        ticker_signals = {}
-        for agent, signals in analyst_signals.items():
-            if agent != "risk_management_agent" and ticker in signals:
-                ticker_signals[agent] = {"signal": signals[ticker]["signal"], "confidence": signals[ticker]["confidence"]}
-        signals_by_ticker[ticker] = ticker_signals
-
-    progress.update_status("portfolio_management_agent", None, "Making trading decisions")
-
-    # 生成交易决策 - Generate the trading decision
-    result = generate_trading_decision(
-        tickers=tickers,
-        signals_by_ticker=signals_by_ticker,
-        current_prices=current_prices,
-        max_shares=max_shares,
-        portfolio=portfolio,
-    )
+    # 结果确定的股票（只能持有）直接决策，只有其余股票交给LLM
+    # Tickers whose outcome is already determined (hold) are decided here; only the rest go to the LLM
+    positions = portfolio.get("positions", {})
+    decisions = {
+        ticker: _trivial_decision(signals_by_ticker[ticker], max_shares[ticker], positions.get(ticker, {}))
+        for ticker in tickers
+    }
+    active_tickers = [ticker for ticker, decision in decisions.items() if decision is None]
+
+    if active_tickers:
+        progress.update_status("portfolio_management_agent", None, "Making trading decisions")
+
+        # 生成交易决策 - Generate the trading decision
+        result = generate_trading_decision(
+            tickers=active_tickers,
+            signals_by_ticker={ticker: signals_by_ticker[ticker] for ticker in active_tickers},
+            current_prices={ticker: current_prices[ticker] for ticker in active_tickers},
+            max_shares={ticker: max_shares[ticker] for ticker in active_tickers},
+            portfolio=portfolio,
+            use_cache=use_cache,
+            per_ticker=per_ticker,
+        )
+        decisions.update(result.decisions)
 
     # 将Pydantic模型转换为字典后存储 - Convert Pydantic models to dictionaries before storing
-    decisions_dict = {ticker: decision.model_dump() for ticker, decision in result.decisions.items()}
+    # 整个决策字典一次转换 - Convert the whole decisions dict in one pass
+    decisions_dict = _DECISIONS_ADAPTER.dump_python(
+        {ticker: decision for ticker, decision in decisions.items() if decision is not None}
+    )
     
     # 将决策作为字典存储在状态数据中 - Store the decisions in the state data as dictionaries
     state["data"]["portfolio_decision"] = decisions_dict
 
-    # 创建投资组合管理消息 - Create the portfolio management message
+    # 创建投资组合管理消息；消息中的推理截断，完整文本保留在状态中
+    # Create the portfolio management message; reasoning is truncated in the message, the full text stays in the state
+    message_decisions = {
+        ticker: {**decision, "reasoning": decision["reasoning"][:MESSAGE_REASONING_MAX_CHARS]}
+        for ticker, decision in decisions_dict.items()
+    }
     message = HumanMessage(
-        content=json.dumps(decisions_dict),
+        content=dumps(message_decisions),
         name="portfolio_management_agent",
     )
 
     # 如果设置了标志则打印决策 - Print the decision if the flag is set
-    if state["metadata"]["show_reasoning"]:
+    if state["metadata"].get("show_reasoning"):
         show_agent_reasoning(decisions_dict, "Portfolio Management Agent")
 
     progress.update_status("portfolio_management_agent", None, "Done")
@@ -114,26 +148,8 @@ def portfolio_management_agent(state: AgentState):
     }
 
 
-def generate_trading_decision(
-    tickers: list[str],
-    signals_by_ticker: dict[str, dict],
-    current_prices: dict[str, float],
-    max_shares: dict[str, int],
-    portfolio: dict[str, float],
-) -> PortfolioManagerOutput:
-    """
-    使用重试逻辑尝试从LLM获取决策
-    基于多种分析师信号生成具体的交易指令
-    
-    Attempts to get a decision from the LLM with retry logic
-    Generates specific trading instructions based on multiple analyst signals
-    """
-    # 创建提示模板 - Create the prompt template
-    template = ChatPromptTemplate.from_messages(
-        [
-            (
-              "system",
-              """你是一位投资组合经理，基于多个股票代码做出最终交易决策。
+# 系统提示在整体决策和逐股决策之间共用 - The system prompt is shared by the combined and per-ticker decisions
+_PORTFOLIO_SYSTEM_PROMPT = """你是一位投资组合经理，基于多个股票代码做出最终交易决策。
 
               交易规则：
               - 多头仓位：
@@ -200,11 +216,15 @@ def generate_trading_decision(
               - portfolio_positions: current positions (both long and short)
               - current_prices: current prices for each ticker
               - margin_requirement: current margin requirement for short positions
-              """,
-            ),
-            (
-              "human",
-              """基于团队分析，为每个股票代码做出交易决策。
+              """
+
+# 提示模板在模块加载时构建一次，每次调用直接复用 - Prompt templates are built once at import and reused per call
+_PORTFOLIO_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages(
+    [
+        ("system", _PORTFOLIO_SYSTEM_PROMPT),
+        (
+            "human",
+            """基于团队分析，为每个股票代码做出交易决策。
 
               按股票分组的信号：
               {signals_by_ticker}
@@ -265,26 +285,263 @@ def generate_trading_decision(
                   ...
                 }}
               }}
-              """,
-            ),
-        ]
-    )
+              """
+        ),
+    ]
+)
+
+# 单个股票的决策提示，用于并发地逐股调用LLM - Single-ticker decision prompt, used to query the LLM per ticker concurrently
+_PORTFOLIO_TICKER_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages(
+    [
+        ("system", _PORTFOLIO_SYSTEM_PROMPT),
+        (
+            "human",
+            """基于团队分析，为股票 {ticker} 做出交易决策。
+            投资组合现金由本次决策的 {num_tickers} 个股票共享。
+
+            该股票的信号：
+            {signals}
+
+            当前价格：{current_price}
+            购买允许的最大股数：{max_shares}
+
+            投资组合现金：{portfolio_cash}
+            该股票的当前仓位：{position}
+            当前保证金要求：{margin_requirement}
+
+            严格按以下JSON结构输出：
+            {{
+              "action": "buy/sell/short/cover/hold",
+              "quantity": integer,
+              "confidence": float,
+              "reasoning": "string"
+            }}
+
+            Based on the team's analysis, make your trading decision for {ticker}.
+            Portfolio cash is shared by the {num_tickers} tickers being decided in this round.
+
+            Signals for this ticker:
+            {signals}
+
+            Current Price: {current_price}
+            Maximum Shares Allowed For Purchases: {max_shares}
+
+            Portfolio Cash: {portfolio_cash}
+            Current Position In This Ticker: {position}
+            Current Margin Requirement: {margin_requirement}
+
+            Output strictly in JSON with the following structure:
+            {{
+              "action": "buy/sell/short/cover/hold",
+              "quantity": integer,
+              "confidence": float,
+              "reasoning": "string"
+            }}
+            """,
+        ),
+    ]
+)
+
+# 逐股决策时同时进行的LLM请求数上限 - Maximum number of per-ticker LLM requests in flight
+MAX_CONCURRENT_DECISIONS = 8
+
+# 每个股票决策的输出token上限：足够容纳约 MESSAGE_REASONING_MAX_CHARS 字的中文推理和JSON字段
+# Output token cap per ticker decision: room for about MESSAGE_REASONING_MAX_CHARS characters of Chinese reasoning plus the JSON fields
+DECISION_MAX_TOKENS = 600
+# 整体提示：外层 decisions 对象的额外开销和总上限 - Combined prompt: overhead of the outer decisions object and overall cap
+DECISIONS_OVERHEAD_TOKENS = 100
+DECISIONS_MAX_TOKENS = 4096
+
+# 传给下游的消息中每条推理的最大字符数 - Maximum reasoning length per decision in the downstream message
+MESSAGE_REASONING_MAX_CHARS = 500
+
+# 相同输入的LLM决策在磁盘上的缓存有效期 - On-disk TTL for LLM decisions on identical inputs
+LLM_OUTPUT_CACHE_TTL = 7 * 24 * 60 * 60
+
+# 提示模板的版本，修改任一模板时递增，使旧的缓存决策失效 - Prompt template version; bump it when either template changes to invalidate cached decisions
+_PORTFOLIO_PROMPT_VERSION = "portfolio_v1"
+
+_DEFAULT_REASONING = "投资组合管理出错，默认持有 - Error in portfolio management, defaulting to hold"
+
+_file_cache = get_file_cache()
+
+
+def _default_decision() -> PortfolioDecision:
+    """LLM调用失败时默认持有 - Hold when the LLM call fails"""
+    return PortfolioDecision(action="hold", quantity=0, confidence=0.0, reasoning=_DEFAULT_REASONING)
+
+
+# 中性信号的取值（各代理分别使用中文或英文）- Neutral signal values (agents use either Chinese or English labels)
+_NEUTRAL_SIGNALS = frozenset({"中性", "neutral"})
+
+# 所有分析师一致中性且置信度都高于该值时直接持有 - Hold outright when every analyst is neutral above this confidence
+UNANIMOUS_HOLD_CONFIDENCE = 90
+
+
+def _trivial_decision(signals: dict[str, dict], max_shares: int, position: dict) -> PortfolioDecision | None:
+    """
+    结果确定时不调用LLM直接返回持有，否则返回 None
+    Return a hold decision without the LLM when the outcome is already determined, otherwise None
+    """
+    # 不能买入且没有可卖出或平仓的持仓 - Nothing can be bought and there is no position to sell or cover
+    if max_shares == 0 and not position.get("long") and not position.get("short"):
+        return PortfolioDecision(action="hold", quantity=0, confidence=100.0, reasoning="无可买入额度且无持仓，持有 - No buying capacity and no open position, holding")
+
+    # 所有分析师一致中性且置信度很高 - Every analyst is neutral with high confidence
+    if signals and all(
+        signal["signal"] in _NEUTRAL_SIGNALS and signal["confidence"] > UNANIMOUS_HOLD_CONFIDENCE
+        for signal in signals.values()
+    ):
+        return PortfolioDecision(action="hold", quantity=0, confidence=100.0, reasoning="分析师一致给出高置信度的中性信号，持有 - Analysts are unanimously neutral with high confidence, holding")
+
+    return None
+
+
+def _is_default_decision(decision: PortfolioDecision) -> bool:
+    """是否为失败时的默认决策（不应缓存）- Whether this is the failure default (must not be cached)"""
+    return decision.confidence == 0.0 and decision.reasoning == _DEFAULT_REASONING
+
+
+def _llm_cache_params(raw_inputs: dict) -> dict:
+    """
+    LLM输出缓存的键：模型、提示版本和未序列化的提示输入的哈希（与提示使用的JSON序列化器无关）
+    LLM output cache key: model, prompt version and a hash of the raw prompt inputs (independent of the prompt's JSON serializer)
+    """
+    return {"model": get_model_id(), "prompt": _PORTFOLIO_PROMPT_VERSION, "inputs": content_hash(raw_inputs)}
+
+
+def generate_trading_decision(
+    tickers: list[str],
+    signals_by_ticker: dict[str, dict],
+    current_prices: dict[str, float],
+    max_shares: dict[str, int],
+    portfolio: dict[str, float],
+    use_cache: bool = True,
+    per_ticker: bool = False,
+) -> PortfolioManagerOutput:
+    """
+    使用重试逻辑尝试从LLM获取决策
+    基于多种分析师信号生成具体的交易指令
+    
+    Attempts to get a decision from the LLM with retry logic
+    Generates specific trading instructions based on multiple analyst signals
+
+    决策按提示输入的哈希缓存在磁盘上，相同输入的重复运行不再调用LLM
+    Decisions are cached on disk keyed by a hash of the prompt inputs, so reruns with identical inputs skip the LLM call
+    """
+    # 默认使用整体提示，在所有股票之间联合分配现金；per_ticker 时每个股票单独发送一个提示，批量并发调用
+    # (每个提示都看到全部现金，多个买入决策合计可能超出可用现金)
+    # The combined prompt is the default and allocates cash jointly across tickers; with per_ticker each ticker
+    # gets its own prompt in a concurrent batch (each prompt sees the full cash, so buys can add up past it)
+    if per_ticker and len(tickers) > 1:
+        return _generate_trading_decisions_per_ticker(
+            tickers, signals_by_ticker, current_prices, max_shares, portfolio, use_cache
+        )
+
+    prompt_inputs = {
+        "signals_by_ticker": dumps(signals_by_ticker, sort_keys=True),
+        "current_prices": dumps(current_prices, sort_keys=True),
+        "max_shares": dumps(max_shares, sort_keys=True),
+        "portfolio_cash": f"{portfolio.get('cash', 0):.2f}",
+        "portfolio_positions": dumps(portfolio.get('positions', {}), sort_keys=True),
+        "margin_requirement": f"{portfolio.get('margin_requirement', 0):.2f}",
+    }
+    cache_params = _llm_cache_params({
+        "signals_by_ticker": signals_by_ticker,
+        "current_prices": current_prices,
+        "max_shares": max_shares,
+        "portfolio_cash": prompt_inputs["portfolio_cash"],
+        "portfolio_positions": portfolio.get('positions', {}),
+        "margin_requirement": prompt_inputs["margin_requirement"],
+    })
+    if use_cache and tickers:
+        cached = _file_cache.get("portfolio_llm", tickers[0], "decisions", cache_params, LLM_OUTPUT_CACHE_TTL)
+        if cached is not None:
+            progress.update_status("portfolio_management_agent", None, "LLM cache hit")
+            return PortfolioManagerOutput.model_validate(cached)
 
     # 生成提示 - Generate the prompt
-    prompt = template.invoke(
-        {
-            "signals_by_ticker": json.dumps(signals_by_ticker, indent=2),
-            "current_prices": json.dumps(current_prices, indent=2),
-            "max_shares": json.dumps(max_shares, indent=2),
-            "portfolio_cash": f"{portfolio.get('cash', 0):.2f}",
-            "portfolio_positions": json.dumps(portfolio.get('positions', {}), indent=2),
-            "margin_requirement": f"{portfolio.get('margin_requirement', 0):.2f}",
-        }
-    )
+    prompt = _PORTFOLIO_PROMPT_TEMPLATE.invoke(prompt_inputs)
 
     # 为PortfolioManagerOutput创建默认工厂 - Create default factory for PortfolioManagerOutput
     def create_default_portfolio_output():
-        return PortfolioManagerOutput(decisions={ticker: PortfolioDecision(action="hold", quantity=0, confidence=0.0, reasoning="投资组合管理出错，默认持有 - Error in portfolio management, defaulting to hold") for ticker in tickers})
+        return PortfolioManagerOutput(decisions={ticker: _default_decision() for ticker in tickers})
 
     # 调用LLM时不再传递model_name和model_provider - model_name and model_provider are no longer passed when calling call_llm
-    return call_llm(prompt=prompt, pydantic_model=PortfolioManagerOutput, agent_name="portfolio_management_agent", default_factory=create_default_portfolio_output)
+    result = call_llm(
+        prompt=prompt,
+        pydantic_model=PortfolioManagerOutput,
+        agent_name="portfolio_management_agent",
+        default_factory=create_default_portfolio_output,
+        max_tokens=min(DECISIONS_MAX_TOKENS, DECISION_MAX_TOKENS * len(tickers) + DECISIONS_OVERHEAD_TOKENS),
+    )
+
+    # 不缓存失败时的默认结果 - Do not cache the fallback default
+    if tickers and not any(_is_default_decision(decision) for decision in result.decisions.values()):
+        _file_cache.set("portfolio_llm", tickers[0], "decisions", cache_params, result.model_dump())
+    return result
+
+
+def _generate_trading_decisions_per_ticker(
+    tickers: list[str],
+    signals_by_ticker: dict[str, dict],
+    current_prices: dict[str, float],
+    max_shares: dict[str, int],
+    portfolio: dict[str, float],
+    use_cache: bool = True,
+) -> PortfolioManagerOutput:
+    """
+    为每个股票构建单独的提示，作为一个批次并发调用LLM，再合并为整体输出
+    Build one prompt per ticker, query the LLM concurrently as one batch and merge the decisions into one output
+
+    每个股票先查磁盘缓存，只有未命中的股票才发送给LLM
+    Each ticker is looked up in the on-disk cache first; only the misses are sent to the LLM
+    """
+    positions = portfolio.get("positions", {})
+    # 现金和保证金对所有股票相同，只格式化一次 - Cash and margin are the same for every ticker, so format them once
+    portfolio_cash = f"{portfolio.get('cash', 0):.2f}"
+    margin_requirement = f"{portfolio.get('margin_requirement', 0):.2f}"
+    decisions = {}
+    pending = {}  # 股票 -> (提示输入, 缓存键) - ticker -> (prompt inputs, cache params)
+    for ticker in tickers:
+        raw_inputs = {
+            "ticker": ticker,
+            "num_tickers": len(tickers),
+            "signals": signals_by_ticker.get(ticker, {}),
+            "current_price": current_prices.get(ticker, 0),
+            "max_shares": max_shares.get(ticker, 0),
+            "portfolio_cash": portfolio_cash,
+            "position": positions.get(ticker, {}),
+            "margin_requirement": margin_requirement,
+        }
+        prompt_inputs = {
+            **raw_inputs,
+            "signals": dumps(raw_inputs["signals"], sort_keys=True),
+            "position": dumps(raw_inputs["position"], sort_keys=True),
+        }
+        cache_params = _llm_cache_params(raw_inputs)
+        cached = _file_cache.get("portfolio_llm", ticker, "decision", cache_params, LLM_OUTPUT_CACHE_TTL) if use_cache else None
+        if cached is not None:
+            progress.update_status("portfolio_management_agent", ticker, "LLM cache hit")
+            # 缓存文件可能过期或被修改，交易决策在使用前重新校验 - The cache file may be stale or edited, so trading decisions are re-validated
+            decisions[ticker] = PortfolioDecision.model_validate(cached)
+        else:
+            decisions[ticker] = None
+            pending[ticker] = (prompt_inputs, cache_params)
+
+    if pending:
+        results = call_llm_batch(
+            [_PORTFOLIO_TICKER_PROMPT_TEMPLATE.invoke(prompt_inputs) for prompt_inputs, _ in pending.values()],
+            pydantic_model=PortfolioDecision,
+            agent_name="portfolio_management_agent",
+            default_factory=_default_decision,
+            max_concurrency=MAX_CONCURRENT_DECISIONS,
+            max_tokens=DECISION_MAX_TOKENS,
+        )
+        for (ticker, (_, cache_params)), decision in zip(pending.items(), results):
+            decisions[ticker] = decision
+            # 不缓存失败时的默认结果 - Do not cache the fallback default
+            if not _is_default_decision(decision):
+                _file_cache.set("portfolio_llm", ticker, "decision", cache_params, decision.model_dump())
+
+    return PortfolioManagerOutput(decisions=decisions)
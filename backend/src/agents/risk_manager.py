@@ -8,8 +8,12 @@ Controls position sizing based on portfolio risk, ensuring proper money manageme
 from langchain_core.messages import HumanMessage
 from graph.state import AgentState, show_agent_reasoning
 from utils.progress import progress
-from tools.api import get_prices, prices_to_df
-import json
+from utils.serialization import dumps
+from tools.api import get_prices
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from operator import attrgetter
+import numpy as np
 
 
 ##### 风险管理代理 - Risk Management Agent #####
@@ -35,52 +39,59 @@ def risk_management_agent(state: AgentState):
     risk_analysis = {}
     current_prices = {}  # 存储价格以避免冗余API调用 - Store prices to avoid redundant API calls
 
-    for ticker in tickers:
-        progress.update_status("risk_management_agent", ticker, "Analyzing price data")
+    # 价格请求是I/O密集型且互不依赖，并发获取；之后按顺序计算，无需加锁
+    # Price requests are I/O-bound and independent, so fetch them concurrently; the analysis below stays serial and needs no lock
+    with ThreadPoolExecutor(max_workers=max(1, min(32, len(tickers)))) as executor:
+        # map 按输入顺序返回，保持输出中的股票顺序 - map yields in input order, keeping ticker order stable
+        prices_by_ticker = list(executor.map(_fetch_prices, tickers, repeat(data["start_date"]), repeat(data["end_date"])))
 
-        # 获取价格数据 - Get price data
-        prices = get_prices(
-            ticker=ticker,
-            start_date=data["start_date"],
-            end_date=data["end_date"],
-        )
+    # 投资组合在本次调用中不变，总值只需计算一次；统一为Python float，输出时无需再转换
+    # The portfolio does not change within this call, so its total value is computed once, as Python floats that need no conversion on output
+    cash = float(portfolio.get("cash", 0))
+    cost_basis = portfolio.get("cost_basis", {})
+    total_portfolio_value = cash + float(sum(cost_basis.values()))
 
+    for ticker, prices in zip(tickers, prices_by_ticker):
         if not prices:
             progress.update_status("risk_management_agent", ticker, "Failed: No price data found")
             continue
 
-        prices_df = prices_to_df(prices)
-
         progress.update_status("risk_management_agent", ticker, "Calculating position limits")
 
-        # 计算投资组合价值 - Calculate portfolio value
-        current_price = prices_df["close"].iloc[-1]  # 获取最新收盘价 - Get latest closing price
-        current_prices[ticker] = current_price  # 存储当前价格 - Store the current price
+        # 获取最新收盘价；数据源返回的顺序不一，按日期取最新一条，无需构建DataFrame
+        # Get the latest closing price; sources differ in ordering, so take the newest entry by date without building a DataFrame
+        current_prices[ticker] = max(prices, key=attrgetter("time")).close  # 存储当前价格 - Store the current price
 
-        # 计算此股票的当前头寸价值 - Calculate current position value for this ticker
-        current_position_value = portfolio.get("cost_basis", {}).get(ticker, 0)
+    # 所有有价格的股票一起计算头寸限制 - Compute the position limits of every priced ticker together
+    priced_tickers = list(current_prices)
 
-        # 使用存储的价格计算总投资组合价值 - Calculate total portfolio value using stored prices
-        total_portfolio_value = portfolio.get("cash", 0) + sum(portfolio.get("cost_basis", {}).get(t, 0) for t in portfolio.get("cost_basis", {}))
+    # 每个股票的当前头寸价值 - Current position value of each ticker
+    current_position_values = np.array([cost_basis.get(ticker, 0) for ticker in priced_tickers], dtype=np.float64)
 
-        # 基础限制：任意单一头寸占投资组合的20% - Base limit is 20% of portfolio for any single position
-        position_limit = total_portfolio_value * 0.20
+    # 基础限制：任意单一头寸占投资组合的20% - Base limit is 20% of portfolio for any single position
+    position_limit = total_portfolio_value * 0.20
 
-        # 对于现有头寸，从限制中减去当前头寸价值 - For existing positions, subtract current position value from limit
-        remaining_position_limit = position_limit - current_position_value
+    # 对于现有头寸，从限制中减去当前头寸价值 - For existing positions, subtract current position value from limit
+    remaining_position_limits = position_limit - current_position_values
 
-        # 确保不超过可用现金 - Ensure we don't exceed available cash
-        max_position_size = min(remaining_position_limit, portfolio.get("cash", 0))
+    # 确保不超过可用现金 - Ensure we don't exceed available cash
+    max_position_sizes = np.minimum(remaining_position_limits, cash)
 
+    for ticker, max_position_size, current_position_value, remaining_position_limit in zip(
+        priced_tickers,
+        max_position_sizes.tolist(),
+        current_position_values.tolist(),
+        remaining_position_limits.tolist(),
+    ):
         risk_analysis[ticker] = {
-            "remaining_position_limit": float(max_position_size),  # 剩余可投资金额 - Remaining investable amount
-            "current_price": float(current_price),                 # 当前股价 - Current stock price
+            "remaining_position_limit": max_position_size,          # 剩余可投资金额 - Remaining investable amount
+            "current_price": current_prices[ticker],                # 当前股价 - Current stock price
             "reasoning": {
-                "portfolio_value": float(total_portfolio_value),     # 投资组合总值 - Total portfolio value
-                "current_position": float(current_position_value),   # 当前持仓价值 - Current position value
-                "position_limit": float(position_limit),            # 头寸限制 - Position limit
-                "remaining_limit": float(remaining_position_limit), # 剩余限制 - Remaining limit
-                "available_cash": float(portfolio.get("cash", 0)),  # 可用现金 - Available cash
+                "portfolio_value": total_portfolio_value,            # 投资组合总值 - Total portfolio value
+                "current_position": current_position_value,          # 当前持仓价值 - Current position value
+                "position_limit": position_limit,                    # 头寸限制 - Position limit
+                "remaining_limit": remaining_position_limit,         # 剩余限制 - Remaining limit
+                "available_cash": cash,  # 可用现金 - Available cash
             },
         }
 
@@ -88,12 +99,12 @@ def risk_management_agent(state: AgentState):
 
     # 创建风险管理消息 - Create risk management message
     message = HumanMessage(
-        content=json.dumps(risk_analysis),
+        content=dumps(risk_analysis),
         name="risk_management_agent",
     )
 
     # 如果设置了标志则打印推理过程 - Print reasoning if flag is set
-    if state["metadata"]["show_reasoning"]:
+    if state["metadata"].get("show_reasoning"):
         show_agent_reasoning(risk_analysis, "Risk Management Agent")
 
     # 将信号添加到analyst_signals列表 - Add the signal to the analyst_signals list
@@ -103,3 +114,14 @@ def risk_management_agent(state: AgentState):
         "messages": state["messages"] + [message],
         "data": data,
     }
+
+
+def _fetch_prices(ticker: str, start_date: str, end_date: str) -> list:
+    """获取单个股票的价格数据 - Fetch the price data of one ticker"""
+    progress.update_status("risk_management_agent", ticker, "Analyzing price data")
+    return get_prices(
+        ticker=ticker,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
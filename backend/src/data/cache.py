@@ -1,3 +1,11 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date
+
+
 class Cache:
     """
     In-memory cache for API responses.
@@ -90,10 +98,105 @@ class Cache:
         )
 
 
-# Global cache instance
+class FileCache:
+    """
+    Persistent on-disk JSON cache for API responses, with a TTL checked on read.
+    Entries live at {root}/{namespace}/{ticker}/{endpoint}_{md5(params)}.json and store
+    the write timestamp next to the JSON-serializable payload.
+    中文注：磁盘上的 JSON 缓存，读取时按 TTL 判断是否过期，跨进程/多次运行复用 API 结果。
+    调用方负责将数据序列化为 JSON 兼容的结构（例如 Pydantic 模型的 model_dump()），读取后再自行重建。
+    """
+
+    def __init__(self, root: str | None = None):
+        self.root = root or os.environ.get("RITADEL_CACHE_DIR", ".cache")
+
+    def _path(self, namespace: str, ticker: str, endpoint: str, params: dict) -> str:
+        """Build the file path for an entry; the params are hashed into the file name."""
+        key = hashlib.md5(json.dumps(sorted(params.items()), default=str).encode()).hexdigest()
+        return os.path.join(self.root, namespace, ticker, f"{endpoint}_{key}.json")
+
+    def get(self, namespace: str, ticker: str, endpoint: str, params: dict, ttl: float) -> any:
+        """Get the cached payload if present and younger than ttl seconds, else None."""
+        path = self._path(namespace, ticker, endpoint, params)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get("timestamp", 0) >= ttl:
+            return None
+        return entry.get("data")
+
+    def set(self, namespace: str, ticker: str, endpoint: str, params: dict, data: any):
+        """Write a payload to the cache."""
+        path = self._path(namespace, ticker, endpoint, params)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"timestamp": time.time(), "data": data}, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: failed to write file cache entry {path}: {e}")
+
+
+# Global cache instances
 _cache = Cache()
+_file_cache = FileCache()
 
 
 def get_cache() -> Cache:
     """Get the global cache instance."""
     return _cache
+
+
+def get_file_cache() -> FileCache:
+    """Get the global on-disk cache instance."""
+    return _file_cache
+
+
+# On-disk TTLs for cached API fetches
+# 中文注：市值每天变化；截止日期为今天（或以后）时可能出现新的财报或重述，只缓存一天；过去截止日期的年度数据基本不变
+MARKET_CAP_CACHE_TTL = 24 * 60 * 60                 # market cap moves daily
+RECENT_FINANCIALS_CACHE_TTL = 24 * 60 * 60          # end_date today or later: new filings and restatements can appear
+HISTORICAL_FINANCIALS_CACHE_TTL = 90 * 24 * 60 * 60  # end_date in the past: the data rarely changes
+
+# Namespace shared by every agent, so one API payload is stored once
+FETCH_CACHE_NAMESPACE = "api"
+
+
+def cached_fetch(fetch, endpoint: str, ttl: float, historical_ttl: float | None = None, model=None, on_hit=None):
+    """
+    Wrap a fetch function with the on-disk cache so reruns with the same parameters are served locally.
+    Every caller shares one entry per (ticker, endpoint, params). When historical_ttl is given it applies
+    to calls whose end_date is before today; other calls use ttl.
+    中文注：用磁盘缓存包装数据获取函数，所有代理共用同一个缓存条目；截止日期早于今天时使用 historical_ttl。
+
+    Args:
+        fetch: fetch function, called as fetch(ticker, **params)
+        endpoint: cache file name prefix
+        ttl: cache TTL in seconds
+        historical_ttl: optional TTL in seconds for calls with an end_date before today
+        model: Pydantic model of list results, used for (de)serialization
+        on_hit: optional callback(ticker, endpoint) invoked on a cache hit, e.g. for progress updates
+    """
+    def wrapper(ticker: str, **params):
+        entry_ttl = ttl
+        end_date = params.get("end_date")
+        if historical_ttl is not None and end_date and str(end_date) < date.today().isoformat():
+            entry_ttl = historical_ttl
+
+        cached = _file_cache.get(FETCH_CACHE_NAMESPACE, ticker, endpoint, params, entry_ttl)
+        if cached is not None:
+            if on_hit:
+                on_hit(ticker, endpoint)
+            return [model(**item) for item in cached] if model else cached
+
+        result = fetch(ticker, **params)
+        # Empty results are not cached so the next run retries
+        if result:
+            _file_cache.set(FETCH_CACHE_NAMESPACE, ticker, endpoint, params, [item.model_dump() for item in result] if model else result)
+        return result
+    return wrapper
@@ -1,4 +1,7 @@
 import os
+import httpx
+from functools import lru_cache
+from urllib.parse import urlparse
 # from langchain_anthropic import ChatAnthropic # 不再需要 Anthropic (Anthropic is no longer needed)
 # from langchain_groq import ChatGroq # 不再需要 Groq (Groq is no longer needed)
 from langchain_openai import ChatOpenAI
@@ -61,13 +64,48 @@ def get_model() -> ChatOpenAI | None: # model_provider 参数已移除，model_n
     # 移除了 Groq, Anthropic, 和 Gemini 的逻辑，因为不再支持这些模型提供商
     # Removed logic for Groq, Anthropic, and Gemini as they are no longer supported
 
-    model = ChatOpenAI(
-        model=os.getenv("AI_MODEL"),
-        api_key=os.getenv("OPENAI_API_KEY"),               
-        base_url=os.getenv("BASE_URL")
-    )
+    # 相同配置复用同一个客户端，所有代理的 LLM 调用共享连接池，避免重复的 TLS/DNS 握手
+    # Reuse one client per configuration so every agent's LLM calls share a connection pool instead of re-handshaking
+    return _get_shared_model(os.getenv("AI_MODEL"), os.getenv("OPENAI_API_KEY"), os.getenv("BASE_URL"))
+
+
+def get_model_id() -> str:
+    """
+    当前LLM配置的标识（模型名@接口地址），作为LLM输出缓存键的一部分，切换模型后不会读到旧模型的结果
+    Identity of the configured LLM (model@base_url), part of the LLM output cache keys so switching models never replays another model's output
+    """
+    return f"{os.getenv('AI_MODEL')}@{os.getenv('BASE_URL') or 'default'}"
+
+
+# 支持 prompt_cache_key 请求字段的接口主机 - API hosts that accept the prompt_cache_key request field
+PROMPT_CACHE_KEY_HOSTS = frozenset({"api.openai.com"})
+
 
-    return model
+def supports_prompt_cache_key() -> bool:
+    """
+    配置的接口是否接受 prompt_cache_key 字段：未设置 BASE_URL（默认 OpenAI）或 BASE_URL 指向 OpenAI 时才发送，
+    兼容 OpenAI 的其他服务可能拒绝未知字段
+    Whether the configured endpoint accepts the prompt_cache_key field: only when BASE_URL is unset (OpenAI default)
+    or points at OpenAI, since other OpenAI-compatible servers may reject unknown fields
+    """
+    base_url = os.getenv("BASE_URL")
+    return not base_url or urlparse(base_url).hostname in PROMPT_CACHE_KEY_HOSTS
+
+
+# 共享连接池的容量，足够覆盖并发的代理和股票 - Shared pool size, enough for concurrent agents and tickers
+HTTP_POOL_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200)
+
+
+@lru_cache(maxsize=4)
+def _get_shared_model(model_name: str | None, api_key: str | None, base_url: str | None) -> ChatOpenAI:
+    """按配置缓存 ChatOpenAI 实例及其 HTTP 客户端 (Cache the ChatOpenAI instance and its HTTP clients per configuration)"""
+    return ChatOpenAI(
+        model=model_name,
+        api_key=api_key,
+        base_url=base_url,
+        http_client=httpx.Client(limits=HTTP_POOL_LIMITS),
+        http_async_client=httpx.AsyncClient(limits=HTTP_POOL_LIMITS),
+    )
 
 # 确保文件末尾有一个换行符
 # Ensure there is a newline at the end of the file
\ No newline at end of file
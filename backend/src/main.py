@@ -64,6 +64,7 @@ def run_hedge_fund(
     portfolio: dict,
     show_reasoning: bool = False,
     selected_analysts: list[str] = [],
+    no_cache: bool = False,
 ):
     """
     运行对冲基金分析系统的主函数 - 只运行投资专家agent
@@ -76,6 +77,7 @@ def run_hedge_fund(
         portfolio: 投资组合信息 - Portfolio information
         show_reasoning: 是否显示推理过程 - Whether to show reasoning
         selected_analysts: 选择的分析师列表 - List of selected analysts
+        no_cache: 是否跳过LLM输出缓存 - Whether to bypass the LLM output caches
     """
     # Start progress tracking
     progress.start()
@@ -102,6 +104,7 @@ def run_hedge_fund(
             },
             "metadata": {
                 "show_reasoning": show_reasoning,
+                "no_cache": no_cache,
                 "model_name": "gpt-4o", # 可以硬编码用于元数据目的
                 "model_provider": "OpenAI", # 可以硬编码用于元数据目的
             },
@@ -185,7 +188,7 @@ def create_workflow(selected_analysts=None):
 
 
 # 移除了 is_crypto, model_name, model_provider 参数 (Removed is_crypto, model_name, model_provider parameters)
-def run_all_analysts_with_round_table(tickers, start_date, end_date, portfolio, show_reasoning):
+def run_all_analysts_with_round_table(tickers, start_date, end_date, portfolio, show_reasoning, no_cache=False):
     """
     运行所有可用分析师并进行圆桌讨论
     Run all available analysts and then conduct a round table discussion without user selection.
@@ -210,6 +213,7 @@ def run_all_analysts_with_round_table(tickers, start_date, end_date, portfolio,
         portfolio=portfolio,
         show_reasoning=show_reasoning,
         selected_analysts=all_analysts,
+        no_cache=no_cache,
     )
     
     # 运行圆桌讨论 - Run the round table discussion
@@ -250,6 +254,9 @@ if __name__ == "__main__":
     )
     parser.add_argument("--end-date", type=str, help="End date (YYYY-MM-DD). Defaults to today")
     parser.add_argument("--show-reasoning", action="store_true", help="Show reasoning from each agent")
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Ignore cached LLM outputs and query the model again"
+    )
     parser.add_argument(
         "--show-agent-graph", action="store_true", help="Show the agent graph"
     )
@@ -330,6 +337,7 @@ if __name__ == "__main__":
             end_date=end_date,
             portfolio=portfolio,
             show_reasoning=args.show_reasoning,
+            no_cache=args.no_cache,
         )
         print_analyst_signals_only(result)
     else:
@@ -376,6 +384,7 @@ if __name__ == "__main__":
             portfolio=portfolio,
             show_reasoning=args.show_reasoning,
             selected_analysts=selected_analysts,
+            no_cache=args.no_cache,
         )
         print(result)
         # print_analyst_signals_only(result)
@@ -46,7 +46,8 @@ from .yfinance_data_fetcher import (
 # 导入综合数据获取功能（专为 agents 优化）
 from .api import (
     get_comprehensive_data,
-    get_batch_comprehensive_data
+    get_batch_comprehensive_data,
+    get_batch_comprehensive_data_async
 )
 
 __all__ = [
@@ -78,7 +79,8 @@ __all__ = [
     
     # Comprehensive data functions (optimized for agents)
     'get_comprehensive_data',
-    'get_batch_comprehensive_data'
+    'get_batch_comprehensive_data',
+    'get_batch_comprehensive_data_async'
 ]
 
 
@@ -6,7 +6,11 @@ import requests
 from datetime import datetime, timedelta
 import json
 from typing import List, Dict, Any, Optional
-from functools import lru_cache
+from functools import partial, wraps
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import inspect
+import asyncio
 import time
 import random
 from requests.adapters import HTTPAdapter
@@ -36,11 +40,148 @@ from data.models import (
 )
 
 # Import rate limiter and proxy manager
-from .yfinance_data_fetcher import get_yfinance_data
+from .yfinance_data_fetcher import get_yfinance_data, get_batch_yfinance_data
 
 # Global cache instance
 _cache = get_cache()
 
+# 与 yfinance_data_fetcher 的数据缓存保持一致（5分钟）
+MEMO_TTL_SECONDS = 300
+
+
+def _freeze(value):
+    """将参数转换为可哈希的形式（list -> tuple）"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _call_key(signature: inspect.Signature, args, kwargs, unordered: tuple[str, ...] = ()) -> tuple:
+    """按函数签名绑定参数并生成可哈希的调用键"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return tuple(
+        (name, tuple(sorted(value)) if name in unordered else _freeze(value))
+        for name, value in bound.arguments.items()
+    )
+
+
+class _InflightCalls:
+    """同一个键的并发调用只执行一次，其余调用等待并共享其结果（或异常）
+    
+    数据获取在各个 agent 的工作线程中进行（asyncio.to_thread / 线程池），
+    所以这里用 concurrent.futures.Future 而不是 asyncio.Future。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+    
+    def run(self, key, fetch):
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._calls[key] = future
+        
+        if not owner:
+            return future.result()
+        
+        try:
+            result = fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def coalesce_requests(func):
+    """请求合并装饰器：参数相同的并发调用共享同一次获取，不缓存结果"""
+    signature = inspect.signature(func)
+    inflight = _InflightCalls()
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return inflight.run(_call_key(signature, args, kwargs), partial(func, *args, **kwargs))
+    return wrapper
+
+
+def memoize_results(maxsize: int = 256, ttl: float | None = MEMO_TTL_SECONDS, on_hit=None, unordered: tuple[str, ...] = ()):
+    """进程内 LRU + TTL 结果缓存装饰器
+    
+    与 functools.lru_cache 类似，但：
+    - 位置参数和关键字参数统一按函数签名绑定后作为缓存键，list 参数转换为 tuple
+    - 空结果（None、空列表）和带 "error" 字段的结果不缓存，失败后可以重试
+    - 缓存条目在 ttl 秒后过期
+    - on_hit 可以在命中时对缓存值做调整（例如刷新数据时效字段）
+    - unordered 中列出的参数与顺序无关，排序后再作为缓存键
+    - 未命中时，参数相同的并发调用合并为一次获取（见 coalesce_requests）
+    
+    被装饰的函数提供 cache_clear() 用于清空缓存。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        entries: OrderedDict = OrderedDict()
+        lock = threading.Lock()
+        inflight = _InflightCalls()
+        
+        def lookup(key):
+            with lock:
+                entry = entries.get(key)
+                if entry is not None:
+                    stored_at, value = entry
+                    if ttl is None or time.time() - stored_at < ttl:
+                        entries.move_to_end(key)
+                        return True, value
+                    del entries[key]
+            return False, None
+        
+        def fetch(key, args, kwargs):
+            # 等待期间其他线程可能已经写入缓存 - Another thread may have filled the entry meanwhile
+            hit, value = lookup(key)
+            if hit:
+                return value
+            
+            value = func(*args, **kwargs)
+            
+            if not value or (isinstance(value, dict) and value.get("error")):
+                return value
+            
+            with lock:
+                entries[key] = (time.time(), value)
+                entries.move_to_end(key)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return value
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _call_key(signature, args, kwargs, unordered)
+            
+            hit, value = lookup(key)
+            if hit:
+                return on_hit(value) if on_hit else value
+            return inflight.run(key, partial(fetch, key, args, kwargs))
+        
+        def cache_clear():
+            with lock:
+                entries.clear()
+        
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
+
+
+def _refresh_data_age(result: dict) -> dict:
+    """命中缓存时重新计算数据时效"""
+    return {**result, "data_age_seconds": time.time() - result["data_timestamp"]}
+
 
 def safe_yfinance_request(ticker_symbol, operation_func, max_retries=3):
     """Safely make yfinance requests with rate limiting and retry logic.
@@ -88,6 +229,8 @@ def get_api_keys():
 
 # is_crypto 参数已移除，此函数现在只获取股票价格
 # is_crypto parameter removed, this function now only fetches stock prices
+# 同一进程内风险、技术等代理对相同区间的请求共享一次结果 - Risk, technicals and other agents asking for the same range share one result per process
+@memoize_results(maxsize=1024)
 def get_prices(ticker: str, start_date: str, end_date: str) -> list[Price]:
     """Fetch price data with multi-source fallback strategy."""
     # Check cache first
@@ -198,6 +341,7 @@ def get_prices(ticker: str, start_date: str, end_date: str) -> list[Price]:
     # Return empty list if all sources fail
     return []
 
+@memoize_results(maxsize=1024)
 def get_financial_metrics(
     ticker: str,
     end_date: str,
@@ -384,6 +528,34 @@ def get_financial_metrics(
         print(f"Error fetching financial metrics for {ticker}: {str(e)}")
         return []
 
+
+def get_financial_metrics_batch(
+    tickers: list[str],
+    end_date: str,
+    period: str = "ttm",
+    limit: int = 10,
+    max_concurrency: int = 16
+) -> dict[str, list[FinancialMetrics]]:
+    """批量获取多个股票的财务指标
+    
+    Yahoo Finance 没有多股票的财务数据接口，所以每个 ticker 在线程池中并发获取
+    （仍经过 get_financial_metrics 的缓存），总耗时接近最慢的单个 ticker。
+    
+    Args:
+        tickers: 股票代码列表
+        end_date: 结束日期
+        period: 期间类型
+        limit: 数据条数限制
+        max_concurrency: 同时进行的 ticker 请求数上限
+        
+    Returns:
+        ticker 到财务指标列表的映射，顺序与 tickers 一致，获取失败的为空列表
+    """
+    fetch = partial(get_financial_metrics, end_date=end_date, period=period, limit=limit)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(tickers)))) as executor:
+        return dict(zip(tickers, executor.map(fetch, tickers)))
+
+@memoize_results(maxsize=1024, unordered=("line_items",))
 def search_line_items(
     ticker: str,
     line_items: list[str],
@@ -543,6 +715,7 @@ def search_line_items(
 
 
 
+@memoize_results(maxsize=1024)
 def get_insider_trades(
     ticker: str,
     end_date: str,
@@ -723,6 +896,7 @@ def get_company_news(
         return []
 
 
+@memoize_results(maxsize=1024)
 def get_market_cap(
     ticker: str,
     end_date: str,
@@ -766,6 +940,7 @@ def get_value_from_df(df, field_name, date):
     except (KeyError, ValueError, TypeError):
         return None
 
+@memoize_results(maxsize=256, on_hit=_refresh_data_age)
 def get_comprehensive_data(
     ticker: str,
     end_date: str,
@@ -781,6 +956,9 @@ def get_comprehensive_data(
     - Market cap
     - 原始 yfinance 数据
     
+    相同参数的成功结果在进程内缓存（见 memoize_results），可通过
+    get_comprehensive_data.cache_clear() 清空。
+    
     Args:
         ticker: 股票代码
         end_date: 结束日期
@@ -897,3 +1075,44 @@ def get_batch_comprehensive_data(
     return results
 
 
+async def get_batch_comprehensive_data_async(
+    tickers: list[str],
+    end_date: str,
+    period: str = "ttm",
+    limit: int = 10,
+    common_line_items: list[str] = None,
+    max_concurrency: int = 4
+) -> dict[str, dict]:
+    """并发批量获取多个股票的综合数据
+    
+    与 get_batch_comprehensive_data 的结果相同，但每个 ticker 在线程池中
+    并发获取，总耗时接近最慢的单个 ticker，而不是所有 ticker 之和。
+    
+    Args:
+        tickers: 股票代码列表
+        end_date: 结束日期
+        period: 期间类型
+        limit: 数据条数限制
+        common_line_items: 所有股票共同需要的 line items
+        max_concurrency: 同时进行的 ticker 请求数上限，避免触发 Yahoo 限流
+        
+    Returns:
+        ticker 到综合数据的映射
+    """
+    print(f"🚀 Getting batch comprehensive data for {len(tickers)} tickers (concurrency: {max_concurrency})")
+    
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def fetch(ticker: str) -> dict:
+        async with semaphore:
+            return await loop.run_in_executor(
+                None,
+                partial(get_comprehensive_data, ticker, end_date, period, limit, common_line_items)
+            )
+    
+    # get_comprehensive_data 自行捕获异常并返回带 error 字段的结果
+    results = await asyncio.gather(*(fetch(ticker) for ticker in tickers))
+    
+    print(f"✅ Batch processing completed for {len(results)} tickers")
+    return dict(zip(tickers, results))
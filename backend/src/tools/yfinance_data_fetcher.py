@@ -106,6 +106,15 @@ class YFinanceDataset:
 _data_cache: Dict[str, YFinanceDataset] = {}
 _cache_lock = threading.Lock()
 
+# 每个 ticker 一把锁：同一 ticker 的并发请求只获取一次，不同 ticker 可以并行获取
+_ticker_locks: Dict[str, threading.Lock] = {}
+
+
+def _get_ticker_lock(ticker: str) -> threading.Lock:
+    """获取指定 ticker 的获取锁"""
+    with _cache_lock:
+        return _ticker_locks.setdefault(ticker, threading.Lock())
+
 
 def get_proxy_list():
     """获取代理列表，支持多种格式"""
@@ -284,22 +293,23 @@ def get_yfinance_data(ticker: str, force_refresh: bool = False) -> Optional[YFin
     Returns:
         YFinance 数据集，如果失败返回 None
     """
-    with _cache_lock:
+    with _get_ticker_lock(ticker):
         # 检查缓存
-        if not force_refresh and ticker in _data_cache:
-            cached_data = _data_cache[ticker]
-            # 检查缓存是否过期（5分钟）
-            if time.time() - cached_data.fetch_timestamp < 300:
-                print(f"Using cached data for {ticker}")
-                return cached_data
+        with _cache_lock:
+            cached_data = None if force_refresh else _data_cache.get(ticker)
+        # 检查缓存是否过期（5分钟）
+        if cached_data and time.time() - cached_data.fetch_timestamp < 300:
+            print(f"Using cached data for {ticker}")
+            return cached_data
         
-        # 获取新数据
+        # 获取新数据（只持有该 ticker 的锁，不阻塞其他 ticker）
         print(f"Fetching fresh data for {ticker}")
         dataset = safe_fetch_yfinance_data(ticker)
         
         if dataset:
             # 缓存数据
-            _data_cache[ticker] = dataset
+            with _cache_lock:
+                _data_cache[ticker] = dataset
             
         return dataset
 
@@ -0,0 +1,19 @@
+"""Optional Numba JIT support for numeric kernels.
+
+`njit` compiles a function with Numba when it is installed and otherwise returns the
+function unchanged, so decorated kernels must remain valid plain Python/NumPy code.
+中文注：numba 可用时编译数值计算内核，不可用时原样返回函数（结果一致，只是没有加速）。
+"""
+
+# Optional numba import
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit, usable both as @njit and @njit(...)."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
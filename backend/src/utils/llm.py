@@ -1,8 +1,10 @@
 """Helper functions for LLM"""
 
 import json
+import time
 from typing import TypeVar, Type, Optional, Any
 from pydantic import BaseModel
+from langchain_core.messages import HumanMessage
 from utils.progress import progress
 
 T = TypeVar('T', bound=BaseModel)
@@ -13,11 +15,15 @@ def call_llm(
     pydantic_model: Type[T],
     agent_name: Optional[str] = None,
     max_retries: int = 3,
-    default_factory = None
+    default_factory = None,
+    prompt_cache_key: Optional[str] = None,
+    max_tokens: Optional[int] = None
 ) -> T:
     """
     Makes an LLM call with retry logic. Output is structured using the provided Pydantic model.
+    If the output fails validation, the next attempt shows the LLM its output and the error so it can correct it.
     模型调用函数，包含重试逻辑。输出将使用指定的 Pydantic 模型进行结构化。
+    输出未通过校验时，下一次尝试会把上次的输出和错误信息反馈给 LLM 进行修正。
     
     Args:
         prompt: The prompt to send to the LLM (要发送给 LLM 的提示)
@@ -25,6 +31,8 @@ def call_llm(
         agent_name: Optional name of the agent for progress updates (用于进度更新的可选代理名称)
         max_retries: Maximum number of retries (default: 3) (最大重试次数，默认为 3)
         default_factory: Optional factory function to create default response on failure (可选的默认响应工厂函数，在失败时使用)
+        prompt_cache_key: Optional key grouping requests that share a prompt prefix for provider-side caching (可选的提示缓存键，共享前缀的请求使用同一个键)
+        max_tokens: Optional cap on output tokens per request (可选的每个请求输出 token 上限)
         
     Returns:
         An instance of the specified Pydantic model (指定 Pydantic 模型的实例)
@@ -35,13 +43,15 @@ def call_llm(
     
     # 调用 get_model 时不再需要参数，它将始终返回 GPT-4o 实例
     # No parameters needed when calling get_model, it will always return a GPT-4o instance
-    llm = get_model() 
+    llm = _with_request_options(get_model(), prompt_cache_key, max_tokens)
     
     # 由于模型固定为 GPT-4o (非 Deepseek)，我们总是使用结构化输出
     # As the model is fixed to GPT-4o (not Deepseek), we always use structured output
+    # include_raw 保留原始输出，校验失败时可以反馈给 LLM - include_raw keeps the raw output for validation feedback
     llm = llm.with_structured_output(
         pydantic_model,
         method="json_mode",
+        include_raw=True,
     )
     
     # Retry logic for making the LLM call
@@ -53,33 +63,157 @@ def call_llm(
             # Make the actual LLM call
             response = llm.invoke(prompt)
             
+            if response["parsing_error"] is not None or response["parsed"] is None:
+                # 下一次尝试带上校验错误，而不是原样重发同一个提示
+                # Retry with the validation error instead of resending the same prompt
+                prompt = _with_validation_feedback(prompt, response["raw"], response["parsing_error"])
+                raise ValueError(f"Output failed validation: {response['parsing_error']}")
+            
             if agent_name:
                 progress.update_status(agent_name, None, "LLM call completed")
             
-            return response
+            return response["parsed"]
             
         except Exception as e:
             if agent_name:
                 progress.update_status(agent_name, None, f"LLM call failed (attempt {attempt + 1}/{max_retries}): {str(e)}")
             
             if attempt == max_retries - 1:  # Last attempt
-                # If a default factory is provided, use it
-                if default_factory:
-                    try:
-                        return default_factory()
-                    except Exception:
-                        pass
-                
-                # Fall back to the generic default response
-                return create_default_response(pydantic_model)
+                # Use the default factory if provided, otherwise the generic default response
+                return _fallback_response(pydantic_model, default_factory)
             
             # Wait a bit before retrying (exponential backoff)
-            import time
             time.sleep(2 ** attempt)
 
     # This should never be reached due to the retry logic above
     return create_default_response(pydantic_model)
 
+def call_llm_batch(
+    prompts: list[Any],
+    pydantic_model: Type[T],
+    agent_name: Optional[str] = None,
+    max_retries: int = 3,
+    default_factory = None,
+    max_concurrency: int = 8,
+    prompt_cache_key: Optional[str] = None,
+    max_tokens: Optional[int] = None
+) -> list[T]:
+    """
+    Makes several independent LLM calls as one pooled batch, sharing a single model client.
+    Only the prompts that failed are retried; prompts that still fail fall back like call_llm.
+    将多个相互独立的 LLM 调用作为一个批次并发发送，共用同一个模型客户端。只重试失败的提示，仍失败的提示按 call_llm 的方式返回默认值。
+    
+    Args:
+        prompts: The prompts to send to the LLM (要发送给 LLM 的提示列表)
+        pydantic_model: The Pydantic model class to structure each output (用于结构化输出的 Pydantic 模型类)
+        agent_name: Optional name of the agent for progress updates (用于进度更新的可选代理名称)
+        max_retries: Maximum number of retries (default: 3) (最大重试次数，默认为 3)
+        default_factory: Optional factory function to create default response on failure (可选的默认响应工厂函数，在失败时使用)
+        max_concurrency: Maximum number of requests in flight (default: 8) (同时进行的最大请求数，默认为 8)
+        prompt_cache_key: Optional key grouping requests that share a prompt prefix for provider-side caching (可选的提示缓存键，共享前缀的请求使用同一个键)
+        max_tokens: Optional cap on output tokens per request (可选的每个请求输出 token 上限)
+        
+    Returns:
+        One instance of the specified Pydantic model per prompt, in prompt order (每个提示对应一个模型实例，顺序与提示一致)
+    """
+    from llm.models import get_model
+    
+    llm = _with_request_options(get_model(), prompt_cache_key, max_tokens).with_structured_output(
+        pydantic_model,
+        method="json_mode",
+        include_raw=True,
+    )
+    
+    prompts = list(prompts)
+    results = [None] * len(prompts)
+    pending = list(range(len(prompts)))
+    for attempt in range(max_retries):
+        if agent_name:
+            progress.update_status(agent_name, None, f"Calling LLM for {len(pending)} prompts (attempt {attempt + 1}/{max_retries})")
+        
+        responses = llm.batch(
+            [prompts[index] for index in pending],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+        failed = []
+        for index, response in zip(pending, responses):
+            if isinstance(response, Exception):
+                failed.append(index)
+            elif response["parsing_error"] is not None or response["parsed"] is None:
+                # 校验失败的提示带上错误信息重试 - Prompts that failed validation are retried with the error
+                prompts[index] = _with_validation_feedback(prompts[index], response["raw"], response["parsing_error"])
+                failed.append(index)
+            else:
+                results[index] = response["parsed"]
+        pending = failed
+        
+        if not pending:
+            if agent_name:
+                progress.update_status(agent_name, None, "LLM call completed")
+            break
+        
+        if agent_name:
+            progress.update_status(agent_name, None, f"LLM call failed for {len(pending)} prompts (attempt {attempt + 1}/{max_retries})")
+        
+        if attempt < max_retries - 1:
+            # Wait a bit before retrying (exponential backoff)
+            time.sleep(2 ** attempt)
+    
+    for index in pending:
+        results[index] = _fallback_response(pydantic_model, default_factory)
+    
+    return results
+
+
+def _with_request_options(llm: Any, prompt_cache_key: Optional[str], max_tokens: Optional[int] = None) -> Any:
+    """
+    Sends prompt_cache_key with every request so calls sharing a prompt prefix are routed to the same provider-side cache,
+    and caps the output at max_tokens so a response cannot run on past the expected JSON.
+    The key is only sent to OpenAI's API; other OpenAI-compatible endpoints may reject unknown fields.
+    The copy shares the pooled HTTP clients of the original model.
+    """
+    from llm.models import supports_prompt_cache_key
+    
+    update = {}
+    if prompt_cache_key and supports_prompt_cache_key():
+        update["extra_body"] = {**(llm.extra_body or {}), "prompt_cache_key": prompt_cache_key}
+    if max_tokens:
+        update["max_tokens"] = max_tokens
+    if not update:
+        return llm
+    return llm.model_copy(update=update)
+
+
+def _with_validation_feedback(prompt: Any, raw_output: Any, error: Any) -> list:
+    """Appends the rejected output and its validation error to the prompt so the LLM can correct it."""
+    if hasattr(prompt, "to_messages"):
+        messages = prompt.to_messages()
+    elif isinstance(prompt, str):
+        messages = [HumanMessage(content=prompt)]
+    else:
+        messages = list(prompt)
+    
+    return messages + [
+        raw_output,
+        HumanMessage(content=(
+            "上一次的输出未通过校验，请修正后只返回符合要求格式的 JSON。\n"
+            "The previous output failed validation. Return only corrected JSON in the required format.\n"
+            f"Error: {error}"
+        )),
+    ]
+
+
+def _fallback_response(pydantic_model: Type[T], default_factory=None) -> T:
+    """Uses default_factory when given and working, otherwise the generic default response."""
+    if default_factory:
+        try:
+            return default_factory()
+        except Exception:
+            pass
+    return create_default_response(pydantic_model)
+
+
 def create_default_response(model_class: Type[T]) -> T:
     """Creates a safe default response based on the model's fields."""
     default_values = {}
@@ -1,16 +1,24 @@
+import queue
+import threading
+import time
+
+
 class ProgressTracker:
     def __init__(self):
         self.handler = None
+        # Agents may report progress from worker threads
+        self._lock = threading.Lock()
     
     def update_status(self, agent, ticker, status):
-        if self.handler:
-            self.handler.update_status(agent, ticker, status)
-        else:
-            # Default implementation - print to console
-            if ticker:
-                print(f"[{agent}] {ticker}: {status}")
+        with self._lock:
+            if self.handler:
+                self.handler.update_status(agent, ticker, status)
             else:
-                print(f"[{agent}] {status}")
+                # Default implementation - print to console
+                if ticker:
+                    print(f"[{agent}] {ticker}: {status}")
+                else:
+                    print(f"[{agent}] {status}")
     
     def start(self):
         if self.handler:
@@ -19,6 +27,80 @@ class ProgressTracker:
     def complete(self):
         if self.handler:
             self.handler.complete()
+    
+    def stop(self):
+        if self.handler:
+            self.handler.stop()
+
+
+class ProgressProxy:
+    """
+    Forwards status updates to a ProgressTracker from a background thread.
+    update_status only enqueues, so worker threads never wait on rendering or the tracker lock.
+    Updates for the same (agent, ticker) that arrive within `coalesce_window` seconds of the
+    first pending one are collapsed into the latest status.
+    中文注：进度更新先入队，由后台线程合并后再转发，避免并发的工作线程争用渲染锁。
+    """
+    
+    _FLUSH = object()
+    
+    def __init__(self, tracker: ProgressTracker, coalesce_window: float = 0.05):
+        self._tracker = tracker
+        self._window = coalesce_window
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+    
+    def update_status(self, agent, ticker, status):
+        self._ensure_worker()
+        self._queue.put((agent, ticker, status, time.monotonic()))
+    
+    def flush(self):
+        """Block until every queued update has been forwarded to the tracker."""
+        if self._worker is None:
+            return
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        done.wait()
+    
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="progress-proxy", daemon=True)
+                    self._worker.start()
+    
+    def _run(self):
+        # (agent, ticker) -> [latest status, time of the first pending update]
+        pending = {}
+        while True:
+            try:
+                item = self._queue.get(timeout=self._window if pending else None)
+            except queue.Empty:
+                item = None
+            
+            if item is not None and item[0] is self._FLUSH:
+                self._emit(pending, force=True)
+                item[1].set()
+                continue
+            
+            if item is not None:
+                agent, ticker, status, queued_at = item
+                entry = pending.get((agent, ticker))
+                if entry:
+                    entry[0] = status
+                else:
+                    pending[(agent, ticker)] = [status, queued_at]
+            
+            self._emit(pending)
+    
+    def _emit(self, pending, force=False):
+        now = time.monotonic()
+        for key, (status, queued_at) in list(pending.items()):
+            if force or now - queued_at >= self._window:
+                del pending[key]
+                self._tracker.update_status(key[0], key[1], status)
+
 
 # Global instance
-progress = ProgressTracker() 
\ No newline at end of file
+progress = ProgressTracker()
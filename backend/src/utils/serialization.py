@@ -0,0 +1,44 @@
+"""Compact JSON serialization shared by the agents.
+
+`dumps` produces the compact JSON used in prompts and agent messages (orjson when it is
+installed, the standard library otherwise). `content_hash` always hashes a canonical
+standard-library encoding, so cache keys do not depend on whether orjson is installed.
+中文注：dumps 用于提示和消息（有 orjson 时使用 orjson）；content_hash 始终使用标准库编码，缓存键与是否安装 orjson 无关。
+"""
+
+import hashlib
+import json
+
+# Optional orjson import
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _to_builtin(value: any) -> any:
+    """把NumPy数值/数组转成Python内置类型，其他对象转成字符串 - NumPy scalars/arrays to builtins, anything else to str"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def dumps(data: any, sort_keys: bool = False) -> str:
+    """
+    紧凑JSON：不缩进、保留中文字符；可用时使用 orjson，并直接序列化NumPy数值
+    Compact JSON with raw CJK characters; uses orjson when available, which also serializes NumPy values natively
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(data, default=str, option=option).decode()
+    return json.dumps(data, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False, default=_to_builtin)
+
+
+def content_hash(data: any) -> str:
+    """
+    数据的稳定哈希（键排序的标准库JSON），用作缓存键
+    Stable hash of the data (sorted-key stdlib JSON), used for cache keys
+    """
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=_to_builtin)
+    return hashlib.sha256(canonical.encode()).hexdigest()
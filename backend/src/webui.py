@@ -73,6 +73,7 @@ def start_api_server(host=DEFAULT_HOST, port=API_PORT):
                 selected_analysts=selected_analysts,
                 start_date=data.get('startDate'),
                 end_date=data.get('endDate'),
+                per_ticker_decisions=data.get('perTickerDecisions', False),
             )
             
             print("Analysis completed successfully")
@@ -163,7 +164,8 @@ def start_api_server(host=DEFAULT_HOST, port=API_PORT):
     # print(f"Starting API server at http://{host}:{port}")
     app.run(host=host, port=port, debug=True, use_reloader=False)
 
-def run_hedge_fund_for_web(tickers, selected_analysts, start_date=None, end_date=None, initial_cash=100000):
+def run_hedge_fund_for_web(tickers, selected_analysts, start_date=None, end_date=None, initial_cash=100000,
+                           per_ticker_decisions=False):
     """为Web UI优化的股票分析函数"""
     from graph.state import AgentState
     
@@ -189,6 +191,7 @@ def run_hedge_fund_for_web(tickers, selected_analysts, start_date=None, end_date
         },
         "metadata": {
             "show_reasoning": True,
+            "per_ticker_decisions": per_ticker_decisions,
             "model_name": "gpt-4o",
             "model_provider": "OpenAI"
         }